@@ -1,10 +1,20 @@
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, request, jsonify, current_app, g
 from sqlalchemy.orm.attributes import flag_modified
 import jwt
-import uuid
+import logging
 from datetime import datetime
+from extensions import db
+from models import User, Quotation, ArchivedQuotation
+from http_cache import conditional_json, conditional_body, weak_etag
+from quotation_cache import quotation_cache
+from terms import quotations_to_dicts
+from ids import add_with_unique_id
+from partitions import commit_quotations, find_quotations, quotation_session, rollback_quotations
+from validation import validate_body
+import schemas
 
 agent_bp = Blueprint('agent_bp', __name__)
+logger = logging.getLogger(__name__)
 
 def get_current_user():
     """Helper function to validate token and get current user"""
@@ -26,20 +36,19 @@ def get_current_user():
         except jwt.InvalidTokenError:
             return None, jsonify({'error': 'Token invalid'}), 401
         
-        # Get database and models from app context
-        from app import db, User
-        
         # ✅ Use db.session.get() instead of User.query.get()
         user = db.session.get(User, data_token['user_id'])
         if not user:
             return None, jsonify({'error': 'User not found'}), 401
             
+        g.current_user = user
         return user, None, None
         
     except Exception as e:
         return None, jsonify({'error': f'Authentication failed: {str(e)}'}), 500
 
 @agent_bp.route('/api/agent-registrations', methods=['POST'])
+@validate_body(schemas.CREATE_AGENT_REGISTRATION)
 def create_agent_registration():
     """Create a new agent registration quotation"""
     try:
@@ -48,16 +57,7 @@ def create_agent_registration():
         if error_response:
             return error_response, error_code
             
-        # Get database and models
-        from app import db, Quotation
-        
-        data = request.get_json()
-        
-        # Validate required fields
-        required_fields = ['agentName', 'mobile', 'agentType']
-        for field in required_fields:
-            if field not in data or not str(data[field]).strip():
-                return jsonify({'error': f'Missing or empty {field} field'}), 400
+        data = g.json_body
         
         # Validate mobile number format
         mobile = str(data['mobile']).strip()
@@ -65,16 +65,12 @@ def create_agent_registration():
             return jsonify({'error': 'Mobile number must be 10 digits'}), 400
         
         # Validate email if provided
-        email = data.get('email', '').strip()
+        email = (data.get('email') or '').strip()
         if email and '@' not in email:
             return jsonify({'error': 'Invalid email format'}), 400
         
-        # Create unique agent quotation ID
-        agent_id = f"AGENT-{uuid.uuid4().hex[:8].upper()}"
-        
         # Create quotation record for agent registration
         quotation = Quotation(
-            id=agent_id,
             developer_type='agent',
             project_region=data.get('projectRegion', 'Maharashtra'),
             plot_area=0.0,  # Not applicable for agents
@@ -87,10 +83,11 @@ def create_agent_registration():
             rera_number=None,
             service_summary=f"Agent Registration - {data['agentType']} - {data['agentName']}",
             created_by=data['agentName'],
+            owner_user_id=current_user.id,
             headers=[],
             pricing_breakdown=[],
-            applicable_terms=[],
-            custom_terms=[],
+            applicable_term_ids=[],
+            custom_term_ids=[],
             total_amount=0.0,
             discount_amount=0.0,
             discount_percent=0.0,
@@ -102,8 +99,9 @@ def create_agent_registration():
             approved_at=None
         )
         
-        db.session.add(quotation)
-        db.session.commit()
+        # Time-ordered unique ID, retried on the (unlikely) primary-key collision
+        add_with_unique_id(quotation_session(), quotation, 'AGENT', current_app.config['ID_GENERATOR'])
+        commit_quotations()
         
         return jsonify({
             'success': True,
@@ -113,12 +111,12 @@ def create_agent_registration():
         }), 201
         
     except Exception as e:
-        from app import db
-        db.session.rollback()
-        current_app.logger.error(f"Error creating agent registration: {str(e)}")
+        rollback_quotations()
+        logger.error("Error creating agent registration: %s", e)
         return jsonify({'error': f'Failed to create agent registration: {str(e)}'}), 500
 
 @agent_bp.route('/api/agent-registrations/<quotation_id>/services', methods=['PUT'])
+@validate_body(schemas.UPDATE_AGENT_SERVICES)
 def update_agent_services(quotation_id):
     """Update services for agent registration"""
     try:
@@ -127,19 +125,13 @@ def update_agent_services(quotation_id):
         if error_response:
             return error_response, error_code
             
-        # Get database and models
-        from app import db, Quotation
-        
-        # ✅ Use db.session.get() instead of Quotation.query.filter_by().first()
-        quotation = db.session.get(Quotation, quotation_id)
+        # ✅ Use session.get() instead of Quotation.query.filter_by().first()
+        quotation = quotation_session().get(Quotation, quotation_id)
         if not quotation or quotation.developer_type != 'agent':
             return jsonify({'error': 'Agent quotation not found'}), 404
         
-        data = request.get_json()
-        services = data.get('services', [])
-        
-        if not services:
-            return jsonify({'error': 'No services provided'}), 400
+        data = g.json_body
+        services = data['services']
         
         # Format services for agent registration
         agent_services_header = {
@@ -164,7 +156,7 @@ def update_agent_services(quotation_id):
         quotation.total_amount = total_amount
         flag_modified(quotation, 'headers')
         
-        db.session.commit()
+        commit_quotations()
         
         return jsonify({
             'success': True,
@@ -173,12 +165,12 @@ def update_agent_services(quotation_id):
         })
         
     except Exception as e:
-        from app import db
-        db.session.rollback()
-        current_app.logger.error(f"Error updating agent services: {str(e)}")
+        rollback_quotations()
+        logger.error("Error updating agent services: %s", e)
         return jsonify({'error': f'Failed to update services: {str(e)}'}), 500
 
 @agent_bp.route('/api/agent-registrations/<quotation_id>/complete', methods=['PUT'])
+@validate_body(schemas.COMPLETE_AGENT_REGISTRATION)
 def complete_agent_registration(quotation_id):
     """Complete agent registration quotation"""
     try:
@@ -187,15 +179,12 @@ def complete_agent_registration(quotation_id):
         if error_response:
             return error_response, error_code
             
-        # Get database and models
-        from app import db, Quotation
-        
-        # ✅ Use db.session.get() instead of Quotation.query.filter_by().first()
-        quotation = db.session.get(Quotation, quotation_id)
+        # ✅ Use session.get() instead of Quotation.query.filter_by().first()
+        quotation = quotation_session().get(Quotation, quotation_id)
         if not quotation or quotation.developer_type != 'agent':
             return jsonify({'error': 'Agent quotation not found'}), 404
         
-        data = request.get_json()
+        data = g.json_body
         
         # Update final details
         quotation.terms_accepted = data.get('termsAccepted', False)
@@ -203,7 +192,7 @@ def complete_agent_registration(quotation_id):
         quotation.approved_by = current_user.username
         quotation.approved_at = datetime.utcnow()
         
-        db.session.commit()
+        commit_quotations()
         
         return jsonify({
             'success': True,
@@ -212,9 +201,8 @@ def complete_agent_registration(quotation_id):
         })
         
     except Exception as e:
-        from app import db
-        db.session.rollback()
-        current_app.logger.error(f"Error completing agent registration: {str(e)}")
+        rollback_quotations()
+        logger.error("Error completing agent registration: %s", e)
         return jsonify({'error': f'Failed to complete registration: {str(e)}'}), 500
 
 @agent_bp.route('/api/agent-registrations', methods=['GET'])
@@ -226,25 +214,22 @@ def get_agent_registrations():
         if error_response:
             return error_response, error_code
             
-        # Get database and models
-        from app import Quotation
-        
         # Only admin/manager can see all, users see their own
         if current_user.role in ['admin', 'manager']:
-            quotations = Quotation.query.filter_by(developer_type='agent').order_by(Quotation.created_at.desc()).all()
+            quotations = find_quotations(Quotation.developer_type == 'agent')
         else:
-            quotations = Quotation.query.filter_by(
-                developer_type='agent',
-                created_by=current_user.username
-            ).order_by(Quotation.created_at.desc()).all()
+            quotations = find_quotations(
+                Quotation.owner_user_id == current_user.id,
+                Quotation.developer_type == 'agent'
+            )
         
         return jsonify({
             'success': True,
-            'data': [q.to_dict() for q in quotations]
+            'data': quotations_to_dicts(quotations)
         })
         
     except Exception as e:
-        current_app.logger.error(f"Error fetching agent registrations: {str(e)}")
+        logger.error("Error fetching agent registrations: %s", e)
         return jsonify({'error': f'Failed to fetch agent registrations: {str(e)}'}), 500
 
 @agent_bp.route('/api/agent-registrations/<quotation_id>', methods=['GET'])
@@ -256,25 +241,33 @@ def get_agent_registration(quotation_id):
         if error_response:
             return error_response, error_code
             
-        # Get database and models
-        from app import db, Quotation
-        
-        # ✅ Use db.session.get() instead of Quotation.query.filter_by().first()
-        quotation = db.session.get(Quotation, quotation_id)
-        if not quotation or quotation.developer_type != 'agent':
+        cached = quotation_cache.get(quotation_id, lambda: quotation_session().get(Quotation, quotation_id))
+        if cached is None:
+            # Fall back to cold storage for archived registrations
+            archived = db.session.get(ArchivedQuotation, quotation_id)
+            if not archived or archived.developer_type != 'agent':
+                return jsonify({'error': 'Agent quotation not found'}), 404
+            if current_user.role not in ['admin', 'manager'] and archived.owner_user_id != current_user.id:
+                return jsonify({'error': 'Access denied'}), 403
+            return conditional_json(
+                weak_etag(archived.id, archived.version, 'archived'),
+                lambda: {'success': True, 'data': archived.to_dict()}
+            )
+
+        if cached.meta['developerType'] != 'agent':
             return jsonify({'error': 'Agent quotation not found'}), 404
         
         # Check access permissions
-        if current_user.role not in ['admin', 'manager'] and quotation.created_by != current_user.username:
+        if current_user.role not in ['admin', 'manager'] and cached.meta.get('ownerUserId') != current_user.id:
             return jsonify({'error': 'Access denied'}), 403
         
-        return jsonify({
-            'success': True,
-            'data': quotation.to_dict()
-        })
+        return conditional_body(
+            weak_etag(quotation_id, cached.version),
+            lambda: '{"data":%s,"success":true}' % cached.body
+        )
         
     except Exception as e:
-        current_app.logger.error(f"Error fetching agent registration: {str(e)}")
+        logger.error("Error fetching agent registration: %s", e)
         return jsonify({'error': f'Failed to fetch agent registration: {str(e)}'}), 500
 
 @agent_bp.route('/api/agent-registrations/<quotation_id>', methods=['DELETE'])
@@ -290,16 +283,13 @@ def delete_agent_registration(quotation_id):
         if current_user.role not in ['admin', 'manager']:
             return jsonify({'error': 'Only admin/manager can delete registrations'}), 403
             
-        # Get database and models
-        from app import db, Quotation
-        
-        # ✅ Use db.session.get() instead of Quotation.query.filter_by().first()
-        quotation = db.session.get(Quotation, quotation_id)
+        # ✅ Use session.get() instead of Quotation.query.filter_by().first()
+        quotation = quotation_session().get(Quotation, quotation_id)
         if not quotation or quotation.developer_type != 'agent':
             return jsonify({'error': 'Agent quotation not found'}), 404
         
-        db.session.delete(quotation)
-        db.session.commit()
+        quotation_session().delete(quotation)
+        commit_quotations()
         
         return jsonify({
             'success': True,
@@ -307,12 +297,12 @@ def delete_agent_registration(quotation_id):
         })
         
     except Exception as e:
-        from app import db
-        db.session.rollback()
-        current_app.logger.error(f"Error deleting agent registration: {str(e)}")
+        rollback_quotations()
+        logger.error("Error deleting agent registration: %s", e)
         return jsonify({'error': f'Failed to delete agent registration: {str(e)}'}), 500
 
 @agent_bp.route('/api/agent-registrations/<quotation_id>/pricing', methods=['PUT'])
+@validate_body(schemas.UPDATE_AGENT_PRICING)
 def update_agent_pricing(quotation_id):
     """Update pricing for agent registration"""
     try:
@@ -321,15 +311,12 @@ def update_agent_pricing(quotation_id):
         if error_response:
             return error_response, error_code
             
-        # Get database and models
-        from app import db, Quotation
-        
-        # ✅ Use db.session.get() instead of Quotation.query.filter_by().first()
-        quotation = db.session.get(Quotation, quotation_id)
+        # ✅ Use session.get() instead of Quotation.query.filter_by().first()
+        quotation = quotation_session().get(Quotation, quotation_id)
         if not quotation or quotation.developer_type != 'agent':
             return jsonify({'error': 'Agent quotation not found'}), 404
         
-        data = request.get_json()
+        data = g.json_body
         
         # Update pricing fields
         if 'totalAmount' in data:
@@ -350,7 +337,7 @@ def update_agent_pricing(quotation_id):
         quotation.approved_by = current_user.username
         quotation.approved_at = datetime.utcnow()
         
-        db.session.commit()
+        commit_quotations()
         
         return jsonify({
             'success': True,
@@ -359,7 +346,6 @@ def update_agent_pricing(quotation_id):
         })
         
     except Exception as e:
-        from app import db
-        db.session.rollback()
-        current_app.logger.error(f"Error updating agent pricing: {str(e)}")
+        rollback_quotations()
+        logger.error("Error updating agent pricing: %s", e)
         return jsonify({'error': f'Failed to update pricing: {str(e)}'}), 500
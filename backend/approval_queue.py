@@ -0,0 +1,199 @@
+"""Who can approve what: required approval level and per-approver queues.
+
+When a quotation needs approval, the level it needs is stored alongside it:
+``required_discount`` (the effective discount an approver's threshold must
+cover) and ``approval_reasons`` (why it is pending). The columns are kept up
+to date by a flush hook, so every write path is covered. A manager's queue
+is then one range query on the ``(requires_approval, required_discount)``
+index, and the per-approver counts shown on the dashboard are cached until
+a commit changes the queue or the approvers.
+"""
+import threading
+import time
+from datetime import datetime
+
+from flask import current_app, has_app_context
+from sqlalchemy import and_, case, event, func, inspect, or_
+
+from extensions import db
+from models import Quotation, User
+from pricing import requires_approval_due_to_customized_header, requires_approval_due_to_packages
+
+APPROVER_ROLES = ('admin', 'manager')
+
+# Columns that decide whether and at which level a quotation is pending
+_LEVEL_COLUMNS = ('requires_approval', 'discount_percent', 'discount_amount', 'total_amount', 'headers',
+                  'custom_term_ids', 'legacy_custom_terms')
+
+
+def effective_discount(q):
+    """Discount percentage of ``q``, derived from the amounts when no percentage is stored"""
+    if q.discount_percent and q.discount_percent > 0:
+        return q.discount_percent
+    if q.total_amount and q.discount_amount:
+        return q.discount_amount / (q.total_amount + q.discount_amount) * 100
+    return 0
+
+
+def approval_reasons(q):
+    """Why ``q`` needs approval, from its discount, headers and custom terms"""
+    headers = q.headers or []
+    custom = q.custom_term_ids if q.custom_term_ids is not None else q.legacy_custom_terms
+    reasons = []
+    if effective_discount(q) > 0:
+        reasons.append('discount')
+    if requires_approval_due_to_packages(headers):
+        reasons.append('packages')
+    if requires_approval_due_to_customized_header(headers):
+        reasons.append('customized_header')
+    if custom:
+        reasons.append('custom_terms')
+    return reasons
+
+
+def can_approve(user, q):
+    """Whether ``user`` may approve ``q``: admins always, managers up to their threshold"""
+    if user.role == 'admin':
+        return True
+    if user.role != 'manager':
+        return False
+    required = q.required_discount if q.required_discount is not None else effective_discount(q)
+    return required <= (user.threshold or 0)
+
+
+def queue_criteria(user):
+    """Filter for the pending quotations ``user`` can act on"""
+    criteria = [Quotation.requires_approval.is_(True)]
+    if user.role != 'admin':
+        criteria.append(Quotation.required_discount <= (user.threshold or 0))
+    return criteria
+
+
+@event.listens_for(db.session, 'before_flush')
+def record_approval_level(session, flush_context, instances):
+    """Store the required approval level on quotations entering or changing in the queue"""
+    changed = False
+    for obj in list(session.new) + list(session.dirty):
+        if not isinstance(obj, Quotation):
+            continue
+        if obj not in session.new:
+            state = inspect(obj)
+            if not any(state.attrs[name].history.has_changes() for name in _LEVEL_COLUMNS):
+                continue
+        if obj.requires_approval:
+            obj.required_discount = round(effective_discount(obj), 4)
+            obj.approval_reasons = approval_reasons(obj)
+            changed = True
+        elif obj.required_discount is not None or obj.approval_reasons is not None:
+            obj.required_discount = None
+            obj.approval_reasons = None
+            changed = True
+    for obj in session.deleted:
+        if isinstance(obj, Quotation) and obj.requires_approval:
+            changed = True
+    for obj in list(session.new) + list(session.deleted):
+        if isinstance(obj, User):
+            changed = True  # an approver added or removed
+    for obj in session.dirty:
+        if isinstance(obj, User) and any(inspect(obj).attrs[name].history.has_changes() for name in ('role', 'threshold')):
+            changed = True
+    if changed:
+        session.info['approval_queue_changed'] = True
+
+
+class ApproverCounts:
+    """Cached ``{user id: pending quotations that user can approve}``.
+
+    Dropped when a commit in this process changes the queue or the
+    approvers. Commits in other worker processes are not seen, so entries
+    also expire after APPROVAL_COUNTS_TTL seconds.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = None
+        self._stored_at = 0.0
+        self._generation = 0
+
+    def get(self):
+        ttl = current_app.config.get('APPROVAL_COUNTS_TTL', 30) if has_app_context() else 30
+        with self._lock:
+            if self._counts is not None and time.monotonic() - self._stored_at < ttl:
+                return self._counts
+            generation = self._generation
+        counts = self._compute()
+        with self._lock:
+            # A commit landed while counting: serve the result but do not keep it
+            if generation == self._generation:
+                self._counts, self._stored_at = counts, time.monotonic()
+        return counts
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+            self._counts = None
+
+    @staticmethod
+    def _compute():
+        from partitions import get_partitions
+        partitions = get_partitions()
+        if partitions is not None:
+            # The queue is spread over the partitions and the users are not:
+            # count the queue per approval level, then match the levels to approvers
+            levels = partitions.pending_by_required_discount()
+            approvers = db.session.execute(
+                db.select(User.id, User.role, User.threshold).where(User.role.in_(APPROVER_ROLES))
+            ).all()
+            return {user_id: sum(count for required, count in levels.items()
+                                 if role == 'admin' or (required is not None and required <= (threshold or 0)))
+                    for user_id, role, threshold in approvers}
+        # One grouped query; each approver's join is a range on the queue index
+        pending = and_(
+            Quotation.requires_approval.is_(True),
+            or_(User.role == 'admin', Quotation.required_discount <= func.coalesce(User.threshold, 0)),
+        )
+        rows = db.session.execute(
+            db.select(User.id, func.count(Quotation.id))
+            .select_from(User)
+            .outerjoin(Quotation, pending)
+            .where(User.role.in_(APPROVER_ROLES))
+            .group_by(User.id)
+        ).all()
+        return dict(rows)
+
+
+approver_counts = ApproverCounts()
+
+
+@event.listens_for(db.session, 'after_commit')
+def _invalidate_counts(session):
+    if session.info.pop('approval_queue_changed', False):
+        approver_counts.invalidate()
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _forget_queue_change(session):
+    session.info.pop('approval_queue_changed', None)
+
+
+def backfill_required_discount(conn):
+    """Fill required_discount for rows that were pending before the column existed;
+    the reasons are filled on the quotation's next write.
+
+    requiredDiscount is served to clients, so version and updated_at are
+    bumped too and ETags change with it. The caller clears the quotation
+    cache: this runs outside the session whose hooks would.
+    """
+    table = Quotation.__table__
+    discount = case(
+        (table.c.discount_percent > 0, table.c.discount_percent),
+        (and_(table.c.total_amount != 0, table.c.discount_amount != 0),
+         table.c.discount_amount * 100.0 / (table.c.total_amount + table.c.discount_amount)),
+        else_=0,
+    )
+    return conn.execute(
+        table.update()
+        .where(table.c.requires_approval.is_(True), table.c.required_discount.is_(None))
+        .values(required_discount=func.round(discount, 4), version=table.c.version + 1,
+                updated_at=datetime.utcnow())
+    ).rowcount
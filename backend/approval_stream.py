@@ -0,0 +1,193 @@
+import json
+import logging
+import os
+import threading
+from collections import deque
+
+from flask import current_app
+from sqlalchemy import select
+
+from extensions import db
+from models import ApprovalStreamEvent
+
+logger = logging.getLogger(__name__)
+
+
+class ApprovalQueueBroker:
+    """Fan-out of approval queue changes to the SSE subscribers of every worker.
+
+    A change is appended to the approval_stream_event table; its id is the
+    sequence number and the resume token sent to clients, so a token issued
+    by one worker resumes on any other. Each process runs one poller thread
+    that copies new rows into a bounded in-memory history and wakes the
+    process's subscribers: the database sees one query per poll interval per
+    process, however many streams are open. A token that has fallen out of
+    the history is answered with a fresh snapshot instead of silently
+    missing events.
+
+    Every open stream holds one of the worker's threads, so at most
+    ``max_streams`` are served per process.
+    """
+
+    def __init__(self, engine, history=1000, poll_seconds=1.0, max_streams=4):
+        self.engine = engine
+        self.history = history
+        self.poll_seconds = poll_seconds
+        self.max_streams = max_streams
+        self._events = deque(maxlen=history)
+        self._seq = None  # loaded from the table on first use
+        self._streams = 0
+        self._cond = threading.Condition()
+        self._poll_lock = threading.Lock()
+        self._poller_pid = None
+        self._stop = threading.Event()
+
+    # -- shared log --
+
+    def publish(self, kind, quotation_id, data=None):
+        table = ApprovalStreamEvent.__table__
+        with self.engine.begin() as conn:
+            seq = conn.execute(table.insert().values(
+                kind=kind, quotation_id=quotation_id, data=data
+            )).inserted_primary_key[0]
+            if seq % 100 == 0:
+                # Rows older than any history can replay are of no use to anyone
+                conn.execute(table.delete().where(table.c.id <= seq - self.history))
+        if self.open_streams:
+            self.poll()  # wake this worker's streams without waiting for the poller
+
+    def poll(self):
+        """Copy rows committed since the last poll into the history"""
+        table = ApprovalStreamEvent.__table__
+        columns = select(table.c.id, table.c.kind, table.c.quotation_id, table.c.data)
+        with self._poll_lock:
+            with self.engine.connect() as conn:
+                if self._seq is None:
+                    # First poll: the latest rows, so tokens from other workers resume here too
+                    rows = conn.execute(columns.order_by(table.c.id.desc()).limit(self.history)).all()[::-1]
+                else:
+                    rows = conn.execute(columns.where(table.c.id > self._seq)
+                                        .order_by(table.c.id).limit(self.history)).all()
+            with self._cond:
+                if rows:
+                    self._events.extend(tuple(row) for row in rows)
+                    self._seq = rows[-1][0]
+                    self._cond.notify_all()
+                elif self._seq is None:
+                    self._seq = 0
+
+    def _ensure_poller(self):
+        # Started lazily, so a preloaded app gets its thread in each worker
+        # rather than once in the gunicorn master
+        if self._poller_pid == os.getpid():
+            return
+        with self._poll_lock:
+            if self._poller_pid == os.getpid():
+                return
+            self._poller_pid = os.getpid()
+        if self._seq is None:
+            self.poll()
+        threading.Thread(target=self._run_poller, name='approval-stream-poller', daemon=True).start()
+
+    def _run_poller(self):
+        while not self._stop.wait(self.poll_seconds):
+            try:
+                self.poll()
+            except Exception:
+                logger.exception('Polling approval stream events failed')
+
+    # -- subscribers --
+
+    @property
+    def last_seq(self):
+        self._ensure_poller()
+        with self._cond:
+            return self._seq
+
+    def token(self, seq):
+        return str(seq)
+
+    def parse_token(self, token):
+        """Return the sequence number for a resume token, or None if it cannot be resumed"""
+        if not token or not token.isdigit():
+            return None
+        self._ensure_poller()
+        seq = int(token)
+        with self._cond:
+            if seq > self._seq:
+                return None
+            oldest = self._events[0][0] if self._events else self._seq + 1
+            if seq < oldest - 1:
+                return None
+        return seq
+
+    def wait(self, after_seq, timeout):
+        """Block until events newer than ``after_seq`` exist (or ``timeout`` passes).
+
+        Returns the list of ``(seq, kind, quotation_id, data)`` tuples, or None
+        when ``after_seq`` has been evicted from the history.
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: self._seq > after_seq, timeout=timeout)
+            if self._events and after_seq < self._events[0][0] - 1:
+                return None
+            return [event for event in self._events if event[0] > after_seq]
+
+    def open_stream(self):
+        """Reserve a stream slot; False when this worker already serves ``max_streams``"""
+        with self._cond:
+            if self._streams >= self.max_streams:
+                return False
+            self._streams += 1
+            return True
+
+    def close_stream(self):
+        with self._cond:
+            self._streams -= 1
+
+    @property
+    def open_streams(self):
+        with self._cond:
+            return self._streams
+
+
+def init_approval_stream(app):
+    app.config.setdefault('SSE_HISTORY', 1000)
+    app.config.setdefault('SSE_POLL_SECONDS', 1.0)
+    app.config.setdefault('SSE_MAX_STREAMS', 4)
+    with app.app_context():
+        engine = db.engine
+    app.extensions['approval_stream'] = ApprovalQueueBroker(
+        engine, history=app.config['SSE_HISTORY'], poll_seconds=app.config['SSE_POLL_SECONDS'],
+        max_streams=app.config['SSE_MAX_STREAMS'],
+    )
+
+
+def get_broker():
+    return current_app.extensions['approval_stream']
+
+
+def publish_approval_change(was_pending, data):
+    """Publish add/remove/update for a committed quotation given its to_dict() payload"""
+    if data['requiresApproval'] and not was_pending:
+        change = ('add', data['id'], data)
+    elif was_pending and not data['requiresApproval']:
+        change = ('remove', data['id'])
+    elif data['requiresApproval']:
+        change = ('update', data['id'], data)
+    else:
+        return
+    try:
+        get_broker().publish(*change)
+    except Exception:
+        # The quotation is already committed; open streams see it in their next snapshot
+        logger.exception('Publishing approval queue change for %s failed', data['id'])
+
+
+def format_event(kind, data, token=None):
+    lines = []
+    if token:
+        lines.append(f"id: {token}")
+    lines.append(f"event: {kind}")
+    lines.append(f"data: {json.dumps(data, default=str)}")
+    return '\n'.join(lines) + '\n\n'
@@ -0,0 +1,107 @@
+import logging
+from datetime import datetime, timedelta
+from functools import wraps
+
+import jwt
+from flask import request, jsonify, g, current_app
+
+from extensions import db
+from models import User
+
+logger = logging.getLogger(__name__)
+
+
+# Role-based access control decorator
+def role_required(*roles):
+    """Decorator to check if user has required role"""
+    def wrapper(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            token = None
+            if "Authorization" in request.headers:
+                token = request.headers["Authorization"].split(" ")[1]
+            if not token:
+                return jsonify({"error": "Token missing"}), 401
+            
+            try:
+                data = _decode_session_token(token)
+                current_user = db.session.get(User, data["user_id"])
+                if not current_user or current_user.role not in roles:
+                    return jsonify({"error": "Insufficient permissions"}), 403
+            except Exception as e:
+                return jsonify({"error": "Token invalid"}), 401
+            
+            g.current_user = current_user
+            return f(current_user, *args, **kwargs)
+        return decorated
+    return wrapper
+
+def _decode_session_token(token):
+    data = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=["HS256"])
+    if "purpose" in data:
+        # A single-purpose ticket (see generate_stream_ticket) is not a session
+        raise jwt.InvalidTokenError(f"{data['purpose']} ticket used as a session token")
+    return data
+
+def generate_token(user):
+    payload = {
+        "user_id": user.id,
+        "username": user.username,
+        "role": user.role,
+        "exp": datetime.utcnow() + timedelta(hours=12)
+    }
+    return jwt.encode(payload, current_app.config['SECRET_KEY'], algorithm="HS256")
+
+def token_required(f):
+    def decorator(*args, **kwargs):
+        token = None
+        if "Authorization" in request.headers:
+            token = request.headers["Authorization"].split(" ")[1]
+        if not token:
+            return jsonify({"error": "Token missing"}), 401
+        try:
+            data = _decode_session_token(token)
+            current_user = db.session.get(User, data["user_id"])
+            if not current_user:
+                return jsonify({"error": "User not found"}), 401
+        except Exception as e:
+            logger.error("Token validation error: %s", e)
+            return jsonify({"error": "Token invalid"}), 401
+        g.current_user = current_user
+        return f(current_user, *args, **kwargs)
+    return wraps(f)(decorator)
+
+def generate_stream_ticket(user):
+    """Short-lived ticket for opening the approval stream.
+
+    EventSource cannot send headers, so the stream URL carries this ticket
+    instead of the session token: URLs end up in access and proxy logs, and
+    a logged ticket is only good for opening a stream in the next
+    SSE_STREAM_TICKET_SECONDS.
+    """
+    payload = {
+        "user_id": user.id,
+        "purpose": "approval_stream",
+        "exp": datetime.utcnow() + timedelta(seconds=current_app.config.get("SSE_STREAM_TICKET_SECONDS", 60))
+    }
+    return jwt.encode(payload, current_app.config['SECRET_KEY'], algorithm="HS256")
+
+def stream_ticket_required(f):
+    """Authenticate with ``?ticket=`` from generate_stream_ticket (session tokens are refused)"""
+    def decorator(*args, **kwargs):
+        ticket = request.args.get("ticket")
+        if not ticket:
+            return jsonify({"error": "Ticket missing"}), 401
+        try:
+            data = jwt.decode(ticket, current_app.config['SECRET_KEY'], algorithms=["HS256"])
+            if data.get("purpose") != "approval_stream":
+                return jsonify({"error": "Ticket invalid"}), 401
+            current_user = db.session.get(User, data["user_id"])
+            if not current_user:
+                return jsonify({"error": "User not found"}), 401
+        except Exception as e:
+            logger.warning("Stream ticket validation error: %s", e)
+            return jsonify({"error": "Ticket invalid"}), 401
+        g.current_user = current_user
+        return f(current_user, *args, **kwargs)
+    return wraps(f)(decorator)
@@ -0,0 +1,147 @@
+import logging
+import os
+import re
+import sqlite3
+from datetime import datetime
+
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_SUFFIX = re.compile(r'-\d{8}T\d{6}Z\.db$')
+
+
+class BackupError(Exception):
+    """The backup could not be completed or failed verification"""
+
+
+def init_journal_mode(app, engines):
+    """Put SQLite databases in the configured journal mode (SQLITE_JOURNAL_MODE).
+
+    In WAL mode a backup only holds a read snapshot, so writers are never
+    blocked by it; in the default rollback-journal mode each backup step
+    holds a shared lock that writers must wait for.
+    """
+    app.config.setdefault('SQLITE_JOURNAL_MODE', 'wal')
+    mode = app.config['SQLITE_JOURNAL_MODE']
+    if not mode:
+        return
+
+    def set_journal_mode(dbapi_conn, connection_record):
+        dbapi_conn.execute(f'PRAGMA journal_mode={mode}')
+
+    for engine in engines:
+        if engine.dialect.name == 'sqlite' and engine.url.database not in (None, '', ':memory:'):
+            event.listen(engine, 'connect', set_journal_mode)
+
+
+def online_backup(source_path, dest_path, pages=1024, sleep=0.05, max_restarts=5, on_step=None):
+    """Copy a live SQLite database to ``dest_path`` with the online backup API.
+
+    Pages are copied ``pages`` at a time with ``sleep`` seconds between
+    steps. In WAL mode every step reads from one pinned snapshot, so writers
+    carry on in the WAL and the copy is never restarted. In rollback-journal
+    mode writers get the lock between steps, but each of their commits
+    restarts the copy; after ``max_restarts`` restarts the rest is copied in
+    one step. The copy is written next to ``dest_path``, checked, and
+    renamed into place. ``on_step(remaining, total)`` is called after every
+    step, between page batches.
+    """
+    partial = dest_path + '.partial'
+    if os.path.exists(partial):
+        os.remove(partial)
+    state = {'remaining': None, 'restarts': 0, 'steps': 0}
+
+    class _Restarted(Exception):
+        pass
+
+    def progress(status, remaining, total):
+        state['steps'] += 1
+        if state['remaining'] is not None and remaining > state['remaining']:
+            state['restarts'] += 1
+            if state['restarts'] > max_restarts:
+                raise _Restarted()
+        state['remaining'] = remaining
+        if on_step is not None:
+            on_step(remaining, total)
+
+    source = sqlite3.connect(source_path, isolation_level=None)
+    dest = sqlite3.connect(partial)
+    try:
+        if source.execute('PRAGMA journal_mode').fetchone()[0] == 'wal':
+            source.execute('BEGIN')
+            source.execute('SELECT COUNT(*) FROM sqlite_master').fetchone()
+        try:
+            source.backup(dest, pages=pages, progress=progress, sleep=sleep)
+        except _Restarted:
+            logger.warning("Backup of %s restarted %s times; copying the rest in one step",
+                           source_path, state['restarts'] - 1)
+            source.backup(dest, pages=-1)
+        # Snapshots are single self-contained files, whatever mode the source uses
+        dest.execute('PRAGMA journal_mode=DELETE')
+    finally:
+        dest.close()
+        source.close()
+
+    report = verify(partial)
+    os.replace(partial, dest_path)
+    report.update(path=dest_path, steps=state['steps'], restarts=state['restarts'])
+    return report
+
+
+def verify(path):
+    """Run ``PRAGMA integrity_check`` and count the rows of every table"""
+    if not os.path.exists(path):
+        raise BackupError(f'{path} does not exist')
+    conn = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+    try:
+        problems = [row[0] for row in conn.execute('PRAGMA integrity_check')]
+        if problems != ['ok']:
+            raise BackupError(f"{path} failed integrity_check: {'; '.join(problems[:5])}")
+        tables = [row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' ORDER BY name"
+        )]
+        counts = {t: conn.execute(f'SELECT COUNT(*) FROM "{t}"').fetchone()[0] for t in tables}
+    finally:
+        conn.close()
+    return {'path': path, 'bytes': os.path.getsize(path), 'counts': counts}
+
+
+def snapshot_path(backup_dir, source_path, now=None):
+    stem = os.path.splitext(os.path.basename(source_path))[0]
+    stamp = (now or datetime.utcnow()).strftime('%Y%m%dT%H%M%SZ')
+    return os.path.join(backup_dir, f'{stem}-{stamp}.db')
+
+
+def prune_snapshots(backup_dir, source_path, keep):
+    """Delete all but the newest ``keep`` snapshots of ``source_path``; returns the removed paths"""
+    stem = os.path.splitext(os.path.basename(source_path))[0]
+    snapshots = sorted(
+        name for name in os.listdir(backup_dir)
+        if name.startswith(stem + '-') and SNAPSHOT_SUFFIX.match(name[len(stem):])
+    )
+    removed = [os.path.join(backup_dir, name) for name in snapshots[:max(0, len(snapshots) - keep)]]
+    for path in removed:
+        os.remove(path)
+    return removed
+
+
+def restore(snapshot, dest_path, pages=1024):
+    """Verify ``snapshot`` and copy it over the database at ``dest_path``.
+
+    The copy goes through the backup API, so connections that are still
+    open on ``dest_path`` see the restored contents rather than a replaced
+    file. Row counts are compared afterwards.
+    """
+    expected = verify(snapshot)
+    source = sqlite3.connect(f'file:{snapshot}?mode=ro', uri=True)
+    dest = sqlite3.connect(dest_path)
+    try:
+        source.backup(dest, pages=pages)
+    finally:
+        dest.close()
+        source.close()
+    restored = verify(dest_path)
+    if restored['counts'] != expected['counts']:
+        raise BackupError(f"row counts differ after restore: {restored['counts']} != {expected['counts']}")
+    return restored
@@ -0,0 +1,114 @@
+"""Write latency while a large database is being backed up.
+
+Usage: python bench_backup.py [size_mb] [journal_mode]
+
+Builds a database of roughly ``size_mb`` (default 2048) in ``journal_mode``
+(default wal, as the app uses), then runs a writer that commits one small
+row every 20 ms while each of these runs:
+
+``idle``         no backup (baseline)
+``locked copy``  file copy while holding the write lock (the old way of
+                 getting a consistent copy)
+``one step``     backup API, whole file in a single step
+``incremental``  backup.online_backup() with the configured page batches
+"""
+import os
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+import backup
+from config import Config
+
+
+def build(path, size_mb, journal_mode):
+    conn = sqlite3.connect(path)
+    conn.execute(f'PRAGMA journal_mode={journal_mode}')
+    conn.execute('PRAGMA synchronous=OFF')
+    conn.execute('CREATE TABLE quotation (id INTEGER PRIMARY KEY, payload BLOB)')
+    conn.execute('CREATE TABLE quotation_event (id INTEGER PRIMARY KEY, created REAL, payload TEXT)')
+    rows = size_mb * 1024 // 4
+    for start in range(0, rows, 10_000):
+        conn.executemany('INSERT INTO quotation (payload) VALUES (randomblob(4000))',
+                         [()] * min(10_000, rows - start))
+        conn.commit()
+    conn.close()
+
+
+def measure(path, label, run_backup):
+    stop = threading.Event()
+    latencies = []
+
+    def writer():
+        conn = sqlite3.connect(path, timeout=60)
+        while not stop.is_set():
+            started = time.perf_counter()
+            conn.execute('INSERT INTO quotation_event (created, payload) VALUES (?, ?)', (time.time(), 'x' * 200))
+            conn.commit()
+            latencies.append((time.perf_counter() - started) * 1000)
+            time.sleep(0.02)
+        conn.close()
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    time.sleep(0.5)
+    started = time.perf_counter()
+    detail = run_backup()
+    elapsed = time.perf_counter() - started
+    time.sleep(0.5)
+    stop.set()
+    thread.join()
+
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+    print(f"{label:>12}: {elapsed:6.1f}s  writes={len(latencies):5d}  p50={statistics.median(latencies):7.1f} ms  "
+          f"p99={p99:8.1f} ms  max={latencies[-1]:8.1f} ms  {detail}")
+
+
+def main(size_mb, journal_mode):
+    scratch = tempfile.mkdtemp()
+    path = os.path.join(scratch, 'quotations.db')
+    build(path, size_mb, journal_mode)
+    print(f"{os.path.getsize(path) / 2**20:.0f} MB database, journal_mode={journal_mode}, "
+          f"{Config.BACKUP_PAGES_PER_STEP} pages/step, {Config.BACKUP_SLEEP_SECONDS}s sleep")
+    dest = os.path.join(scratch, 'copy.db')
+
+    def idle():
+        time.sleep(3)
+        return ''
+
+    def locked_copy():
+        conn = sqlite3.connect(path, isolation_level=None)
+        conn.execute('BEGIN IMMEDIATE')
+        shutil.copyfile(path, dest)
+        conn.execute('COMMIT')
+        conn.close()
+        return ''
+
+    def one_step():
+        source, target = sqlite3.connect(path), sqlite3.connect(dest)
+        source.backup(target)
+        target.close()
+        source.close()
+        return ''
+
+    def incremental():
+        report = backup.online_backup(path, dest, pages=Config.BACKUP_PAGES_PER_STEP,
+                                      sleep=Config.BACKUP_SLEEP_SECONDS)
+        return f"steps={report['steps']} restarts={report['restarts']}"
+
+    for label, run in (('idle', idle), ('locked copy', locked_copy),
+                       ('one step', one_step), ('incremental', incremental)):
+        measure(path, label, run)
+        if os.path.exists(dest):
+            os.remove(dest)
+    shutil.rmtree(scratch)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2048,
+         sys.argv[2] if len(sys.argv) > 2 else 'wal')
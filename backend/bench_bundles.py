@@ -0,0 +1,62 @@
+"""Latency of the package bundle optimizer on the largest selections.
+
+Usage: python bench_bundles.py [iterations]
+
+For every category/region/band slot of pricing_data.json, selects every
+service the slot prices (the largest catalog a quotation can draw from),
+each with three sub-services, and times ``optimize_bundle`` from the
+headers to the result. Also times POST /api/quotations/optimize-bundle
+end to end for the largest slot.
+"""
+import statistics
+import sys
+import time
+
+from app import create_app
+from bundles import optimize_bundle, selected_services
+from pricing import compile_rate_card, load_pricing_data
+
+app = create_app({'RATELIMIT_ENABLED': False, 'CONCURRENCY_LIMITS': {}})
+rate_card = compile_rate_card(app.config['PRICING_DATA_PATH'])
+
+
+def headers_for(services):
+    return [{'header': 'All services', 'services': [
+        {'id': name, 'label': name, 'subServices': [{'text': f'Sub {k}'} for k in range(3)]}
+        for name in services if name not in rate_card.package_names
+    ]}]
+
+
+if __name__ == '__main__':
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    path = app.config['PRICING_DATA_PATH']
+    data = load_pricing_data(path)
+
+    timings, largest = [], None
+    for category, regions in data.items():
+        for region, bands in regions.items():
+            for band, services in bands.items():
+                headers = headers_for(services)
+                if largest is None or len(services) > len(largest[3]):
+                    largest = (category, region, band, services)
+                for _ in range(iterations):
+                    started = time.perf_counter()
+                    optimize_bundle(category, region, band, selected_services(headers, rate_card), rate_card)
+                    timings.append((time.perf_counter() - started) * 1000)
+
+    category, region, band, services = largest
+    body = {'developerType': category, 'projectRegion': region, 'band': band, 'headers': headers_for(services)}
+    client = app.test_client()
+    result = client.post('/api/quotations/optimize-bundle', json=body).json['data']
+    started = time.perf_counter()
+    for _ in range(iterations):
+        client.post('/api/quotations/optimize-bundle', json=body)
+    endpoint_ms = (time.perf_counter() - started) / iterations * 1000
+
+    timings.sort()
+    print(f"{len(timings) // iterations} slots, up to {len(selected_services(body['headers'], rate_card))} services each")
+    print(f"optimize_bundle: p50 {statistics.median(timings):.3f} ms  "
+          f"p99 {timings[int(len(timings) * 0.99)]:.3f} ms  max {timings[-1]:.3f} ms")
+    print(f"POST /api/quotations/optimize-bundle ({category}, {region}, {band}): {endpoint_ms:.2f} ms")
+    print(f"  standalone {result['standaloneTotal']:,.0f}  optimized {result['optimizedTotal']:,.0f}  "
+          f"savings {result['savings']:,.0f}  via {[i['name'] for i in result['items'] if i['type'] == 'package']}")
@@ -0,0 +1,129 @@
+"""Cost of duplicate detection: the signature lookup and the clustering job.
+
+Usage: python bench_duplicates.py [quotations]
+
+Inserts ``quotations`` (default 20000) for a pool of developers and
+projects. About one in five repeats an earlier deal with different casing,
+company suffixes and mobile formatting, or with a misspelt project name.
+Reports:
+
+1. ``find_similar`` (one range scan on the signature index) against
+   filtering every row's signature in Python, per lookup.
+2. ``duplicates.cluster`` with blocking keys: pairs compared and time,
+   against the all-pairs comparison count and its time projected from the
+   measured cost of one comparison.
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+from app import create_app
+from commands import init_db
+from extensions import db
+from models import Quotation
+import duplicates
+
+scratch = tempfile.mkdtemp()
+app = create_app({
+    'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.join(scratch, 'bench.db'),
+    'SQLALCHEMY_BINDS': {'archive': 'sqlite:///' + os.path.join(scratch, 'archive.db')},
+    'RATELIMIT_ENABLED': False,
+})
+
+REGIONS = ['Mumbai Suburban', 'Mumbai City', 'Pune', 'Thane', 'Nashik', 'Nagpur']
+WORDS = ['Sky', 'Green', 'Royal', 'Silver', 'Lake', 'Park', 'Heights', 'Vista', 'Palm', 'Crest', 'Orchid', 'Sun']
+
+
+def variant(name, rng):
+    """The same name as a different salesperson might type it"""
+    name = rng.choice([name, name.upper(), name.lower()])
+    return name + rng.choice(['', ' Pvt Ltd', ' Private Limited', ' LLP', '.'])
+
+
+def populate(count, rng):
+    rows, deals = [], []
+    for n in range(count):
+        if deals and rng.random() < 0.2:
+            region, developer, project, mobile = rng.choice(deals)
+            developer = variant(developer, rng)
+            if rng.random() < 0.3:
+                project = project + ' ' + rng.choice(WORDS)  # misspelt or extended project name
+            mobile = rng.choice([mobile, '+91 ' + mobile, mobile[:5] + ' ' + mobile[5:]])
+        else:
+            region = rng.choice(REGIONS)
+            developer = f'{rng.choice(WORDS)} {rng.choice(WORDS)} Developers {n}'
+            project = f'{rng.choice(WORDS)} {rng.choice(WORDS)} {rng.randrange(100)}'
+            mobile = str(rng.randrange(7000000000, 9999999999))
+            deals.append((region, developer, project, mobile))
+        rows.append({
+            'id': f'BENCH-{n:07d}', 'developer_type': 'cat1', 'project_region': region, 'plot_area': 300,
+            'developer_name': developer, 'project_name': project, 'contact_mobile': mobile,
+            'duplicate_signature': duplicates.signature(region, developer, project, None, mobile),
+            'applicable_term_ids': [], 'custom_term_ids': [], 'version': 1,
+        })
+        if len(rows) == 5000:
+            db.session.execute(Quotation.__table__.insert(), rows)
+            rows = []
+    if rows:
+        db.session.execute(Quotation.__table__.insert(), rows)
+    db.session.commit()
+    return deals
+
+
+def per_call_ms(fn, iterations):
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - started) / iterations * 1000
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    rng = random.Random(7)
+
+    with app.app_context():
+        init_db()
+        deals = populate(count, rng)
+        probes = [rng.choice(deals) for _ in range(200)]
+
+        def indexed():
+            region, developer, project, mobile = rng.choice(probes)
+            duplicates.find_similar(region, developer, project, mobile=mobile)
+
+        def scanned():
+            region, developer, project, _ = rng.choice(probes)
+            prefix = duplicates.signature_prefix(region, developer, project)
+            [row for row in db.session.execute(db.select(Quotation.id, Quotation.duplicate_signature))
+             if row[1].startswith(prefix)]
+
+        lookup = per_call_ms(indexed, 500)
+        scan = per_call_ms(scanned, 20)
+
+        table = Quotation.__table__
+        rows = [tuple(row) for row in db.session.execute(db.select(
+            table.c.id, table.c.project_region, table.c.developer_name, table.c.project_name,
+            table.c.rera_number, table.c.contact_mobile))]
+
+    started = time.perf_counter()
+    clusters, compared = duplicates.cluster(rows)
+    clustered = time.perf_counter() - started
+
+    # Cost of one comparison, for the all-pairs projection
+    sample = [{
+        'region': duplicates.normalize(r[1]), 'developer': frozenset(duplicates._tokens(r[2])),
+        'project': frozenset(duplicates._tokens(r[3])), 'rera': '',
+    } for r in rows[:2000]]
+    started = time.perf_counter()
+    for i in range(1, len(sample)):
+        duplicates._is_match(sample[i - 1], sample[i])
+    per_pair = (time.perf_counter() - started) / (len(sample) - 1)
+    all_pairs = len(rows) * (len(rows) - 1) // 2
+
+    print(f"{count} quotations, {len(clusters)} duplicate clusters covering {sum(map(len, clusters))} rows")
+    print(f"signature lookup (index):     {lookup:8.2f} ms")
+    print(f"signature lookup (scan):      {scan:8.2f} ms  ({scan / lookup:.0f}x)")
+    print(f"cluster with blocking keys:   {clustered:8.2f} s   {compared} pairs compared")
+    print(f"all pairs (projected):        {all_pairs * per_pair:8.2f} s   {all_pairs} pairs "
+          f"({all_pairs / max(compared, 1):.0f}x the comparisons)")
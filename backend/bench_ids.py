@@ -0,0 +1,50 @@
+"""Insert throughput with random vs time-ordered primary keys.
+
+Usage: python bench_ids.py [preload_rows] [measured_rows]
+
+Builds a table shaped like ``quotation`` (TEXT primary key plus a row of
+payload), preloads it, then times further inserts in 1000-row transactions.
+Random keys land all over the primary-key B-tree; ordered keys append to
+its right edge.
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import uuid
+
+from ids import UlidGenerator
+
+PAYLOAD = 'x' * 400
+
+
+def run(name, make_id, preload, measured):
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    conn = sqlite3.connect(path)
+    conn.execute('PRAGMA cache_size = -8000')  # 8 MB: smaller than the index, as in production
+    conn.execute('CREATE TABLE quotation (id VARCHAR(50) PRIMARY KEY, payload TEXT)')
+
+    def insert(count):
+        for start in range(0, count, 1000):
+            rows = [(make_id('QUO'), PAYLOAD) for _ in range(min(1000, count - start))]
+            conn.executemany('INSERT INTO quotation VALUES (?, ?)', rows)
+            conn.commit()
+
+    insert(preload)
+    started = time.perf_counter()
+    insert(measured)
+    elapsed = time.perf_counter() - started
+    conn.close()
+    size = os.path.getsize(path)
+    os.remove(path)
+    print(f"{name:>8}: {measured / elapsed:10.0f} rows/s   file {size / 1e6:7.1f} MB")
+
+
+if __name__ == '__main__':
+    preload = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+    measured = int(sys.argv[2]) if len(sys.argv) > 2 else 100_000
+    print(f"preloaded {preload} rows, timing {measured} more")
+    run('random', lambda prefix: f"{prefix}-{uuid.uuid4().hex.upper()}", preload, measured)
+    run('ulid', UlidGenerator(), preload, measured)
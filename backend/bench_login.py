@@ -0,0 +1,77 @@
+"""Latency of a non-login endpoint during a login burst.
+
+Usage: python bench_login.py [logins] [request_threads]
+
+Simulates a threaded worker (like gunicorn's gthread) with ``request_threads``
+request threads. ``logins`` logins arrive at once while a probe keeps calling
+GET /api/quotations every 20 ms; the probe latency includes the
+time spent waiting for a free request thread. The run is repeated with
+hashing inline in the request thread and on the bounded hashing executor.
+"""
+import os
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app import create_app
+from commands import init_db
+from extensions import db
+from models import User
+from password_hashing import password_hasher
+
+scratch = tempfile.mkdtemp()
+app = create_app({
+    'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.join(scratch, 'bench.db'),
+    'SQLALCHEMY_BINDS': {'archive': 'sqlite:///' + os.path.join(scratch, 'archive.db')},
+    'RATELIMIT_ENABLED': False,  # measure hashing, not the limiter
+})
+
+
+def run(label, logins, request_threads):
+    pool = ThreadPoolExecutor(max_workers=request_threads)
+    client = app.test_client
+
+    def login():
+        return client().post('/api/login', json={'username': 'bench', 'password': 'bench-password'}).status_code
+
+    def probe(submitted):
+        client().get('/api/quotations')
+        return time.perf_counter() - submitted
+
+    started = time.perf_counter()
+    login_futures = [pool.submit(login) for _ in range(logins)]
+    probe_futures = []
+    while not all(f.done() for f in login_futures):
+        probe_futures.append(pool.submit(probe, time.perf_counter()))
+        time.sleep(0.02)
+    burst = time.perf_counter() - started
+    latencies = sorted(f.result() * 1000 for f in probe_futures)
+    statuses = [f.result() for f in login_futures]
+    pool.shutdown()
+
+    p95 = latencies[int(len(latencies) * 0.95) - 1] if latencies else 0
+    print(f"{label:>9}: burst {burst:5.1f}s  logins ok={statuses.count(200)} 503={statuses.count(503)}  "
+          f"probe p50={statistics.median(latencies):7.1f} ms  p95={p95:7.1f} ms  max={latencies[-1]:7.1f} ms")
+
+
+if __name__ == '__main__':
+    logins = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    request_threads = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+
+    with app.app_context():
+        init_db()
+        if not User.query.filter_by(username='bench').first():
+            user = User(username='bench', role='user')
+            user.set_password('bench-password')
+            db.session.add(user)
+            db.session.commit()
+
+    print(f"{logins} logins, {request_threads} request threads, {os.cpu_count()} CPUs")
+    app.config['PASSWORD_HASH_OFFLOAD'] = False
+    password_hasher.init_app(app)
+    run('inline', logins, request_threads)
+    app.config['PASSWORD_HASH_OFFLOAD'] = True
+    password_hasher.init_app(app)
+    run('offloaded', logins, request_threads)
@@ -0,0 +1,102 @@
+"""Concurrent quotation writes: one SQLite file against one file per region.
+
+Usage: python bench_partitions.py [writers] [seconds]
+
+Starts ``writers`` processes (default 12), spread round-robin over the
+rate card's regions. For ``seconds`` (default 10) each one creates
+quotations through the routing session of partitions.py, one commit per
+quotation. Each commit also writes the quotation's created event and first
+revision. The run is done twice, both times in WAL mode:
+
+1. single file: every region in one database, so all writers share one
+   write lock;
+2. partitioned: one database per region, so writers only wait for writers
+   of the same region.
+
+Reports commits per second and p50/p99 commit latency, which includes the
+time spent waiting for the write lock.
+"""
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+from app import create_app
+from backup import init_journal_mode
+from models import Quotation
+from partitions import RegionPartitions, rate_card_regions
+
+
+def make_app(scratch):
+    return create_app({
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.join(scratch, 'bench.db'),
+        'SQLALCHEMY_BINDS': {'archive': 'sqlite:///' + os.path.join(scratch, 'archive.db')},
+        'RATELIMIT_ENABLED': False,
+    })
+
+
+def open_partitions(app, scratch, layout):
+    regions = rate_card_regions(app.config['PRICING_DATA_PATH'])
+    if layout == 'single':
+        partitions = RegionPartitions.single_file(os.path.join(scratch, 'single.db'), regions)
+    else:
+        partitions = RegionPartitions.from_directory(os.path.join(scratch, 'partitions'), regions)
+    init_journal_mode(app, partitions.engines.values())
+    return partitions, regions
+
+
+def writer(scratch, layout, number, seconds, results):
+    app = make_app(scratch)
+    with app.app_context():
+        partitions, regions = open_partitions(app, scratch, layout)
+        region = regions[number % len(regions)]
+        latencies, n = [], 0
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            with partitions.Session() as session:
+                session.add(Quotation(
+                    id=f'{layout.upper()}-{number:02d}-{n:06d}', developer_type='cat1', project_region=region,
+                    plot_area=300, developer_name='Bench', total_amount=1000, discount_amount=0,
+                    discount_percent=0, applicable_term_ids=[], custom_term_ids=[],
+                ))
+                session.commit()
+            latencies.append((time.perf_counter() - started) * 1000)
+            n += 1
+        partitions.dispose()
+    results.put(latencies)
+
+
+def run(scratch, layout, writers, seconds):
+    app = make_app(scratch)
+    with app.app_context():
+        partitions, _ = open_partitions(app, scratch, layout)
+        partitions.create_all()
+        files = len(partitions.engines)
+        partitions.dispose()
+
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    processes = [context.Process(target=writer, args=(scratch, layout, n, seconds, results)) for n in range(writers)]
+    for p in processes:
+        p.start()
+    latencies = sorted(ms for _ in processes for ms in results.get())
+    for p in processes:
+        p.join()
+    return files, latencies
+
+
+if __name__ == '__main__':
+    writers = int(sys.argv[1]) if len(sys.argv) > 1 else 12
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 10
+
+    # Spawned writers re-import this module, so the directory is passed to them
+    scratch = tempfile.mkdtemp()
+    print(f"{writers} writer processes, {seconds:.0f}s each, {os.cpu_count()} CPUs")
+    for layout, label in (('single', 'single file'), ('partitioned', 'partitioned')):
+        files, latencies = run(scratch, layout, writers, seconds)
+        p50 = latencies[len(latencies) // 2]
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+        print(f"{label + ':':13} {files:2} files  {len(latencies) / seconds:7.0f} commits/s  "
+              f"p50 {p50:6.1f} ms  p99 {p99:7.1f} ms")
@@ -0,0 +1,113 @@
+"""Throughput of ``flask reprice`` and how long it holds the write lock.
+
+Usage: python bench_reprice.py [quotations] [workers]
+
+Inserts ``quotations`` (default 20000) priced draft and pending quotations
+of three headers and eight services, raises every rate in a copy of
+pricing_data.json by 10%, then reprices them all: once as a dry run, then
+for real with ``workers`` pricing processes (default: CPU count). Reports
+quotations per second, the projected time for 100k and the longest write
+transaction (first flush to commit), which is the longest any other writer
+can be made to wait.
+"""
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+from sqlalchemy import event
+
+from app import create_app
+from commands import init_db
+from extensions import db
+from models import Quotation
+from pricing import finalize_pricing, price_headers, compile_rate_card
+import reprice
+
+scratch = tempfile.mkdtemp()
+app = create_app({
+    'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.join(scratch, 'bench.db'),
+    'SQLALCHEMY_BINDS': {'archive': 'sqlite:///' + os.path.join(scratch, 'archive.db')},
+    'RATELIMIT_ENABLED': False,
+})
+
+
+def populate(count, rng):
+    path = app.config['PRICING_DATA_PATH']
+    data, rate_card = json.load(open(path)), compile_rate_card(path)
+    rows = []
+    for n in range(count):
+        category = rng.choice(list(data))
+        region = rng.choice(list(data[category]))
+        services = [s for s in data[category][region]['0-500'] if not s.startswith('Package')]
+        headers = [{'header': f'Header {h}', 'services': [
+            {'id': f'{h}-{i}', 'label': rng.choice(services), 'subServices': [{'text': 'Form'}] * rng.randrange(3)}
+            for i in range(8)
+        ]} for h in range(3)]
+        breakdown, _, _ = price_headers(category, region, 300, headers, rate_card)
+        _, discount, percent, total = finalize_pricing(breakdown, None, rng.choice([0, 0, 5]))
+        rows.append({
+            'id': f'BENCH-{n:07d}', 'developer_type': category, 'project_region': region, 'plot_area': 300,
+            'developer_name': 'Bench', 'headers': headers, 'pricing_breakdown': breakdown,
+            'total_amount': round(total, 2), 'discount_amount': round(discount, 2),
+            'discount_percent': round(percent, 4), 'status': rng.choice(['draft', 'pending_approval']),
+            'applicable_term_ids': [], 'custom_term_ids': [], 'version': 1,
+        })
+        if len(rows) == 5000:
+            db.session.execute(Quotation.__table__.insert(), rows)
+            rows = []
+    if rows:
+        db.session.execute(Quotation.__table__.insert(), rows)
+    db.session.commit()
+
+
+def raised_rate_card(factor):
+    data = json.load(open(app.config['PRICING_DATA_PATH']))
+    for regions in data.values():
+        for bands in regions.values():
+            for services in bands.values():
+                for entry in services.values():
+                    entry['amount'] = round(float(entry.get('amount') or 0) * factor)
+    path = os.path.join(scratch, 'pricing_data.json')
+    with open(path, 'w') as f:
+        json.dump(data, f)
+    return path
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else (os.cpu_count() or 1)
+
+    with app.app_context():
+        init_db()
+        populate(count, random.Random(3))
+        app.config['PRICING_DATA_PATH'] = raised_rate_card(1.1)
+
+        started = time.perf_counter()
+        dry = reprice.reprice_quotations(workers=workers, dry_run=True).to_dict()
+        dry_s = time.perf_counter() - started
+
+        transactions = []
+        flush_started = {}
+
+        @event.listens_for(db.session, 'before_flush')
+        def _flush(session, context, instances):
+            flush_started.setdefault('t', time.perf_counter())
+
+        @event.listens_for(db.session, 'after_commit')
+        def _commit(session):
+            if 't' in flush_started:
+                transactions.append((time.perf_counter() - flush_started.pop('t')) * 1000)
+
+        started = time.perf_counter()
+        real = reprice.reprice_quotations(workers=workers).to_dict()
+        real_s = time.perf_counter() - started
+
+    print(f"{count} open quotations, rates +10%, {workers} pricing processes, {os.cpu_count()} CPUs")
+    print(f"dry run:  {dry['changed']} would change, {dry_s:.1f}s ({count / dry_s:.0f}/s)")
+    print(f"reprice:  {real['written']} written, {real['conflicts']} conflicts, {real_s:.1f}s "
+          f"({count / real_s:.0f}/s, 100k in ~{100_000 / (count / real_s) / 60:.1f} min)")
+    print(f"write transactions: {len(transactions)}, longest {max(transactions):.0f} ms, "
+          f"mean {sum(transactions) / len(transactions):.0f} ms")
@@ -0,0 +1,113 @@
+"""Storage of delta-encoded revisions against full snapshots, and rebuild cost.
+
+Usage: python bench_revisions.py [quotations] [edits]
+
+Each quotation (four headers of eight services, a pricing breakdown and a
+few terms) is edited ``edits`` times through the ORM the way the UI does:
+one service's price, a discount, a header added or a term changed per save.
+Reports the bytes stored in quotation_revision against keeping every
+revision as a full zlib-compressed (and as a raw) JSON snapshot, and the
+time to rebuild the most expensive revision (the one just before a
+checkpoint).
+"""
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import zlib
+
+from sqlalchemy import func
+from sqlalchemy.orm.attributes import flag_modified
+
+from app import create_app
+from commands import init_db
+from extensions import db
+from models import Quotation, QuotationRevision
+import revisions
+
+scratch = tempfile.mkdtemp()
+app = create_app({
+    'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.join(scratch, 'bench.db'),
+    'SQLALCHEMY_BINDS': {'archive': 'sqlite:///' + os.path.join(scratch, 'archive.db')},
+    'RATELIMIT_ENABLED': False,
+})
+
+
+def new_quotation(n):
+    headers = [
+        {'header': f'Header {h}', 'services': [
+            {'id': f's{h}-{i}', 'label': f'Service {h}-{i}', 'baseAmount': 10000 + 500 * i,
+             'totalAmount': 10000 + 500 * i, 'subServices': [{'id': f'{h}-{i}-{k}', 'text': f'Form {k}'} for k in range(3)]}
+            for i in range(8)
+        ]}
+        for h in range(4)
+    ]
+    q = Quotation(
+        id=f'BENCH-{n:05d}', developer_type='cat1', project_region='Mumbai Suburban', plot_area=1800,
+        developer_name='Bench Developers', headers=headers,
+        pricing_breakdown=[{'header': h['header'], 'subtotal': 100000} for h in headers],
+        total_amount=400000, discount_amount=0, discount_percent=0, service_summary='Bench quotation',
+        status='draft', applicable_term_ids=[], custom_term_ids=[],
+    )
+    q.set_terms(applicable=['General T&C', 'Payment within 30 days'], custom=[])
+    return q
+
+
+def edit(q, rng):
+    kind = rng.randrange(4)
+    if kind == 0:
+        service = rng.choice(rng.choice(q.headers[:4])['services'])
+        service['totalAmount'] = rng.randrange(5000, 50000)
+        flag_modified(q, 'headers')
+    elif kind == 1:
+        q.discount_percent = rng.randrange(0, 15)
+        q.total_amount = 400000 * (1 - q.discount_percent / 100)
+    elif kind == 2:
+        q.headers.append({'header': f'Extra {len(q.headers)}', 'services': []})
+    else:
+        q.set_terms(custom=[f'Custom term {rng.randrange(100)}'])
+
+
+if __name__ == '__main__':
+    quotations = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    edits = int(sys.argv[2]) if len(sys.argv) > 2 else 40
+    rng = random.Random(7)
+
+    with app.app_context():
+        init_db()
+        for n in range(quotations):
+            q = new_quotation(n)
+            db.session.add(q)
+            db.session.commit()
+            for _ in range(edits):
+                edit(q, rng)
+                db.session.commit()
+
+        # What storing every revision whole would have cost
+        full_compressed = full_raw = 0
+        for rev in QuotationRevision.query.order_by(QuotationRevision.quotation_id, QuotationRevision.revision):
+            if rev.is_checkpoint:
+                doc = json.loads(zlib.decompress(rev.payload))
+            else:
+                doc = revisions.apply(doc, json.loads(zlib.decompress(rev.payload)))
+            raw = json.dumps(doc, separators=(',', ':')).encode('utf-8')
+            full_raw += len(raw)
+            full_compressed += len(zlib.compress(raw))
+
+        count, stored = db.session.query(func.count(), func.sum(func.length(QuotationRevision.payload))).one()
+        every = app.config['REVISION_CHECKPOINT_EVERY']
+        worst = every  # last delta before the second checkpoint
+        started = time.perf_counter()
+        for n in range(quotations):
+            revisions.rebuild(f'BENCH-{n:05d}', worst)
+        rebuild_ms = (time.perf_counter() - started) / quotations * 1000
+
+    print(f"{count} revisions of {quotations} quotations (checkpoint every {every})")
+    print(f"delta-encoded:             {stored / 1024:9.1f} KiB  {stored / count:7.0f} B/revision")
+    print(f"full snapshots, zlib:      {full_compressed / 1024:9.1f} KiB  {full_compressed / count:7.0f} B/revision"
+          f"  ({full_compressed / stored:.1f}x)")
+    print(f"full snapshots, raw JSON:  {full_raw / 1024:9.1f} KiB  {full_raw / count:7.0f} B/revision"
+          f"  ({full_raw / stored:.1f}x)")
+    print(f"rebuild revision {worst} (1 checkpoint + {every - 1} deltas): {rebuild_ms:.2f} ms")
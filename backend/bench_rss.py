@@ -0,0 +1,110 @@
+"""Per-worker memory with and without master preloading.
+
+Usage: python bench_rss.py [workers] [requests_per_worker]
+
+``lazy``: the master only imports the code; every worker builds its own app
+and rate card after the fork (what happens without preload_app).
+``preload``: the master builds the app and rate card, then gc.freeze()s the
+heap before forking (gunicorn.conf.py).
+
+Each worker serves calculate-pricing requests, runs a full gc.collect() and
+reports its Pss and Private_Dirty from /proc/self/smaps_rollup. Private
+memory is what each additional worker costs.
+"""
+import gc
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+BODY = {
+    'developerType': 'Category 2',
+    'projectRegion': 'Navi Mumbai',
+    'plotArea': 1800,
+    'headers': [{'header': 'Project Registration', 'services': [
+        {'id': 1, 'label': 'Project Registration', 'subServices': [{'text': 'Form 1'}]},
+        {'id': 2, 'label': 'SRO Membership'},
+    ]}],
+}
+
+
+def smaps_rollup():
+    fields = {}
+    with open('/proc/self/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == 'kB':
+                fields[parts[0].rstrip(':')] = int(parts[1])
+    return fields
+
+
+def worker_main(make_app, app, requests, out):
+    if app is None:
+        app = make_app()
+    client = app.test_client()
+    for _ in range(requests):
+        client.post('/api/quotations/calculate-pricing', json=BODY)
+    gc.collect()
+    mem = smaps_rollup()
+    os.write(out, (json.dumps({'pss': mem['Pss'], 'private': mem['Private_Dirty']}) + '\n').encode())
+    os._exit(0)
+
+
+def run_mode(mode, workers, requests):
+    from app import create_app
+    from preload import preload_shared_data, freeze_shared_heap
+
+    scratch = tempfile.mkdtemp()
+
+    def make_app():
+        return create_app({
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.join(scratch, 'bench.db'),
+            'SQLALCHEMY_BINDS': {'archive': 'sqlite:///' + os.path.join(scratch, 'archive.db')},
+            'RATELIMIT_ENABLED': False,
+        })
+
+    app = None
+    if mode == 'preload':
+        gc.disable()
+        app = make_app()
+        preload_shared_data(app)
+        freeze_shared_heap()
+
+    read_end, write_end = os.pipe()
+    pids = []
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_end)
+            if mode == 'preload':
+                gc.enable()
+            worker_main(make_app, app, requests, write_end)
+        pids.append(pid)
+    os.close(write_end)
+    for pid in pids:
+        os.waitpid(pid, 0)
+    with os.fdopen(read_end) as f:
+        results = [json.loads(line) for line in f]
+    print(json.dumps(results))
+
+
+def main(workers, requests):
+    print(f"{workers} workers, {requests} requests each")
+    for mode in ('lazy', 'preload'):
+        out = subprocess.run([sys.executable, __file__, '--mode', mode, str(workers), str(requests)],
+                             check=True, capture_output=True, text=True).stdout
+        results = json.loads(out.strip().splitlines()[-1])
+        private = [r['private'] / 1024 for r in results]
+        pss = [r['pss'] / 1024 for r in results]
+        print(f"{mode:>8}: private dirty/worker median {statistics.median(private):6.1f} MB   "
+              f"Pss/worker median {statistics.median(pss):6.1f} MB   total Pss {sum(pss):6.1f} MB")
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == '--mode':
+        run_mode(sys.argv[2], int(sys.argv[3]), int(sys.argv[4]))
+    else:
+        main(int(sys.argv[1]) if len(sys.argv) > 1 else 4,
+             int(sys.argv[2]) if len(sys.argv) > 2 else 500)
@@ -0,0 +1,41 @@
+"""Worker boot time: import the app module and build an application.
+
+Usage: python bench_startup.py [runs]
+
+Each run is a fresh interpreter, as for a spawned worker that does not share
+the master's imports. Reports module import time, create_app() time and the
+total process wall time.
+"""
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+SNIPPET = """
+import time
+started = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+app = create_app()
+print((imported - started) * 1000, (time.perf_counter() - imported) * 1000)
+"""
+
+
+def main(runs):
+    here = os.path.dirname(os.path.abspath(__file__))
+    imports, factory, wall = [], [], []
+    for _ in range(runs):
+        started = time.perf_counter()
+        out = subprocess.run([sys.executable, '-c', SNIPPET], cwd=here, check=True,
+                             capture_output=True, text=True).stdout
+        wall.append((time.perf_counter() - started) * 1000)
+        import_ms, factory_ms = map(float, out.strip().splitlines()[-1].split())
+        imports.append(import_ms)
+        factory.append(factory_ms)
+    for label, samples in (('imports', imports), ('create_app', factory), ('process wall', wall)):
+        print(f"{label:>12}: median {statistics.median(samples):7.1f} ms  min {min(samples):7.1f} ms")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10)
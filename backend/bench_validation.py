@@ -0,0 +1,97 @@
+"""Cost of request validation, and what rejecting bad input early saves.
+
+Usage: python bench_validation.py [iterations]
+
+1. The compiled CREATE_FULL_QUOTATION validator on a realistic body (with
+   a few dozen services), per call.
+2. POST /api/quotations/full end to end with a valid body, to put (1) in
+   proportion.
+3. A bad body (plotArea 'abc') through the full endpoint, rejected by the
+   validator before auth or the session are touched, against the same
+   body sent to the undecorated view (``__wrapped__``), which loads the
+   user, prices the headers and fails with a 500 and a rollback.
+"""
+import os
+import sys
+import tempfile
+import time
+
+from app import create_app
+from commands import init_db
+from extensions import db
+from models import User
+from validation import compile_field
+import schemas
+import quotation_routes
+
+scratch = tempfile.mkdtemp()
+app = create_app({
+    'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.join(scratch, 'bench.db'),
+    'SQLALCHEMY_BINDS': {'archive': 'sqlite:///' + os.path.join(scratch, 'archive.db')},
+    'RATELIMIT_ENABLED': False,
+    'CONCURRENCY_LIMITS': {},
+})
+
+BODY = {
+    'developerType': 'Category 1',
+    'projectRegion': 'Mumbai Suburban',
+    'plotArea': 1800,
+    'developerName': 'Bench Developers',
+    'projectName': 'Bench Heights',
+    'headers': [
+        {'header': f'Header {h}', 'services': [
+            {'id': f's{h}-{i}', 'label': 'Project Registration', 'subServices': [{'text': 'Form 1'}, {'text': 'Form 2'}]}
+            for i in range(8)
+        ]}
+        for h in range(4)
+    ],
+    'pricing': {'discountPercent': 5, 'serviceOverrides': {'s0-1': 1000}},
+    'applicableTerms': ['General T&C'],
+    'customTerms': [],
+    'termsAccepted': True,
+}
+BAD_BODY = {**BODY, 'plotArea': 'abc'}
+
+
+def per_call_us(fn, iterations):
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+if __name__ == '__main__':
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+
+    with app.app_context():
+        init_db()
+        user = User(username='bench', role='admin', threshold=100)
+        user.set_password('bench-password')
+        db.session.add(user)
+        db.session.commit()
+    client = app.test_client()
+    token = client.post('/api/login', json={'username': 'bench', 'password': 'bench-password'}).json['token']
+    auth = {'Authorization': f'Bearer {token}'}
+
+    check = compile_field(schemas.CREATE_FULL_QUOTATION)
+    validate = per_call_us(lambda: check(BODY, '', []), iterations * 10)
+
+    requests = max(iterations // 10, 50)
+    full = per_call_us(lambda: client.post('/api/quotations/full', json=BODY, headers=auth), requests)
+
+    rejected = per_call_us(lambda: client.post('/api/quotations/full', json=BAD_BODY, headers=auth), iterations)
+    assert client.post('/api/quotations/full', json=BAD_BODY, headers=auth).status_code == 400
+
+    unvalidated_view = quotation_routes.create_full_quotation.__wrapped__
+    app.logger.disabled = quotation_routes.logger.disabled = True  # the failures would flood stderr
+
+    def unvalidated():
+        with app.test_request_context('/api/quotations/full', method='POST', json=BAD_BODY, headers=auth):
+            unvalidated_view()
+            db.session.remove()
+    late = per_call_us(unvalidated, iterations)
+
+    print(f"validator, valid {sum(len(h['services']) for h in BODY['headers'])}-service body: {validate:8.1f} us")
+    print(f"POST /api/quotations/full, valid body:       {full:8.1f} us  (validation {validate / full:.1%})")
+    print(f"bad body rejected by the validator:          {rejected:8.1f} us")
+    print(f"bad body without validation (auth + 500):    {late:8.1f} us  ({late / rejected:.1f}x)")
@@ -0,0 +1,109 @@
+"""Cheapest way to buy a selection of services: one by one or through packages.
+
+A package is a rate-card entry ("Package A", ...) whose ``covers`` list
+names the standalone services it includes, with all of their
+sub-services. Choosing packages and standalone services to cover a
+selection at the lowest price is a weighted set cover. The selection is small (at most one entry
+per rate-card service), so the search is an exact DP over bitmasks of
+still-uncovered services. Each step covers the lowest uncovered service,
+either on its own or with one of the packages that contains it, and the
+DP memoizes the best cost of every remainder.
+"""
+from functools import lru_cache
+
+from pricing import DEFAULT_SERVICE_AMOUNT, get_rate_card, service_amount
+
+
+@lru_cache(maxsize=None)
+def _packages(rate_card, category, region, band):
+    """``(name, amount, contents)`` of the packages priced for one rate-card slot"""
+    return tuple(
+        (name, rate_card.amount(category, region, band, name), contents)
+        for name, contents in rate_card.packages(category, region, band)
+    )
+
+
+def selected_services(headers, rate_card=None):
+    """``{service name: sub-service count}`` for the services in ``headers``.
+
+    Names are matched against the rate card as in ``price_headers``; a
+    service picked twice counts once, with its larger sub-service list.
+    Package entries themselves are not services to cover and are skipped.
+    """
+    if rate_card is None:
+        rate_card = get_rate_card()
+    selected = {}
+    for header_data in headers:
+        for service in header_data.get('services', []):
+            name = service.get('label', service.get('name'))
+            if not name or name in rate_card.package_names:
+                continue
+            subs = len(service.get('subServices') or [])
+            selected[name] = max(selected.get(name, 0), subs)
+    return selected
+
+
+def optimize_bundle(category, region, band, selected, rate_card=None):
+    """Cheapest combination of packages and standalone services covering
+    ``selected`` (from :func:`selected_services`).
+
+    Returns the chosen items, the standalone total (what ``price_headers``
+    charges for the same selection), the optimized total and the savings.
+    """
+    if rate_card is None:
+        rate_card = get_rate_card()
+    names = list(selected)
+    bit = {name: 1 << i for i, name in enumerate(names)}
+    standalone = [
+        service_amount(rate_card.amount(category, region, band, name, DEFAULT_SERVICE_AMOUNT), selected[name])
+        for name in names
+    ]
+
+    # options[i]: the ways to cover service i, as (amount, covered mask, package name or None)
+    options = [[(standalone[i], 1 << i, None)] for i in range(len(names))]
+    packages = _packages(rate_card, category, region, band)
+    for package, amount, contents in packages:
+        covered = 0
+        for name in contents:
+            covered |= bit.get(name, 0)
+        if not covered:
+            continue
+        for i in range(len(names)):
+            if covered >> i & 1:
+                options[i].append((amount, covered, package))
+
+    @lru_cache(maxsize=None)
+    def best(uncovered):
+        """(cost, choices) covering every service in the ``uncovered`` mask"""
+        if not uncovered:
+            return 0.0, ()
+        i = (uncovered & -uncovered).bit_length() - 1
+        result = None
+        for amount, covered, package in options[i]:
+            cost, choices = best(uncovered & ~covered)
+            cost += amount
+            if result is None or cost < result[0]:
+                result = cost, ((i, package),) + choices
+        return result
+
+    total, choices = best((1 << len(names)) - 1)
+    contents = {package: (amount, covers) for package, amount, covers in packages}
+    chosen = {}
+    services = []
+    for i, package in choices:
+        if package is None:
+            services.append({'name': names[i], 'type': 'service', 'amount': round(standalone[i], 2), 'covers': [names[i]]})
+        else:
+            amount, covers = contents[package]
+            chosen[package] = {
+                'name': package, 'type': 'package', 'amount': amount,
+                'covers': [name for name in names if name in covers],
+            }
+    standalone_total = sum(standalone, 0.0)
+    return {
+        'band': band,
+        'items': list(chosen.values()) + services,
+        'standaloneTotal': round(standalone_total, 2),
+        'optimizedTotal': round(total, 2),
+        'savings': round(standalone_total - total, 2),
+    }
@@ -0,0 +1,540 @@
+from contextlib import nullcontext
+import csv
+from datetime import datetime, timedelta
+import os
+import time
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import text, or_, null, bindparam
+
+from extensions import db
+from models import User, Quotation, QuotationEvent, ArchivedQuotation, Term
+from migrations import add_missing_columns, create_missing_indexes
+from event_archive import append_month
+from quotation_cache import quotation_cache
+import backup
+from terms import clear_term_cache, intern_terms
+import reprice
+from approval_queue import approver_counts, backfill_required_discount
+import duplicates
+from revisions import seed_base_revisions
+from partitions import get_partitions, PARTITIONED_TABLES
+
+# Columns added after the first release; create_all() does not add them to existing tables
+SCHEMA_ADDITIONS = {
+    'quotation': [
+        ('version', 'INTEGER NOT NULL DEFAULT 1'),
+        ('updated_at', 'DATETIME'),
+        ('applicable_term_ids', 'JSON'),
+        ('custom_term_ids', 'JSON'),
+        ('owner_user_id', 'INTEGER REFERENCES user(id)'),
+        ('required_discount', 'FLOAT'),
+        ('approval_reasons', 'JSON'),
+        ('duplicate_signature', 'VARCHAR(400)'),
+    ],
+    # archive bind
+    'archived_quotation': [
+        ('owner_user_id', 'INTEGER'),
+    ],
+}
+
+def init_db():
+    """Create missing tables, columns and indexes, fill the approval level of
+    rows pending from before it was stored, checkpoint quotations that have
+    no revisions yet, and the append-only trigger on quotation_event"""
+    db.create_all()
+    for engine in db.engines.values():
+        add_missing_columns(engine, SCHEMA_ADDITIONS)
+    create_missing_indexes(db.engine, db.metadata)
+    with db.engine.begin() as conn:
+        backfilled = backfill_required_discount(conn)
+    if backfilled:
+        quotation_cache.clear()
+        approver_counts.invalidate()
+    seed_base_revisions()
+    if get_partitions() is not None:
+        get_partitions().create_all()
+    if db.engine.dialect.name == 'sqlite':
+        with db.engine.begin() as conn:
+            conn.execute(text(
+                "CREATE TRIGGER IF NOT EXISTS quotation_event_append_only "
+                "BEFORE UPDATE ON quotation_event "
+                "BEGIN SELECT RAISE(ABORT, 'quotation_event is append-only'); END"
+            ))
+
+def _require_main_database():
+    """The batch jobs only know the main database's quotation tables"""
+    if get_partitions() is not None:
+        raise click.ClickException('This command does not support partitioned storage yet (PARTITION_DIR is set)')
+
+@click.command('init-db')
+@with_appcontext
+def init_db_command():
+    """Create or upgrade the database schema."""
+    init_db()
+    click.echo('Database schema is up to date')
+
+@click.command('compact-events')
+@click.option('--months', default=6, show_default=True,
+              help='Keep events from the current month and this many months before it.')
+@click.option('--archive-dir', default=None,
+              help='Directory for quotation-events-YYYY-MM.ndjson.gz (default: instance/event-archive).')
+@click.option('--batch-size', default=5000, show_default=True)
+@with_appcontext
+def compact_events(months, archive_dir, batch_size):
+    """Move old quotation events into compressed per-month archive files."""
+    _require_main_database()
+    archive_dir = archive_dir or os.path.join(current_app.instance_path, 'event-archive')
+    now = datetime.utcnow()
+    month_index = now.year * 12 + (now.month - 1) - months
+    cutoff = datetime(month_index // 12, month_index % 12 + 1, 1)
+
+    archived = 0
+    while True:
+        # Each batch is archived, fsynced and deleted in its own short transaction
+        batch = (QuotationEvent.query
+                 .filter(QuotationEvent.created_at < cutoff)
+                 .order_by(QuotationEvent.id)
+                 .limit(batch_size)
+                 .all())
+        if not batch:
+            break
+        by_month = {}
+        for e in batch:
+            by_month.setdefault(e.created_at.strftime('%Y-%m'), []).append(e.to_dict())
+        for month, records in sorted(by_month.items()):
+            append_month(archive_dir, month, records)
+        ids = [e.id for e in batch]
+        db.session.execute(QuotationEvent.__table__.delete().where(QuotationEvent.id.in_(ids)))
+        db.session.commit()
+        archived += len(ids)
+
+    click.echo(f"Archived {archived} events older than {cutoff.date()} to {archive_dir}")
+
+def _hot_table_stats():
+    started = time.perf_counter()
+    rows = len(Quotation.query.order_by(Quotation.created_at.desc()).all())
+    list_ms = (time.perf_counter() - started) * 1000
+    page_size = db.session.execute(text('PRAGMA page_size')).scalar()
+    page_count = db.session.execute(text('PRAGMA page_count')).scalar()
+    free_pages = db.session.execute(text('PRAGMA freelist_count')).scalar()
+    db.session.expunge_all()
+    return {
+        'rows': rows,
+        'list_ms': list_ms,
+        'file_bytes': page_size * page_count,
+        'used_bytes': page_size * (page_count - free_pages),
+    }
+
+@click.command('archive-quotations')
+@click.option('--older-than-days', type=int, default=None,
+              help='Archive quotations created before this many days ago (default: ARCHIVE_AFTER_DAYS).')
+@click.option('--status', 'statuses', multiple=True,
+              help='Status eligible for archival; repeatable (default: ARCHIVE_STATUSES).')
+@click.option('--batch-size', default=500, show_default=True)
+@click.option('--dry-run', is_flag=True, help='Only count the quotations that would be archived.')
+@click.option('--vacuum', is_flag=True, help='VACUUM the hot database afterwards to return freed pages.')
+@with_appcontext
+def archive_quotations(older_than_days, statuses, batch_size, dry_run, vacuum):
+    """Move old quotations into cold storage and report the effect on the hot table."""
+    _require_main_database()
+    days = older_than_days if older_than_days is not None else current_app.config['ARCHIVE_AFTER_DAYS']
+    statuses = list(statuses) or current_app.config['ARCHIVE_STATUSES']
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    eligible = Quotation.query.filter(Quotation.created_at < cutoff, Quotation.status.in_(statuses))
+
+    if dry_run:
+        click.echo(f"{eligible.count()} quotations created before {cutoff.date()} with status "
+                   f"{', '.join(statuses)} would be archived")
+        return
+
+    before = _hot_table_stats()
+    archived = 0
+    last_id = ''
+    while True:
+        batch = (eligible.filter(Quotation.id > last_id)
+                 .order_by(Quotation.id)
+                 .limit(batch_size)
+                 .all())
+        if not batch:
+            break
+        last_id = batch[-1].id
+        # Two commits, archive first: the archive and hot tables live in
+        # different files, and merge() makes a re-run after a crash harmless
+        for q in batch:
+            db.session.merge(ArchivedQuotation.from_quotation(q))
+        db.session.commit()
+        db.session.info['archiving'] = True
+        try:
+            for q in batch:
+                db.session.delete(q)
+            db.session.commit()
+        finally:
+            db.session.info.pop('archiving', None)
+        archived += len(batch)
+
+    if vacuum:
+        db.session.commit()
+        with db.engine.connect() as conn:
+            conn.exec_driver_sql('VACUUM')
+    after = _hot_table_stats()
+
+    click.echo(f"Archived {archived} quotations created before {cutoff.date()}")
+    click.echo(f"  hot rows:       {before['rows']} -> {after['rows']}")
+    click.echo(f"  hot data bytes: {before['used_bytes']} -> {after['used_bytes']}"
+               f" (file {before['file_bytes']} -> {after['file_bytes']})")
+    click.echo(f"  list query:     {before['list_ms']:.1f} ms -> {after['list_ms']:.1f} ms")
+
+@click.command('intern-terms')
+@click.option('--batch-size', default=500, show_default=True)
+@click.option('--vacuum', is_flag=True, help='VACUUM afterwards so the file shrinks too.')
+@with_appcontext
+def intern_terms_command(batch_size, vacuum):
+    """Move term text out of quotations into the shared terms library."""
+    _require_main_database()
+    table = Quotation.__table__
+    pending = Quotation.query.filter(or_(Quotation.applicable_term_ids.is_(None),
+                                         Quotation.custom_term_ids.is_(None)))
+    # Core UPDATE: a storage change, so version and updated_at stay as they are
+    rewrite = (table.update()
+               .where(table.c.id == bindparam('row_id'))
+               .values(applicable_term_ids=bindparam('applicable_ids'), custom_term_ids=bindparam('custom_ids'),
+                       applicable_terms=null(), custom_terms=null()))
+
+    before = _hot_table_stats()
+    terms_before = Term.query.count()
+    interned = skipped = 0
+    last_id = ''
+    while True:
+        batch = pending.filter(Quotation.id > last_id).order_by(Quotation.id).limit(batch_size).all()
+        if not batch:
+            break
+        last_id = batch[-1].id
+        rows = []
+        for q in batch:
+            applicable, custom = q.legacy_applicable_terms or [], q.legacy_custom_terms or []
+            if not all(isinstance(t, str) for t in applicable + custom):
+                skipped += 1
+                continue
+            rows.append((q.id, [t for t in applicable if t], [t for t in custom if t]))
+        if rows:
+            ids = intern_terms(*(texts for _, applicable, custom in rows for texts in (applicable, custom)))
+            db.session.execute(rewrite, [
+                {'row_id': row_id, 'applicable_ids': ids[2 * i], 'custom_ids': ids[2 * i + 1]}
+                for i, (row_id, _, _) in enumerate(rows)
+            ])
+        db.session.commit()
+        db.session.expunge_all()
+        interned += len(rows)
+
+    if vacuum:
+        with db.engine.connect() as conn:
+            conn.exec_driver_sql('VACUUM')
+    after = _hot_table_stats()
+
+    click.echo(f"Interned the terms of {interned} quotations into {Term.query.count() - terms_before} new terms "
+               f"({Term.query.count()} in the library)")
+    if skipped:
+        click.echo(f"  skipped {skipped} quotations whose terms are not plain text")
+    click.echo(f"  data bytes: {before['used_bytes']} -> {after['used_bytes']}"
+               f" (file {before['file_bytes']} -> {after['file_bytes']})")
+    click.echo(f"  list query: {before['list_ms']:.1f} ms -> {after['list_ms']:.1f} ms")
+
+def _owners(rows):
+    """{quotation id: user id} for ``(id, created_by)`` rows.
+
+    The actor of the quotation's 'created' event is the account that was
+    signed in when it was created; rows without one fall back to a
+    created_by that happens to be a username.
+    """
+    ids = [row_id for row_id, _ in rows]
+    actors = dict(db.session.execute(
+        db.select(QuotationEvent.quotation_id, QuotationEvent.actor)
+        .where(QuotationEvent.quotation_id.in_(ids), QuotationEvent.event_type == 'created',
+               QuotationEvent.actor.is_not(None))
+    ).all())
+    names = {actors.get(row_id) or created_by for row_id, created_by in rows} - {None}
+    user_ids = dict(db.session.execute(
+        db.select(User.username, User.id).where(User.username.in_(names))
+    ).all()) if names else {}
+    owners = {}
+    for row_id, created_by in rows:
+        owner = user_ids.get(actors.get(row_id) or created_by)
+        if owner is not None:
+            owners[row_id] = owner
+    return owners
+
+@click.command('backfill-owners')
+@click.option('--batch-size', default=1000, show_default=True)
+@with_appcontext
+def backfill_owners(batch_size):
+    """Set owner_user_id on quotations created before it existed."""
+    _require_main_database()
+    for model in (Quotation, ArchivedQuotation):
+        table = model.__table__
+        bind = {'mapper': model}  # the archived rows live in the archive database
+        pending = (db.select(table.c.id, table.c.created_by)
+                   .where(table.c.owner_user_id.is_(None))
+                   .order_by(table.c.id).limit(batch_size))
+        # Core UPDATE, but ownerUserId is served to clients: bump the version
+        # (and updated_at) so per-quotation and list ETags change with it
+        bumped = {'version': table.c.version + 1}
+        if 'updated_at' in table.c:
+            bumped['updated_at'] = datetime.utcnow()
+        assign = (table.update()
+                  .where(table.c.id == bindparam('row_id'))
+                  .values(owner_user_id=bindparam('owner'), **bumped))
+        assigned = unmatched = 0
+        last_id = ''
+        while True:
+            rows = db.session.execute(pending.where(table.c.id > last_id), bind_arguments=bind).all()
+            if not rows:
+                break
+            last_id = rows[-1][0]
+            owners = _owners(rows)
+            if owners:
+                db.session.execute(assign, [{'row_id': row_id, 'owner': owner} for row_id, owner in owners.items()],
+                                   bind_arguments=bind)
+            db.session.commit()
+            assigned += len(owners)
+            unmatched += len(rows) - len(owners)
+        click.echo(f"{table.name}: assigned an owner to {assigned} rows"
+                   + (f", {unmatched} left without one (no matching user)" if unmatched else ''))
+
+@click.command('find-duplicates')
+@click.option('--batch-size', default=1000, show_default=True)
+@click.option('--report', 'report_path', type=click.Path(dir_okay=False),
+              help='Write one CSV row per quotation in a duplicate cluster.')
+@with_appcontext
+def find_duplicates(batch_size, report_path):
+    """Cluster historical quotations that describe the same developer and project."""
+    _require_main_database()
+    table = Quotation.__table__
+    columns = (table.c.id, table.c.project_region, table.c.developer_name, table.c.project_name,
+               table.c.rera_number, table.c.contact_mobile)
+
+    # Signatures of rows written before the column existed; Core UPDATE, so
+    # version and updated_at stay as they are
+    missing = (db.select(*columns).where(table.c.duplicate_signature.is_(None))
+               .order_by(table.c.id).limit(batch_size))
+    assign = (table.update().where(table.c.id == bindparam('row_id'))
+              .values(duplicate_signature=bindparam('value')))
+    filled = 0
+    last_id = ''
+    while True:
+        rows = db.session.execute(missing.where(table.c.id > last_id)).all()
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        db.session.execute(assign, [{'row_id': row[0], 'value': duplicates.signature(*row[1:])} for row in rows])
+        db.session.commit()
+        filled += len(rows)
+
+    started = time.perf_counter()
+    rows = []
+    last_id = ''
+    page = db.select(*columns).order_by(table.c.id).limit(batch_size)
+    while True:
+        batch = db.session.execute(page.where(table.c.id > last_id)).all()
+        if not batch:
+            break
+        last_id = batch[-1][0]
+        rows.extend(tuple(row) for row in batch)
+    clusters, comparisons = duplicates.cluster(rows)
+    elapsed = time.perf_counter() - started
+
+    if report_path:
+        details = {row[0]: row for row in rows}
+        with open(report_path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(('cluster', 'id', 'region', 'developer', 'project', 'rera_number', 'mobile'))
+            for number, ids in enumerate(clusters, 1):
+                for quotation_id in ids:
+                    writer.writerow((number, *details[quotation_id]))
+
+    all_pairs = len(rows) * (len(rows) - 1) // 2
+    if filled:
+        click.echo(f"Computed the signature of {filled} quotations")
+    click.echo(f"{len(clusters)} duplicate clusters covering {sum(len(ids) for ids in clusters)} "
+               f"of {len(rows)} quotations ({elapsed:.1f}s)")
+    click.echo(f"  pairs compared: {comparisons} (all pairs: {all_pairs})")
+    for ids in sorted(clusters, key=len, reverse=True)[:10]:
+        click.echo(f"  {len(ids)}: {', '.join(ids[:5])}{' ...' if len(ids) > 5 else ''}")
+    if report_path:
+        click.echo(f"  report: {report_path}")
+
+@click.command('partition-quotations')
+@click.option('--batch-size', default=500, show_default=True)
+@with_appcontext
+def partition_quotations(batch_size):
+    """Copy quotations, their events and revisions into the region partitions.
+
+    Rows already in a partition are skipped, so the copy can be re-run
+    (e.g. once more after writes to the main database have stopped).
+    """
+    partitions = get_partitions()
+    if partitions is None:
+        raise click.ClickException('PARTITION_DIR is not set')
+    partitions.create_all()
+    quotation, events, revisions = PARTITIONED_TABLES
+
+    copied = dict.fromkeys(partitions.shard_ids, 0)
+    last_id = ''
+    page = db.select(quotation).order_by(quotation.c.id).limit(batch_size)
+    while True:
+        rows = [row._mapping for row in db.session.execute(page.where(quotation.c.id > last_id))]
+        if not rows:
+            break
+        last_id = rows[-1]['id']
+        by_shard = {}
+        for row in rows:
+            by_shard.setdefault(partitions.shard_for_region(row['project_region']), []).append(row)
+        for shard_id, shard_rows in by_shard.items():
+            ids = [row['id'] for row in shard_rows]
+            history = [(table, [dict(r._mapping) for r in db.session.execute(
+                db.select(table).where(table.c.quotation_id.in_(ids)))]) for table in (events, revisions)]
+            # One transaction per partition and batch: a quotation arrives with its history
+            with partitions.engines[shard_id].begin() as conn:
+                inserted = conn.execute(quotation.insert().prefix_with('OR IGNORE'),
+                                        [dict(row) for row in shard_rows]).rowcount
+                for table, table_rows in history:
+                    if table_rows:
+                        conn.execute(table.insert().prefix_with('OR IGNORE'), table_rows)
+            copied[shard_id] += inserted
+        db.session.commit()
+
+    counts = partitions.count()
+    for shard_id in partitions.shard_ids:
+        click.echo(f"  {shard_id}: copied {copied[shard_id]}, {counts[shard_id]} in the partition")
+    click.echo(f"Copied {sum(copied.values())} quotations into {len(partitions.shard_ids)} partitions")
+
+def _database_paths(binds):
+    """{bind: file} for the SQLite databases to back up (None is the main database,
+    ``partition:<shard id>`` a region partition)"""
+    engines = dict(db.engines)
+    partitions = get_partitions()
+    if partitions is not None:
+        engines.update((f'partition:{shard_id}', engine) for shard_id, engine in partitions.engines.items())
+    paths = {}
+    for bind, engine in engines.items():
+        if binds and (bind or 'main') not in binds:
+            continue
+        if engine.dialect.name == 'sqlite' and engine.url.database:
+            paths[bind] = engine.url.database
+    return paths
+
+@click.command('backup-db')
+@click.option('--dest-dir', default=None, help='Snapshot directory (default: BACKUP_DIR).')
+@click.option('--keep', type=int, default=None, help='Snapshots to keep per database (default: BACKUP_KEEP).')
+@click.option('--bind', 'binds', multiple=True,
+              help="Database to back up: 'main', a bind key or partition:<shard id>; repeatable.")
+@click.option('--pages', type=int, default=None, help='Pages copied per step (default: BACKUP_PAGES_PER_STEP).')
+@click.option('--sleep', type=float, default=None, help='Seconds between steps (default: BACKUP_SLEEP_SECONDS).')
+@with_appcontext
+def backup_db(dest_dir, keep, binds, pages, sleep):
+    """Snapshot the live databases without stopping the app; run it from cron."""
+    config = current_app.config
+    dest_dir = dest_dir or config['BACKUP_DIR'] or os.path.join(current_app.instance_path, 'backups')
+    keep = keep if keep is not None else config['BACKUP_KEEP']
+    pages = pages or config['BACKUP_PAGES_PER_STEP']
+    sleep = sleep if sleep is not None else config['BACKUP_SLEEP_SECONDS']
+    os.makedirs(dest_dir, exist_ok=True)
+
+    for bind, path in _database_paths(binds).items():
+        started = time.perf_counter()
+        report = backup.online_backup(path, backup.snapshot_path(dest_dir, path), pages=pages, sleep=sleep)
+        removed = backup.prune_snapshots(dest_dir, path, keep)
+        click.echo(f"{bind or 'main'}: {report['path']} ({report['bytes']} bytes, "
+                   f"{sum(report['counts'].values())} rows, {report['steps']} steps, "
+                   f"{report['restarts']} restarts, {time.perf_counter() - started:.1f}s); "
+                   f"pruned {len(removed)} old snapshots")
+
+@click.command('verify-backup')
+@click.argument('snapshot')
+@with_appcontext
+def verify_backup(snapshot):
+    """Check a snapshot's integrity and print its row counts."""
+    try:
+        report = backup.verify(snapshot)
+    except backup.BackupError as e:
+        raise click.ClickException(str(e))
+    click.echo(f"{snapshot}: integrity ok, {report['bytes']} bytes")
+    for table, count in report['counts'].items():
+        click.echo(f"  {table}: {count}")
+
+@click.command('restore-db')
+@click.argument('snapshot')
+@click.option('--bind', default='main', show_default=True,
+              help="Database to overwrite: 'main', a bind key or partition:<shard id>.")
+@click.option('--yes', is_flag=True, help='Do not ask for confirmation.')
+@with_appcontext
+def restore_db(snapshot, bind, yes):
+    """Replace a database with a verified snapshot (stop the app first)."""
+    paths = _database_paths([bind])
+    if not paths:
+        raise click.ClickException(f'No SQLite database for bind {bind!r}')
+    target = next(iter(paths.values()))
+    if not yes:
+        click.confirm(f'Overwrite {target} with {snapshot}?', abort=True)
+    db.session.remove()
+    for engine in db.engines.values():
+        engine.dispose()
+    if get_partitions() is not None:
+        get_partitions().dispose()
+    try:
+        report = backup.restore(snapshot, target)
+    except backup.BackupError as e:
+        raise click.ClickException(str(e))
+    quotation_cache.clear()
+    clear_term_cache()
+    click.echo(f"Restored {target} from {snapshot}: "
+               + ', '.join(f"{table}={count}" for table, count in report['counts'].items()))
+
+@click.command('reprice')
+@click.option('--status', 'statuses', multiple=True,
+              help='Status to reprice; repeatable (default: draft and pending_approval).')
+@click.option('--chunk-size', default=200, show_default=True, help='Quotations per read and per write transaction.')
+@click.option('--workers', type=int, default=None, help='Pricing processes (default: CPU count).')
+@click.option('--dry-run', is_flag=True, help='Report the changes without writing them.')
+@click.option('--report', 'report_path', type=click.Path(dir_okay=False),
+              help='Write one CSV row per changed quotation (old/new total, change).')
+@click.option('--top', default=10, show_default=True, help='Largest changes to print.')
+@with_appcontext
+def reprice_command(statuses, chunk_size, workers, dry_run, report_path, top):
+    """Recompute open quotations against the current rate card after it changes."""
+    _require_main_database()
+    workers = workers or os.cpu_count() or 1
+    started = time.perf_counter()
+    with open(report_path, 'w', newline='') if report_path else nullcontext() as csv_file:
+        report = reprice.reprice_quotations(
+            statuses or reprice.OPEN_STATUSES, chunk_size=chunk_size, workers=workers, dry_run=dry_run,
+            report=reprice.RepriceReport(csv_file, keep=top)
+        )
+    summary = report.to_dict()
+    elapsed = time.perf_counter() - started
+
+    click.echo(f"{'Would reprice' if dry_run else 'Repriced'} {summary['changed']} of {summary['scanned']} "
+               f"quotations in {elapsed:.1f}s ({summary['scanned'] / elapsed if elapsed else 0:.0f}/s, {workers} workers)")
+    click.echo(f"  total amount: {summary['oldTotal']:,.2f} -> {summary['newTotal']:,.2f} ({summary['change']:+,.2f})")
+    if summary['conflicts']:
+        click.echo(f"  skipped {summary['conflicts']} quotations edited while repricing; run again to include them")
+    for change in summary['largestChanges']:
+        percent = f"{change['changePercent']:+.1f}%" if change['changePercent'] is not None else 'new'
+        click.echo(f"  {change['id']}: {change['oldTotal']:,.2f} -> {change['newTotal']:,.2f} ({percent})")
+    if report_path:
+        click.echo(f"  report: {report_path}")
+
+def register_commands(app):
+    app.cli.add_command(init_db_command)
+    app.cli.add_command(compact_events)
+    app.cli.add_command(archive_quotations)
+    app.cli.add_command(intern_terms_command)
+    app.cli.add_command(backfill_owners)
+    app.cli.add_command(find_duplicates)
+    app.cli.add_command(partition_quotations)
+    app.cli.add_command(backup_db)
+    app.cli.add_command(verify_backup)
+    app.cli.add_command(restore_db)
+    app.cli.add_command(reprice_command)
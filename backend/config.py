@@ -0,0 +1,109 @@
+import os
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def _env_bool(name, default):
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def _env_mapping(name, default):
+    """'a=1,b=2' -> {'a': '1', 'b': '2'}"""
+    value = os.environ.get(name)
+    if not value:
+        return default
+    return dict(item.split('=', 1) for item in value.split(',') if '=' in item)
+
+
+class Config:
+    """Default settings; every deployment-specific value can come from the environment"""
+
+    SECRET_KEY = os.environ.get('SECRET_KEY', 'dev-secret-key')
+    DEBUG = _env_bool('FLASK_DEBUG', False)
+
+    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'sqlite:///quotations.db')
+    # Cold storage for old completed/rejected quotations, kept out of the hot file
+    SQLALCHEMY_BINDS = {'archive': os.environ.get('ARCHIVE_DATABASE_URL', 'sqlite:///quotations-archive.db')}
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLALCHEMY_ECHO = False
+    # Optional region-partitioned quotation storage: one SQLite file per
+    # rate-card region in this directory (see partitions.py); unset = off
+    PARTITION_DIR = os.environ.get('PARTITION_DIR') or None
+
+    CORS_ORIGINS = os.environ.get('CORS_ORIGINS', 'http://localhost:3000').split(',')
+    LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+    # Per-logger overrides, e.g. LOG_LEVELS="quotation_routes=DEBUG,sqlalchemy.engine=WARNING"
+    LOG_LEVELS = _env_mapping('LOG_LEVELS', {})
+    # Fraction of DEBUG records kept per logger ('*' for the rest)
+    LOG_DEBUG_SAMPLE_RATES = {name: float(rate) for name, rate in
+                              _env_mapping('LOG_DEBUG_SAMPLE_RATES', {'quotation_routes': '0.1'}).items()}
+    # Keys masked wherever they appear in logged dicts
+    LOG_REDACT_FIELDS = ['password', 'token', 'developerName', 'contactMobile', 'contactEmail',
+                         'developer_name', 'contact_mobile', 'contact_email']
+
+    PRICING_DATA_PATH = os.environ.get('PRICING_DATA_PATH', os.path.join(BASE_DIR, 'pricing_data.json'))
+
+    # 'wal' lets backups (and readers) run without blocking writers; '' leaves the file's mode alone
+    SQLITE_JOURNAL_MODE = os.environ.get('SQLITE_JOURNAL_MODE', 'wal')
+    BACKUP_DIR = os.environ.get('BACKUP_DIR')  # default: instance/backups
+    BACKUP_KEEP = int(os.environ.get('BACKUP_KEEP', 14))
+    BACKUP_PAGES_PER_STEP = int(os.environ.get('BACKUP_PAGES_PER_STEP', 1024))
+    BACKUP_SLEEP_SECONDS = float(os.environ.get('BACKUP_SLEEP_SECONDS', 0.05))
+
+    # POST /api/quotations/reprice previews at most this many quotations
+    # (~700/s in a request thread); `flask reprice` runs the full job
+    REPRICE_PREVIEW_MAX_ROWS = int(os.environ.get('REPRICE_PREVIEW_MAX_ROWS', 5000))
+
+    # Revision history: every Nth revision of a quotation stores the whole document
+    # instead of a delta, bounding the work needed to rebuild any revision
+    REVISION_CHECKPOINT_EVERY = int(os.environ.get('REVISION_CHECKPOINT_EVERY', 10))
+
+    # Seconds the per-approver pending counts are cached; commits in the same
+    # process refresh them sooner
+    APPROVAL_COUNTS_TTL = int(os.environ.get('APPROVAL_COUNTS_TTL', 30))
+
+    ARCHIVE_AFTER_DAYS = int(os.environ.get('ARCHIVE_AFTER_DAYS', 365))
+    ARCHIVE_STATUSES = ['completed', 'rejected']
+
+    # Primary-key generator for new quotations: 'ulid' (time-ordered) or 'random' (legacy)
+    ID_GENERATOR = os.environ.get('ID_GENERATOR', 'ulid')
+
+    # Werkzeug hash spec with explicit parameters; changing it rehashes passwords on next login
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', os.cpu_count() or 1))
+    # Hashes admitted beyond the running ones, sized for a start-of-day login
+    # burst per worker; later logins wait up to PASSWORD_HASH_TIMEOUT for a slot
+    PASSWORD_HASH_MAX_QUEUE = int(os.environ.get('PASSWORD_HASH_MAX_QUEUE', 32))
+    PASSWORD_HASH_TIMEOUT = float(os.environ.get('PASSWORD_HASH_TIMEOUT', 10))
+
+    # Rate limiting: 'memory' is per worker, 'sqlite' shares buckets between workers on a host
+    RATELIMIT_ENABLED = _env_bool('RATELIMIT_ENABLED', True)
+    RATELIMIT_BACKEND = os.environ.get('RATELIMIT_BACKEND', 'memory')
+    RATELIMIT_DEFAULTS = {'app': '300/minute', 'quotation_bp': '300/minute', 'agent_bp': '120/minute'}
+    RATELIMIT_ENDPOINTS = {
+        'calculate_pricing': '60/minute',
+        'optimize_bundle_pricing': '60/minute',
+        'create_quotation': '30/minute',
+        'create_full_quotation': '30/minute',
+    }
+    # Simultaneous requests per worker for the expensive endpoints
+    CONCURRENCY_LIMITS = {'calculate_pricing': 8, 'create_full_quotation': 4}
+
+    SSE_HEARTBEAT_SECONDS = 15
+    # Approval stream changes are relayed between workers through the
+    # database; each worker polls for them this often
+    SSE_POLL_SECONDS = float(os.environ.get('SSE_POLL_SECONDS', 1.0))
+    # Open streams per worker: each one holds a worker thread (see WEB_THREADS)
+    SSE_MAX_STREAMS = int(os.environ.get('SSE_MAX_STREAMS', 4))
+    SSE_STREAM_TICKET_SECONDS = 60
+
+    # Single-quotation read cache: 'sqlite' (shared by the workers and CLI
+    # commands on a host), 'memory' (per process, only for a lone process
+    # that is the only writer) or 'none'. Entries older than the TTL are
+    # reloaded, which bounds staleness from writes that bypass the session.
+    QUOTATION_CACHE_BACKEND = os.environ.get('QUOTATION_CACHE_BACKEND', 'sqlite')
+    QUOTATION_CACHE_SIZE = int(os.environ.get('QUOTATION_CACHE_SIZE', 1024))
+    QUOTATION_CACHE_TTL = float(os.environ.get('QUOTATION_CACHE_TTL', 300))
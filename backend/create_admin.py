@@ -1,6 +1,12 @@
-from app import db, User, app
+from app import create_app
+from commands import init_db
+from extensions import db
+from models import User
+
+app = create_app()
 
 with app.app_context():
+    init_db()
     username = "admin"   # login userid
     password = "1234"
     fname = "System"
@@ -0,0 +1,200 @@
+"""Near-duplicate quotations: the same developer and project quoted more than once.
+
+Every quotation stores a normalized signature
+
+    region|developer|project|rera number|mobile
+
+kept up to date by a flush hook. Quotations of the same deal share the
+``region|developer|project|`` prefix even when one of them lacks the RERA
+number or mobile, so the candidates for a quotation are one range scan on
+the signature index. The RERA number and mobile then tell how strong each
+match is.
+
+Historical data is clustered by :func:`cluster`. Rows are grouped by
+blocking keys (signature prefix, RERA number, mobile, developer within a
+region), and pairs are only compared inside a block. Matched pairs are
+joined with union-find. This avoids comparing every pair of rows.
+"""
+import re
+from collections import defaultdict
+
+from sqlalchemy import event, inspect
+
+from extensions import db
+from models import Quotation
+
+# Words that differ between spellings of the same company or project name
+_NOISE_WORDS = frozenset({
+    'the', 'and', 'pvt', 'private', 'ltd', 'limited', 'llp', 'co', 'company', 'corp', 'inc',
+})
+_SIGNATURE_COLUMNS = ('project_region', 'developer_name', 'project_name', 'rera_number', 'contact_mobile')
+
+# Pairs in a block match when both names are at least this similar (token Jaccard)
+NAME_SIMILARITY = 0.8
+# A block larger than this (a shared office number, a placeholder RERA
+# number) says nothing about the rows in it and is skipped
+MAX_BLOCK_SIZE = 200
+
+
+def _tokens(text):
+    return [w for w in re.findall(r'[a-z0-9]+', (text or '').casefold()) if w not in _NOISE_WORDS]
+
+
+def normalize(text):
+    return ' '.join(_tokens(text))
+
+
+def normalize_mobile(mobile):
+    digits = re.sub(r'\D', '', mobile or '')
+    return digits[-10:]  # drop country code and trunk prefixes
+
+
+def normalize_rera(rera_number):
+    return re.sub(r'[^a-z0-9]', '', (rera_number or '').casefold())
+
+
+def signature_prefix(region, developer, project):
+    return f'{normalize(region)}|{normalize(developer)}|{normalize(project)}|'
+
+
+def signature(region, developer, project, rera_number, mobile):
+    return signature_prefix(region, developer, project) + f'{normalize_rera(rera_number)}|{normalize_mobile(mobile)}'
+
+
+def quotation_signature(q):
+    return signature(q.project_region, q.developer_name, q.project_name, q.rera_number, q.contact_mobile)
+
+
+@event.listens_for(db.session, 'before_flush')
+def record_signature(session, flush_context, instances):
+    for obj in list(session.new) + list(session.dirty):
+        if not isinstance(obj, Quotation):
+            continue
+        if obj in session.new or any(inspect(obj).attrs[name].history.has_changes() for name in _SIGNATURE_COLUMNS):
+            obj.duplicate_signature = quotation_signature(obj)
+
+
+def find_similar(region, developer, project, rera_number=None, mobile=None, exclude_id=None, limit=20,
+                 session=None):
+    """Quotations of the same region, developer and project, oldest first.
+
+    Each match is ``(quotation, same_rera, same_mobile)``; the flags are
+    only set when both sides have the value. Without a developer or project
+    name there is no deal to match, so nothing is returned. ``session``
+    defaults to db.session; a routing session only searches ``region``'s partition.
+    """
+    if not normalize(developer) or not normalize(project):
+        return []
+    prefix = signature_prefix(region, developer, project)
+    # '}' sorts right after '|', so this is exactly the rows starting with prefix
+    query = (session or db.session).query(Quotation).execution_options(region=region).filter(
+        Quotation.duplicate_signature >= prefix, Quotation.duplicate_signature < prefix[:-1] + '}')
+    if exclude_id is not None:
+        query = query.filter(Quotation.id != exclude_id)
+    rera, mobile = normalize_rera(rera_number), normalize_mobile(mobile)
+    matches = []
+    for q in query.order_by(Quotation.created_at).limit(limit):
+        _, _, _, q_rera, q_mobile = q.duplicate_signature.split('|')
+        matches.append((q, bool(rera) and rera == q_rera, bool(mobile) and mobile == q_mobile))
+    return matches
+
+
+def similar_to_dicts(matches):
+    return [{
+        'id': q.id,
+        'developerName': q.developer_name,
+        'projectName': q.project_name,
+        'projectRegion': q.project_region,
+        'createdBy': q.created_by,
+        'ownerUserId': q.owner_user_id,
+        'status': q.status,
+        'createdAt': q.created_at.isoformat() if q.created_at else None,
+        'sameRera': same_rera,
+        'sameMobile': same_mobile,
+    } for q, same_rera, same_mobile in matches]
+
+
+def _similarity(a, b):
+    if not a or not b:
+        return 0.0  # a missing name matches nothing, not every other missing name
+    return len(a & b) / len(a | b)
+
+
+def _is_match(a, b):
+    """Whether two rows of :func:`cluster` describe the same deal"""
+    if a['rera'] and a['rera'] == b['rera']:
+        return True
+    if a['rera'] and b['rera']:
+        return False  # two different registered projects
+    return (a['region'] == b['region']
+            and _similarity(a['developer'], b['developer']) >= NAME_SIMILARITY
+            and _similarity(a['project'], b['project']) >= NAME_SIMILARITY)
+
+
+def blocking_keys(row):
+    keys = []
+    if row['developer'] and row['project']:
+        # Without both names a pair can only match on the RERA number, which
+        # has its own block; a '<region>|<developer>||' block would otherwise
+        # hold every unnamed project of the developer, and is never skipped
+        keys.append(('signature', row['prefix']))
+    if row['rera']:
+        keys.append(('rera', row['rera']))
+    if row['mobile']:
+        keys.append(('mobile', row['mobile']))
+    if row['developer_key']:
+        # Catches a misspelt project name for the same developer
+        keys.append(('developer', row['region'], row['developer_key']))
+    return keys
+
+
+def cluster(rows, max_block_size=MAX_BLOCK_SIZE):
+    """Group rows of ``(id, region, developer, project, rera number, mobile)``
+    into clusters of duplicates.
+
+    Returns ``(clusters, comparisons)``. Each cluster is a list of ids in
+    input order and holds at least two ids. ``comparisons`` is the number
+    of pairs actually compared.
+    """
+    prepared = []
+    blocks = defaultdict(list)
+    for index, (row_id, region, developer, project, rera_number, mobile) in enumerate(rows):
+        developer_tokens = _tokens(developer)
+        row = {
+            'id': row_id,
+            'region': normalize(region),
+            'developer': frozenset(developer_tokens),
+            'developer_key': developer_tokens[0] if developer_tokens else '',
+            'project': frozenset(_tokens(project)),
+            'rera': normalize_rera(rera_number),
+            'mobile': normalize_mobile(mobile),
+            'prefix': signature_prefix(region, developer, project),
+        }
+        prepared.append(row)
+        for key in blocking_keys(row):
+            blocks[key].append(index)
+
+    parent = list(range(len(prepared)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    compared = set()
+    for key, members in blocks.items():
+        if len(members) < 2 or (len(members) > max_block_size and key[0] != 'signature'):
+            continue
+        for x, i in enumerate(members):
+            for j in members[x + 1:]:
+                if find(i) == find(j) or (i, j) in compared:
+                    continue
+                compared.add((i, j))
+                if _is_match(prepared[i], prepared[j]):
+                    parent[find(j)] = find(i)
+
+    groups = defaultdict(list)
+    for i, row in enumerate(prepared):
+        groups[find(i)].append(row['id'])
+    return [ids for ids in groups.values() if len(ids) > 1], len(compared)
@@ -0,0 +1,27 @@
+import gzip
+import json
+import os
+
+
+def month_file(archive_dir, month):
+    return os.path.join(archive_dir, f"quotation-events-{month}.ndjson.gz")
+
+
+def append_month(archive_dir, month, records):
+    """Append event records to the compressed NDJSON file for ``month`` (YYYY-MM).
+
+    Each call appends a new gzip member, which gzip readers concatenate
+    transparently. The file is fsynced before returning so callers can
+    safely delete the archived rows afterwards.
+    """
+    os.makedirs(archive_dir, exist_ok=True)
+    path = month_file(archive_dir, month)
+    with open(path, 'ab') as raw:
+        with gzip.GzipFile(fileobj=raw, mode='wb') as gz:
+            for record in records:
+                gz.write(json.dumps(record, default=str).encode('utf-8'))
+                gz.write(b'\n')
+        raw.flush()
+        os.fsync(raw.fileno())
+    return path
+
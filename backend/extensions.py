@@ -0,0 +1,7 @@
+from flask_cors import CORS
+from flask_sqlalchemy import SQLAlchemy
+
+# Created unbound so models and blueprints can import them without the app;
+# create_app() binds them with init_app()
+db = SQLAlchemy()
+cors = CORS()
@@ -0,0 +1,35 @@
+"""gunicorn settings: load the app once in the master and share it with the workers.
+
+Run with ``gunicorn -c gunicorn.conf.py`` from backend/.
+"""
+import gc
+import multiprocessing
+import os
+
+from preload import freeze_shared_heap
+
+wsgi_app = 'wsgi:app'
+bind = os.environ.get('BIND', '0.0.0.0:3001')
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+worker_class = 'gthread'
+threads = int(os.environ.get('WEB_THREADS', 8))
+
+# Per-worker rate limit buckets would multiply every limit by the worker count
+if workers > 1:
+    os.environ.setdefault('RATELIMIT_BACKEND', 'sqlite')
+
+# Import the app (and build the rate card) in the master before forking
+preload_app = True
+
+
+def on_starting(server):
+    # Avoid collections in the master that would leave holes in shared pages
+    gc.disable()
+
+
+def pre_fork(server, worker):
+    freeze_shared_heap()
+
+
+def post_fork(server, worker):
+    gc.enable()
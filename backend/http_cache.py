@@ -0,0 +1,78 @@
+import gzip
+import hashlib
+
+from flask import request, jsonify, current_app
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+
+def weak_etag(*parts):
+    """Build an ETag value from cheap row validators (ids, versions, timestamps)"""
+    raw = '|'.join('' if p is None else str(p) for p in parts)
+    return hashlib.blake2b(raw.encode('utf-8'), digest_size=10).hexdigest()
+
+
+def conditional_json(etag, build):
+    """Answer a GET with 304 if the client already holds ``etag``.
+
+    ``build`` is only called (and its result serialized) when the client's
+    copy is stale, so a matching ``If-None-Match`` costs one validator query.
+    """
+    return conditional_body(etag, lambda: jsonify(build()))
+
+
+def conditional_body(etag, build):
+    """Like conditional_json, but ``build`` returns the response itself or an
+    already serialized JSON string (e.g. a cached body)."""
+    if request.if_none_match.contains_weak(etag):
+        response = current_app.response_class(status=304)
+    else:
+        response = build()
+        if isinstance(response, str):
+            response = current_app.response_class(response, mimetype='application/json')
+    response.set_etag(etag, weak=True)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def compress_response(response):
+    """after_request hook: gzip/brotli JSON bodies above COMPRESS_MIN_SIZE"""
+    if (response.status_code != 200
+            or response.direct_passthrough
+            or response.is_streamed
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in current_app.config['COMPRESS_MIMETYPES']):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    accepted = request.accept_encodings
+    if brotli is not None and accepted['br']:
+        encoding = 'br'
+    elif accepted['gzip']:
+        encoding = 'gzip'
+    else:
+        return response
+
+    body = response.get_data()
+    if len(body) < current_app.config['COMPRESS_MIN_SIZE']:
+        return response
+
+    if encoding == 'br':
+        body = brotli.compress(body, quality=current_app.config['COMPRESS_BR_LEVEL'])
+    else:
+        body = gzip.compress(body, compresslevel=current_app.config['COMPRESS_GZIP_LEVEL'])
+
+    response.set_data(body)
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+
+def init_compression(app):
+    app.config.setdefault('COMPRESS_MIN_SIZE', 1024)
+    app.config.setdefault('COMPRESS_MIMETYPES', ['application/json'])
+    app.config.setdefault('COMPRESS_GZIP_LEVEL', 6)
+    app.config.setdefault('COMPRESS_BR_LEVEL', 5)
+    app.after_request(compress_response)
@@ -0,0 +1,91 @@
+import os
+import threading
+import time
+import uuid
+
+from sqlalchemy import inspect
+from sqlalchemy.exc import IntegrityError
+
+# Crockford base32: no I, L, O, U; sorts in the same order as the encoded integer
+_CROCKFORD = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'
+
+
+def _encode_base32(value, length):
+    chars = []
+    for _ in range(length):
+        value, rem = divmod(value, 32)
+        chars.append(_CROCKFORD[rem])
+    return ''.join(reversed(chars))
+
+
+class UlidGenerator:
+    """Time-ordered 26-character IDs (48-bit millisecond time + 80 random bits).
+
+    IDs generated in the same millisecond increment the random part instead
+    of drawing a new one, so they stay strictly increasing within a process
+    and new rows always land at the right edge of the primary-key index.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._last_ms = -1
+        self._last_rand = 0
+
+    def __call__(self, prefix):
+        with self._lock:
+            now_ms = time.time_ns() // 1_000_000
+            if now_ms <= self._last_ms:
+                now_ms = self._last_ms
+                self._last_rand = (self._last_rand + 1) & ((1 << 80) - 1)
+            else:
+                self._last_ms = now_ms
+                self._last_rand = int.from_bytes(os.urandom(10), 'big')
+            value = (now_ms << 80) | self._last_rand
+        return f"{prefix}-{_encode_base32(value, 26)}"
+
+
+def random_id(prefix):
+    """Legacy 32-bit random IDs (collide around 65k rows); kept for comparison"""
+    return f"{prefix}-{uuid.uuid4().hex[:8].upper()}"
+
+
+GENERATORS = {
+    'ulid': UlidGenerator(),
+    'random': random_id,
+}
+
+
+def new_id(prefix, generator='ulid'):
+    return GENERATORS[generator](prefix)
+
+
+def is_primary_key_violation(error, table):
+    """Whether IntegrityError ``error`` comes from ``table``'s primary key
+    (rather than a NOT NULL, foreign key or other unique constraint)"""
+    orig = error.orig
+    constraint = getattr(getattr(orig, 'diag', None), 'constraint_name', None)  # psycopg
+    if constraint is not None:
+        return constraint == (table.primary_key.name or f'{table.name}_pkey')
+    message = str(orig)
+    columns = ', '.join(f'{table.name}.{column.name}' for column in table.primary_key.columns)
+    return (message == f'UNIQUE constraint failed: {columns}'  # SQLite
+            or f"for key '{table.name}.PRIMARY'" in message or "for key 'PRIMARY'" in message)  # MySQL
+
+
+def add_with_unique_id(session, obj, prefix, generator='ulid', attempts=3):
+    """Assign ``obj.id`` and INSERT it, drawing a fresh ID on a primary-key collision.
+
+    The insert is flushed inside a SAVEPOINT so a collision only rolls back
+    this row, not the caller's transaction. Any other integrity error is
+    raised at once.
+    """
+    table = inspect(obj).mapper.local_table
+    for attempt in range(attempts):
+        obj.id = new_id(prefix, generator)
+        try:
+            with session.begin_nested():
+                session.add(obj)
+            return obj
+        except IntegrityError as e:
+            if attempt == attempts - 1 or not is_primary_key_violation(e, table):
+                raise
@@ -0,0 +1,174 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+from flask.logging import default_handler
+
+# Attributes every LogRecord has; anything else was passed with ``extra=``
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+REDACTED = '[redacted]'
+
+
+def redact(value, fields):
+    """Copy of ``value`` with the values of any key in ``fields`` replaced"""
+    if isinstance(value, dict):
+        return {k: REDACTED if k in fields else redact(v, fields) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [redact(v, fields) for v in value]
+    return value
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, logger, msg, extra fields, exc"""
+
+    def __init__(self, redact_fields=()):
+        super().__init__()
+        self.redact_fields = frozenset(redact_fields)
+
+    def format(self, record):
+        if self.redact_fields and record.args:
+            if isinstance(record.args, dict):
+                record.args = redact(record.args, self.redact_fields)
+            else:
+                record.args = tuple(redact(a, self.redact_fields) for a in record.args)
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = REDACTED if key in self.redact_fields else redact(value, self.redact_fields)
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class DebugSampler(logging.Filter):
+    """Let through only a fraction of DEBUG records, per logger.
+
+    Runs on the request thread before a record is queued, so dropped
+    records cost one random() call.
+    """
+
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record):
+        if record.levelno > logging.DEBUG:
+            return True
+        rate = self.rates.get(record.name, self.rates.get('*', 1.0))
+        return rate >= 1.0 or random.random() < rate
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """Queue records without formatting them; drop them if the queue is full.
+
+    The stock QueueHandler formats the message on the calling thread. Here
+    only exception tracebacks are rendered up front (they are rare and
+    must not outlive their frames); %-formatting, redaction and JSON
+    encoding happen on the listener thread. Callers must not mutate objects
+    after passing them as log arguments.
+    """
+
+    dropped = 0
+
+    def prepare(self, record):
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            NonBlockingQueueHandler.dropped += 1
+
+
+class _Pipeline:
+    """The process-wide queue, handler and listener thread"""
+
+    def __init__(self):
+        self.settings = None
+        self.handler = None
+        self.listener = None
+
+    def start(self, settings):
+        self.stop()
+        self.settings = settings
+        log_queue = queue.Queue(maxsize=settings['queue_size'])
+
+        output = logging.StreamHandler(sys.stderr)
+        output.setFormatter(JsonFormatter(settings['redact_fields']))
+        self.listener = QueueListener(log_queue, output)
+        self.listener.start()
+
+        self.handler = NonBlockingQueueHandler(log_queue)
+        self.handler.addFilter(DebugSampler(settings['debug_sample_rates']))
+        root = logging.getLogger()
+        root.addHandler(self.handler)
+        root.setLevel(settings['level'])
+        for name, level in settings['levels'].items():
+            logging.getLogger(name).setLevel(level)
+
+    def stop(self):
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+        if self.handler is not None:
+            logging.getLogger().removeHandler(self.handler)
+            self.handler = None
+
+    def restart_after_fork(self):
+        # The listener thread does not survive fork(); give the child its own
+        if self.settings is not None:
+            self.listener = None
+            self.start(self.settings)
+
+
+_pipeline = _Pipeline()
+atexit.register(_pipeline.stop)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_pipeline.restart_after_fork)
+
+
+def _level(name):
+    if isinstance(name, int):
+        return name
+    return getattr(logging, str(name).upper(), logging.INFO)
+
+
+def init_logging(app):
+    """Route all logging through a queue to a JSON writer thread.
+
+    LOG_LEVEL sets the root level and LOG_LEVELS per-logger overrides
+    (module names, e.g. ``{'quotation_routes': 'DEBUG'}``). Keys listed in
+    LOG_REDACT_FIELDS are masked in dict arguments and ``extra`` fields.
+    LOG_DEBUG_SAMPLE_RATES maps logger names (or '*') to the fraction of
+    DEBUG records kept.
+    """
+    app.config.setdefault('LOG_LEVEL', 'INFO')
+    app.config.setdefault('LOG_LEVELS', {})
+    app.config.setdefault('LOG_QUEUE_SIZE', 10000)
+    app.config.setdefault('LOG_REDACT_FIELDS', [])
+    app.config.setdefault('LOG_DEBUG_SAMPLE_RATES', {})
+
+    _pipeline.start({
+        'level': _level(app.config['LOG_LEVEL']),
+        'levels': {name: _level(level) for name, level in app.config['LOG_LEVELS'].items()},
+        'queue_size': app.config['LOG_QUEUE_SIZE'],
+        'redact_fields': app.config['LOG_REDACT_FIELDS'],
+        'debug_sample_rates': app.config['LOG_DEBUG_SAMPLE_RATES'],
+    })
+    # app.logger propagates to the root handler instead of writing to stderr itself
+    app.logger.removeHandler(default_handler)
+    app.logger.setLevel(logging.NOTSET)
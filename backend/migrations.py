@@ -0,0 +1,34 @@
+from sqlalchemy import inspect, text
+
+
+def add_missing_columns(engine, additions):
+    """Add columns introduced after a table was first created.
+
+    ``db.create_all()`` only creates missing tables, so existing SQLite
+    databases never pick up new columns. ``additions`` maps a table name to a
+    list of ``(column_name, column_ddl)`` pairs.
+    """
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    with engine.begin() as conn:
+        for table, columns in additions.items():
+            if table not in existing_tables:
+                continue
+            existing = {c['name'] for c in inspector.get_columns(table)}
+            for name, ddl in columns:
+                if name not in existing:
+                    conn.execute(text(f'ALTER TABLE {table} ADD COLUMN {name} {ddl}'))
+
+
+def create_missing_indexes(engine, metadata):
+    """Create the declared indexes that an existing table does not have yet.
+
+    Like columns, indexes added to a model after its table was created are
+    skipped by ``db.create_all()``.
+    """
+    existing_tables = set(inspect(engine).get_table_names())
+    for table in metadata.sorted_tables:
+        if table.name in existing_tables:
+            for index in table.indexes:
+                index.create(engine, checkfirst=True)
+
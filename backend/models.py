@@ -0,0 +1,339 @@
+from datetime import datetime
+import json
+import zlib
+
+from flask import g, has_app_context
+from sqlalchemy import event, inspect
+from sqlalchemy.ext.mutable import MutableList
+
+from extensions import db
+from password_hashing import password_hasher
+
+
+class User(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    fname = db.Column(db.String(80), nullable=True)
+    lname = db.Column(db.String(80), nullable=True)
+    username = db.Column(db.String(80), unique=True, nullable=False)
+    password_hash = db.Column(db.String(200), nullable=False)
+    role = db.Column(db.String(20), default="user")
+    threshold = db.Column(db.Float, default=0.0)
+
+    def set_password(self, password):
+        self.password_hash = password_hasher.hash(password)
+
+    def check_password(self, password):
+        """Verify ``password``, upgrading the stored hash if the configured method changed"""
+        if not password_hasher.verify(self.password_hash, password):
+            return False
+        if password_hasher.needs_rehash(self.password_hash):
+            # Only when the pool has room: a busy pool must not turn a
+            # correct login into a 503; the upgrade waits for a later login
+            rehashed = password_hasher.try_hash(password)
+            if rehashed is not None:
+                self.password_hash = rehashed
+        return True
+
+class Quotation(db.Model):
+    id = db.Column(db.String(50), primary_key=True)
+    developer_type = db.Column(db.String(20), nullable=False)
+    project_region = db.Column(db.String(100), nullable=False)
+    plot_area = db.Column(db.Float, nullable=False)
+    developer_name = db.Column(db.String(200), nullable=False)
+    project_name = db.Column(db.String(200))
+    contact_mobile = db.Column(db.String(15))
+    contact_email = db.Column(db.String(100))
+    validity = db.Column(db.String(20), default='7 days')
+    payment_schedule = db.Column(db.String(10), default='50%')
+    rera_number = db.Column(db.String(50))
+    
+    # Use MutableList for JSON fields that store arrays
+    headers = db.Column(MutableList.as_mutable(db.JSON))
+    pricing_breakdown = db.Column(MutableList.as_mutable(db.JSON))
+    # Term ids (see Term); the text columns only hold rows written before
+    # the terms library and are emptied by ``flask intern-terms``
+    applicable_term_ids = db.Column(db.JSON)
+    custom_term_ids = db.Column(db.JSON)
+    legacy_applicable_terms = db.Column('applicable_terms', MutableList.as_mutable(db.JSON))
+    legacy_custom_terms = db.Column('custom_terms', MutableList.as_mutable(db.JSON))
+    
+    total_amount = db.Column(db.Float, default=0.0)
+    discount_amount = db.Column(db.Float, default=0.0)
+    discount_percent = db.Column(db.Float, default=0.0)
+    service_summary = db.Column(db.Text)
+    created_by = db.Column(db.String(200))
+    # The signed-in user who created the quotation; created_by is a display
+    # name (the developer or agent), not an account
+    owner_user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+    status = db.Column(db.String(20), default='draft')
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    terms_accepted = db.Column(db.Boolean, default=False, nullable=False)
+    requires_approval = db.Column(db.Boolean, default=False)
+    # While pending: the discount an approver's threshold must cover, and why
+    # approval is needed (kept up to date by approval_queue)
+    required_discount = db.Column(db.Float)
+    approval_reasons = db.Column(db.JSON)
+    # region|developer|project|rera|mobile, normalized (see duplicates.py)
+    duplicate_signature = db.Column(db.String(400))
+    approved_by = db.Column(db.String(100))
+    approved_at = db.Column(db.DateTime)
+
+    # Row validators: version is bumped by SQLAlchemy on every UPDATE and
+    # feeds the ETags served by the read endpoints
+    version = db.Column(db.Integer, nullable=False, default=1)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __mapper_args__ = {'version_id_col': version}
+
+    __table_args__ = (
+        db.Index('ix_quotation_owner_created', 'owner_user_id', 'created_at'),
+        db.Index('ix_quotation_approval_queue', 'requires_approval', 'required_discount'),
+        db.Index('ix_quotation_duplicate_signature', 'duplicate_signature'),
+    )
+
+    @property
+    def applicable_terms(self):
+        if self.applicable_term_ids is None:
+            return self.legacy_applicable_terms or []
+        from terms import term_texts
+        return term_texts(self.applicable_term_ids)
+
+    @property
+    def custom_terms(self):
+        if self.custom_term_ids is None:
+            return self.legacy_custom_terms or []
+        from terms import term_texts
+        return term_texts(self.custom_term_ids)
+
+    def set_terms(self, applicable=None, custom=None):
+        """Replace the applicable and/or custom terms (lists of text) with
+        deduplicated references into the terms library"""
+        from terms import dedupe, intern_terms
+        lists = {name: dedupe(texts) for name, texts in
+                 (('applicable', applicable), ('custom', custom)) if texts is not None}
+        for name, ids in zip(lists, intern_terms(*lists.values())):
+            setattr(self, f'{name}_term_ids', ids)
+            setattr(self, f'legacy_{name}_terms', None)
+
+    def to_dict(self):
+        from terms import prefetch_terms
+        prefetch_terms([self])  # one lookup for both term lists
+
+        effective_discount = (
+            self.discount_percent if self.discount_percent > 0
+            else (self.discount_amount / (self.total_amount + self.discount_amount) * 100
+                  if self.total_amount and self.discount_amount else 0)
+        )
+
+        return {
+            'id': self.id,
+            'developerType': self.developer_type,
+            'projectRegion': self.project_region,
+            'plotArea': self.plot_area,
+            'developerName': self.developer_name,
+            'projectName': self.project_name,
+            'contactMobile': self.contact_mobile,
+            'contactEmail': self.contact_email,
+            'validity': self.validity,
+            'paymentSchedule': self.payment_schedule,
+            'reraNumber': self.rera_number,
+            'headers': self.headers or [],
+            'pricingBreakdown': self.pricing_breakdown or [],
+            'totalAmount': self.total_amount,
+            'discountAmount': self.discount_amount,
+            'effectiveDiscountPercent': round(effective_discount, 2),
+            'serviceSummary': self.service_summary,
+            'createdBy': self.created_by,
+            'ownerUserId': self.owner_user_id,
+            'status': self.status,
+            'createdAt': self.created_at.isoformat() if self.created_at else None,
+            'termsAccepted': bool(self.terms_accepted),
+            'applicableTerms': self.applicable_terms,
+            'customTerms': self.custom_terms,
+            'requiresApproval': self.requires_approval,
+            'requiredDiscount': self.required_discount,
+            'approvalReasons': self.approval_reasons or [],
+            'approvedBy': self.approved_by,
+            'approvedAt': self.approved_at.isoformat() if self.approved_at else None,
+            'version': self.version,
+            'updatedAt': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+class Term(db.Model):
+    """One distinct term text, shared by every quotation that uses it"""
+    id = db.Column(db.Integer, primary_key=True)
+    content_hash = db.Column(db.String(64), nullable=False, unique=True)
+    text = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    # AUTOINCREMENT: ids of rolled-back inserts are never handed out again,
+    # which keeps the process-wide id -> text cache in terms.py valid
+    __table_args__ = {'sqlite_autoincrement': True}
+
+class QuotationEvent(db.Model):
+    """Append-only history of quotation lifecycle and status changes"""
+    __tablename__ = 'quotation_event'
+
+    id = db.Column(db.Integer, primary_key=True)
+    # No foreign key: history must outlive deleted or archived quotations
+    quotation_id = db.Column(db.String(50), nullable=False)
+    event_type = db.Column(db.String(30), nullable=False)
+    from_status = db.Column(db.String(20))
+    to_status = db.Column(db.String(20))
+    actor = db.Column(db.String(100))
+    details = db.Column(db.JSON)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    # AUTOINCREMENT: ids of compacted-away rows are never handed out again,
+    # so an id names one event in the database and the archive files alike
+    __table_args__ = (
+        db.Index('ix_quotation_event_quotation_created', 'quotation_id', 'created_at'),
+        db.Index('ix_quotation_event_created', 'created_at'),
+        {'sqlite_autoincrement': True},
+    )
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'quotationId': self.quotation_id,
+            'eventType': self.event_type,
+            'fromStatus': self.from_status,
+            'toStatus': self.to_status,
+            'actor': self.actor,
+            'details': self.details or {},
+            'createdAt': self.created_at.isoformat() if self.created_at else None
+        }
+
+class ApprovalStreamEvent(db.Model):
+    """One approval queue change, relayed to the SSE streams of every worker
+    (see approval_stream.py); only the most recent rows are kept"""
+    __tablename__ = 'approval_stream_event'
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(10), nullable=False)
+    quotation_id = db.Column(db.String(50), nullable=False)
+    data = db.Column(db.JSON)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    # AUTOINCREMENT: the id is the stream's resume token and must never be reused
+    __table_args__ = {'sqlite_autoincrement': True}
+
+class QuotationRevision(db.Model):
+    """One saved state of a quotation's editable content (see revisions.py).
+
+    ``payload`` is zlib-compressed JSON: the whole document for a
+    checkpoint, otherwise a delta against the previous revision.
+    """
+    __tablename__ = 'quotation_revision'
+
+    id = db.Column(db.Integer, primary_key=True)
+    # No foreign key, as for QuotationEvent
+    quotation_id = db.Column(db.String(50), nullable=False)
+    revision = db.Column(db.Integer, nullable=False)
+    is_checkpoint = db.Column(db.Boolean, nullable=False, default=False)
+    payload = db.Column(db.LargeBinary, nullable=False)
+    actor = db.Column(db.String(100))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        db.UniqueConstraint('quotation_id', 'revision', name='uq_quotation_revision'),
+    )
+
+    def to_dict(self):
+        return {
+            'revision': self.revision,
+            'checkpoint': self.is_checkpoint,
+            'bytes': len(self.payload),
+            'actor': self.actor,
+            'createdAt': self.created_at.isoformat() if self.created_at else None
+        }
+
+class ArchivedQuotation(db.Model):
+    """Cold-storage copy of a quotation moved out of the hot table.
+
+    Only the columns needed to find a row are kept uncompressed; the full
+    ``to_dict()`` payload is stored zlib-compressed.
+    """
+    __bind_key__ = 'archive'
+    __tablename__ = 'archived_quotation'
+
+    id = db.Column(db.String(50), primary_key=True)
+    developer_type = db.Column(db.String(20))
+    created_by = db.Column(db.String(200))
+    owner_user_id = db.Column(db.Integer)
+    status = db.Column(db.String(20))
+    created_at = db.Column(db.DateTime)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+    version = db.Column(db.Integer, nullable=False, default=1)
+    payload = db.Column(db.LargeBinary, nullable=False)
+
+    @classmethod
+    def from_quotation(cls, q):
+        return cls(
+            id=q.id,
+            developer_type=q.developer_type,
+            created_by=q.created_by,
+            owner_user_id=q.owner_user_id,
+            status=q.status,
+            created_at=q.created_at,
+            archived_at=datetime.utcnow(),
+            version=q.version,
+            payload=zlib.compress(json.dumps(q.to_dict()).encode('utf-8'))
+        )
+
+    def to_dict(self):
+        data = json.loads(zlib.decompress(self.payload))
+        data['ownerUserId'] = self.owner_user_id  # may be backfilled after archiving
+        data['archived'] = True
+        return data
+
+def _new_quotation_event(q, event_type, from_status=None):
+    actor = None
+    if has_app_context() and g.get('current_user') is not None:
+        actor = g.current_user.username
+    return QuotationEvent(
+        quotation_id=q.id,
+        event_type=event_type,
+        from_status=from_status,
+        to_status=q.status or 'draft',
+        actor=actor,
+        details={
+            'requiresApproval': bool(q.requires_approval),
+            'approvedBy': q.approved_by,
+            'totalAmount': q.total_amount,
+            'discountPercent': q.discount_percent,
+        },
+        created_at=datetime.utcnow()
+    )
+
+@event.listens_for(db.session, 'before_flush')
+def record_quotation_events(session, flush_context, instances):
+    """Queue QuotationEvent rows for the quotations in this flush.
+
+    The events are added to the same unit of work, so they are inserted in
+    one batch with the quotation changes and commit (or roll back) with them.
+    """
+    events = []
+    for obj in session.new:
+        if isinstance(obj, Quotation):
+            events.append(_new_quotation_event(obj, 'created'))
+    for obj in session.dirty:
+        if not isinstance(obj, Quotation):
+            continue
+        history = inspect(obj).attrs.status.history
+        if not history.has_changes():
+            continue
+        from_status = history.deleted[0] if history.deleted else None
+        if obj.status == 'rejected':
+            event_type = 'rejected'
+        elif obj.status == 'completed' and inspect(obj).attrs.approved_by.history.has_changes():
+            event_type = 'approved'
+        else:
+            event_type = 'status_changed'
+        events.append(_new_quotation_event(obj, event_type, from_status))
+    deleted_type = 'archived' if session.info.get('archiving') else 'deleted'
+    for obj in session.deleted:
+        if isinstance(obj, Quotation):
+            events.append(_new_quotation_event(obj, deleted_type, obj.status))
+    if events:
+        session.add_all(events)
@@ -0,0 +1,431 @@
+"""Optional region-partitioned storage for quotations.
+
+With PARTITION_DIR set, each region's quotations can live in their own
+SQLite file, ``<PARTITION_DIR>/<region slug>.db``. There is one file per
+region of the rate card, plus ``other.db`` for any other region. A file
+holds the region's quotation, quotation_event and quotation_revision rows.
+Those three tables are written in one transaction, so they have to share a
+file. Users, terms and the archive stay in their own databases. A write
+then takes only its region's write lock, and one busy office no longer
+makes the others wait.
+
+Partitions are used through a routing session, a SQLAlchemy
+``ShardedSession`` with one shard per file:
+
+- A quotation is written to the partition of its project_region. Its
+  events and revisions follow it.
+- ``get(id, region)`` reads one partition. Without a region, each
+  partition's primary key is probed in turn.
+- A query whose WHERE clause pins project_region (``==`` or ``in_``) runs
+  on the matching partitions only. Any other query runs on all of them.
+- The flush hooks that db.session runs (events, revisions, approval level,
+  duplicate signature, cache invalidation) are registered on the routing
+  session as well.
+
+Queries across regions scatter-gather. Every partition runs the same
+statement, with the same ORDER BY and LIMIT, in parallel. The sorted
+partial results are merged and the limit is applied again.
+
+When PARTITION_DIR is set the HTTP routes read and write quotations through
+:func:`quotation_session`, a RoutingSession per app context, and list them
+with :func:`find_quotations` and friends, which scatter-gather. The main
+database keeps users, terms and the approval stream; its quotation tables
+are only the source of ``flask partition-quotations``, which copies them
+into the partitions once before switching. The batch jobs (reprice,
+backfills, archiving, event compaction) still work on the main database
+only and refuse to run while partitioning is on; ``flask backup-db`` snapshots
+each partition as the bind ``partition:<shard id>``.
+
+Each partition hands out quotation_event ids from its own range (see
+:func:`event_id_base`), so an id names one event across all the files.
+"""
+import heapq
+import json
+import os
+import re
+import threading
+import zlib
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from itertools import islice
+
+from flask import current_app, g
+from sqlalchemy import create_engine, event, func, inspect, select, text
+from sqlalchemy.ext.horizontal_shard import ShardedSession
+from sqlalchemy.orm import object_session, sessionmaker
+from sqlalchemy.sql import operators
+from sqlalchemy.sql.elements import BinaryExpression, BindParameter, BooleanClauseList
+
+import approval_queue
+import duplicates
+import quotation_cache
+import revisions
+from backup import init_journal_mode
+from extensions import db
+from models import Quotation, QuotationEvent, QuotationRevision, record_quotation_events
+
+OTHER = 'other'
+LOCATED_MAX = 50000  # quotation ids whose partition get() remembers
+PARTITIONED_TABLES = (Quotation.__table__, QuotationEvent.__table__, QuotationRevision.__table__)
+
+
+def region_slug(region):
+    """'Mumbai Suburban' -> 'mumbai-suburban'"""
+    return re.sub(r'[^a-z0-9]+', '-', (region or '').casefold()).strip('-')
+
+
+def rate_card_regions(pricing_path):
+    """Every region that appears in the rate card, in file order"""
+    with open(pricing_path) as f:
+        data = json.load(f)
+    regions = {}
+    for category in data.values():
+        regions.update(dict.fromkeys(category))
+    return list(regions)
+
+
+class RoutingSession(ShardedSession):
+    """ShardedSession over the partitions of a RegionPartitions"""
+
+
+# The same unit-of-work hooks as db.session, so a quotation written through
+# the routing session gets its events, revisions and derived columns
+for _name, _hook in (
+    ('before_flush', record_quotation_events),
+    ('before_flush', revisions.record_revisions),
+    ('before_flush', approval_queue.record_approval_level),
+    ('before_flush', duplicates.record_signature),
+    ('after_commit', approval_queue._invalidate_counts),
+    ('after_rollback', approval_queue._forget_queue_change),
+    ('after_flush', quotation_cache._collect_changed_quotations),
+    ('after_commit', quotation_cache._invalidate_committed_quotations),
+    ('after_rollback', quotation_cache._forget_rolled_back_quotations),
+):
+    event.listen(RoutingSession, _name, _hook)
+
+
+def event_id_base(shard_id):
+    """First quotation_event id of a partition: a 2**32 range picked by a
+    hash of the shard id, so adding a region later does not move the others.
+    Ranges stay below 2**53, the largest integer a JavaScript client reads exactly."""
+    return ((zlib.crc32(shard_id.encode('utf-8')) & 0xFFFF) + 1) << 32
+
+
+def _pinned_regions(where):
+    """Regions a WHERE clause restricts project_region to, or None.
+
+    Only top-level AND terms are considered: a region test inside an OR
+    does not narrow the query.
+    """
+    if where is None:
+        return None
+    terms = where.clauses if isinstance(where, BooleanClauseList) and where.operator is operators.and_ else [where]
+    regions = None
+    for term in terms:
+        if not (isinstance(term, BinaryExpression) and getattr(term.left, 'table', None) is Quotation.__table__
+                and term.left.name == 'project_region' and isinstance(term.right, BindParameter)):
+            continue
+        if term.operator is operators.eq:
+            values = {term.right.effective_value}
+        elif term.operator is operators.in_op:
+            values = set(term.right.effective_value)
+        else:
+            continue
+        regions = values if regions is None else regions & values
+    return regions
+
+
+class RegionPartitions:
+    """The partition engines and the routing session over them.
+
+    ``engines`` maps shard id -> engine. ``regions`` maps region slug ->
+    shard id and needs an ``OTHER`` entry. Several slugs may share a shard:
+    ``single_file`` puts every region in one file, which is the unpartitioned
+    layout with the same code path.
+    """
+
+    def __init__(self, engines, regions):
+        self.engines = engines
+        self.regions = regions
+        self.shard_ids = sorted(engines)
+        self.Session = sessionmaker(
+            class_=RoutingSession, shards=engines, expire_on_commit=False,
+            shard_chooser=self._shard_for_instance,
+            identity_chooser=self._shards_for_identity,
+            execute_chooser=self._shards_for_query,
+        )
+        # An id does not say which region it belongs to, so get() without a
+        # region probes the partitions; ids seen before go straight to theirs
+        self._located = OrderedDict()  # LRU, shared by the request threads
+        self._located_lock = threading.Lock()
+        event.listen(self.Session, 'loaded_as_persistent', self._remember_partition)
+        event.listen(self.Session, 'pending_to_persistent', self._remember_partition)
+
+    @classmethod
+    def from_directory(cls, directory, regions, **engine_options):
+        slugs = [region_slug(region) for region in regions] + [OTHER]
+        engines = {slug: _engine(os.path.join(directory, f'{slug}.db'), **engine_options) for slug in slugs}
+        return cls(engines, {slug: slug for slug in slugs})
+
+    @classmethod
+    def single_file(cls, path, regions, **engine_options):
+        return cls({'all': _engine(path, **engine_options)},
+                   {slug: 'all' for slug in [region_slug(region) for region in regions] + [OTHER]})
+
+    def shard_for_region(self, region):
+        return self.regions.get(region_slug(region), self.regions[OTHER])
+
+    def create_all(self):
+        """Create the partitioned tables (and the events trigger) in every
+        partition, and start each partition's event ids at its own range"""
+        bases = {shard_id: event_id_base(shard_id) for shard_id in self.shard_ids}
+        if len(set(bases.values())) != len(bases):
+            raise ValueError(f'partitions share a quotation_event id range: {sorted(bases)}')
+        for shard_id, engine in self.engines.items():
+            os.makedirs(os.path.dirname(engine.url.database) or '.', exist_ok=True)
+            db.metadata.create_all(engine, tables=PARTITIONED_TABLES)
+            with engine.begin() as conn:
+                conn.execute(text(
+                    "CREATE TRIGGER IF NOT EXISTS quotation_event_append_only "
+                    "BEFORE UPDATE ON quotation_event "
+                    "BEGIN SELECT RAISE(ABORT, 'quotation_event is append-only'); END"
+                ))
+                # AUTOINCREMENT continues from sqlite_sequence; rows copied from
+                # the main database keep their (lower) ids and do not move it back
+                conn.execute(text(
+                    "INSERT INTO sqlite_sequence (name, seq) SELECT 'quotation_event', :base "
+                    "WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = 'quotation_event')"
+                ), {'base': bases[shard_id]})
+                conn.execute(text(
+                    "UPDATE sqlite_sequence SET seq = :base WHERE name = 'quotation_event' AND seq < :base"
+                ), {'base': bases[shard_id]})
+
+    def dispose(self):
+        for engine in self.engines.values():
+            engine.dispose()
+
+    # -- routing --
+
+    def _shard_for_instance(self, mapper, instance, clause=None):
+        if isinstance(instance, Quotation):
+            return self.shard_for_region(instance.project_region)
+        if isinstance(instance, (QuotationEvent, QuotationRevision)):
+            return self._shard_of_quotation(object_session(instance), instance.quotation_id)
+        raise ValueError(f'{type(instance).__name__} is not stored in the region partitions')
+
+    def _shard_of_quotation(self, session, quotation_id):
+        """Partition of a quotation in ``session`` (new, loaded or being deleted)"""
+        for obj in session.new:
+            if isinstance(obj, Quotation) and obj.id == quotation_id:
+                return self.shard_for_region(obj.project_region)
+        for obj in session.identity_map.values():
+            if isinstance(obj, Quotation) and obj.id == quotation_id:
+                return inspect(obj).identity_token
+        raise ValueError(f'quotation {quotation_id} is not in this session; load it before adding its history')
+
+    def _remember_partition(self, session, instance):
+        if isinstance(instance, Quotation):
+            with self._located_lock:
+                self._located[instance.id] = inspect(instance).identity_token
+                self._located.move_to_end(instance.id)
+                if len(self._located) > LOCATED_MAX:
+                    self._located.popitem(last=False)
+
+    def _shards_for_identity(self, mapper, primary_key, *, lazy_loaded_from=None, execution_options=None, **kw):
+        if lazy_loaded_from is not None:
+            return [lazy_loaded_from.identity_token]
+        region = (execution_options or {}).get('region')
+        if region is not None:
+            return [self.shard_for_region(region)]
+        located = None
+        if mapper.class_ is Quotation:
+            with self._located_lock:
+                located = self._located.get(primary_key[0])
+                if located is not None:
+                    self._located.move_to_end(primary_key[0])
+        if located is not None:
+            return [located] + [shard_id for shard_id in self.shard_ids if shard_id != located]
+        return self.shard_ids
+
+    def _shards_for_query(self, context):
+        region = context.execution_options.get('region')
+        if region is not None:
+            return [self.shard_for_region(region)]
+        regions = _pinned_regions(getattr(context.statement, 'whereclause', None))
+        if regions is not None:
+            return sorted({self.shard_for_region(region) for region in regions})
+        return self.shard_ids
+
+    # -- reads --
+
+    def get(self, quotation_id, region=None):
+        """The quotation with ``quotation_id``, from its region's partition when ``region`` is given"""
+        with self.Session() as session:
+            options = {'region': region} if region is not None else {}
+            return session.get(Quotation, quotation_id, execution_options=options)
+
+    def scatter(self, statement, shard_ids=None):
+        """Run ``statement`` on each partition in parallel; ``[(shard id, rows), ...]``"""
+        shard_ids = shard_ids or self.shard_ids
+
+        def run(shard_id):
+            with self.Session() as session:
+                return shard_id, session.execute(statement, bind_arguments={'shard_id': shard_id}).all()
+
+        if len(shard_ids) == 1:
+            return [run(shard_ids[0])]
+        with ThreadPoolExecutor(len(shard_ids)) as pool:
+            return list(pool.map(run, shard_ids))
+
+    def merged(self, statement, key, limit=None, reverse=False, shard_ids=None):
+        """Rows of ``statement`` (one entity per row) from each partition,
+        merged by ``key``; the statement must already be ordered that way"""
+        partials = [[row[0] for row in rows] for _, rows in self.scatter(statement, shard_ids)]
+        return list(islice(heapq.merge(*partials, key=key, reverse=reverse), limit))
+
+    def list_quotations(self, *criteria, regions=None, limit=None):
+        """Quotations matching ``criteria``, newest first, across ``regions`` (default: all).
+
+        Each partition sorts and returns only its own newest ``limit`` rows,
+        and the sorted lists are merged.
+        """
+        statement = select(Quotation).where(*criteria).order_by(Quotation.created_at.desc(), Quotation.id.desc())
+        if limit is not None:
+            statement = statement.limit(limit)
+        shard_ids = sorted({self.shard_for_region(region) for region in regions}) if regions else None
+        return self.merged(statement, lambda q: (q.created_at or datetime.min, q.id), limit, True, shard_ids)
+
+    def list_events(self, *criteria, limit=None):
+        """Quotation events matching ``criteria``, oldest first, across all partitions"""
+        statement = select(QuotationEvent).where(*criteria).order_by(QuotationEvent.created_at, QuotationEvent.id)
+        if limit is not None:
+            statement = statement.limit(limit)
+        return self.merged(statement, lambda e: (e.created_at, e.id), limit)
+
+    def count(self, *criteria):
+        """{shard id: quotations matching ``criteria``}"""
+        statement = select(func.count(Quotation.id)).where(*criteria)
+        return {shard_id: rows[0][0] for shard_id, rows in self.scatter(statement)}
+
+    def list_stats(self, *criteria):
+        """``(count, latest updated_at, version sum)`` of the matching quotations, as for one table"""
+        statement = select(func.count(Quotation.id), func.max(Quotation.updated_at),
+                           func.sum(Quotation.version)).where(*criteria)
+        parts = [rows[0] for _, rows in self.scatter(statement)]
+        updated = [part[1] for part in parts if part[1] is not None]
+        return (sum(part[0] for part in parts), max(updated) if updated else None,
+                sum(part[2] or 0 for part in parts) if any(part[2] is not None for part in parts) else None)
+
+    def pending_by_required_discount(self):
+        """Counter of pending quotations by required_discount, across all partitions"""
+        statement = (select(Quotation.required_discount, func.count(Quotation.id))
+                     .where(Quotation.requires_approval.is_(True))
+                     .group_by(Quotation.required_discount))
+        counts = Counter()
+        for _, rows in self.scatter(statement):
+            for required, count in rows:
+                counts[required] += count
+        return counts
+
+
+def _engine(path, **options):
+    # A writer waits for another's commit on the same file instead of failing
+    options.setdefault('connect_args', {'timeout': 30})
+    return create_engine(f'sqlite:///{path}', **options)
+
+
+def init_partitions(app):
+    """Build the partitions configured by PARTITION_DIR (nothing when unset)"""
+    directory = app.config.get('PARTITION_DIR')
+    if not directory:
+        app.extensions.pop('partitions', None)
+        return
+    partitions = RegionPartitions.from_directory(directory, rate_card_regions(app.config['PRICING_DATA_PATH']))
+    init_journal_mode(app, partitions.engines.values())
+    app.extensions['partitions'] = partitions
+    app.teardown_appcontext(_close_quotation_session)
+
+
+def get_partitions():
+    """The app's RegionPartitions, or None when partitioning is off"""
+    return current_app.extensions.get('partitions')
+
+
+# -- quotation storage for the routes: the main database or the partitions --
+
+def quotation_session():
+    """Session to read and write quotations, their events and revisions through:
+    db.session, or this app context's RoutingSession when partitioning is on"""
+    partitions = get_partitions()
+    if partitions is None:
+        return db.session
+    if 'quotation_session' not in g:
+        g.quotation_session = partitions.Session()
+    return g.quotation_session
+
+
+def commit_quotations():
+    """Commit db.session and, when partitioning is on, the quotation session.
+
+    The two are separate SQLite files, so this is not atomic. The quotation,
+    its events and its revisions are flushed to their partition first. That
+    is where constraint and version conflicts show up, and it takes the
+    partition's write lock, while nothing is committed yet. Then the terms
+    the quotation refers to are committed in the main database, and finally
+    the partition. If that last commit fails, the partition is rolled back
+    and only the new terms remain. They are content-addressed and shared, so
+    an unreferenced term is harmless and is reused by the next write of the
+    same text. A quotation without its terms would not be harmless.
+    """
+    session = g.get('quotation_session')
+    if session is None:
+        db.session.commit()
+        return
+    session.flush()
+    db.session.commit()
+    try:
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+
+
+def rollback_quotations():
+    session = g.get('quotation_session')
+    if session is not None:
+        session.rollback()
+    db.session.rollback()
+
+
+def _close_quotation_session(exc):
+    session = g.pop('quotation_session', None)
+    if session is not None:
+        session.close()
+
+
+def find_quotations(*criteria):
+    """Quotations matching ``criteria``, newest first"""
+    partitions = get_partitions()
+    if partitions is None:
+        return Quotation.query.filter(*criteria).order_by(Quotation.created_at.desc()).all()
+    return partitions.list_quotations(*criteria)
+
+
+def quotation_list_stats(*criteria):
+    """``(count, latest updated_at, version sum)`` of the quotations matching ``criteria``"""
+    partitions = get_partitions()
+    if partitions is None:
+        return Quotation.query.filter(*criteria).with_entities(
+            func.count(Quotation.id), func.max(Quotation.updated_at), func.sum(Quotation.version)
+        ).one()
+    return partitions.list_stats(*criteria)
+
+
+def find_events(*criteria, limit=None):
+    """Quotation events matching ``criteria``, oldest first"""
+    partitions = get_partitions()
+    if partitions is None:
+        query = QuotationEvent.query.filter(*criteria).order_by(QuotationEvent.created_at, QuotationEvent.id)
+        return (query.limit(limit) if limit is not None else query).all()
+    return partitions.list_events(*criteria, limit=limit)
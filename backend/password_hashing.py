@@ -0,0 +1,102 @@
+import os
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from flask import current_app
+from werkzeug.security import generate_password_hash, check_password_hash
+
+
+class HashingOverloaded(Exception):
+    """Raised when the hashing queue is full; callers should answer 503"""
+
+
+class _AppHasher:
+    def __init__(self, method, offload, timeout, workers, max_queue):
+        self.method = method
+        self.offload = offload
+        self.timeout = timeout
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
+        self.slots = threading.BoundedSemaphore(workers + max_queue)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
+
+
+class PasswordHasher:
+    """Run password hashing on a small bounded executor.
+
+    scrypt/pbkdf2 release the GIL, so a handful of hashing threads can use
+    every core while request threads only wait on a future. At most
+    ``workers + max_queue`` hashes are admitted at once. A hash beyond that
+    waits for a slot, and HashingOverloaded is raised only when it cannot
+    finish within ``timeout`` seconds of being requested. Optional work (the
+    rehash on login) is skipped instead of waiting.
+
+    The executor belongs to the app (``app.extensions['password_hasher']``),
+    so creating another app leaves this one's pool running.
+    """
+
+    def init_app(self, app):
+        app.config.setdefault('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+        app.config.setdefault('PASSWORD_HASH_OFFLOAD', True)
+        app.config.setdefault('PASSWORD_HASH_WORKERS', os.cpu_count() or 1)
+        app.config.setdefault('PASSWORD_HASH_MAX_QUEUE', 32)
+        app.config.setdefault('PASSWORD_HASH_TIMEOUT', 10.0)
+
+        previous = app.extensions.get('password_hasher')
+        if previous is not None:
+            previous.shutdown()
+        state = _AppHasher(
+            app.config['PASSWORD_HASH_METHOD'], app.config['PASSWORD_HASH_OFFLOAD'],
+            app.config['PASSWORD_HASH_TIMEOUT'], app.config['PASSWORD_HASH_WORKERS'],
+            app.config['PASSWORD_HASH_MAX_QUEUE'],
+        )
+        app.extensions['password_hasher'] = state
+        # Flask has no app-level teardown: the pool goes when the app does
+        weakref.finalize(app, state.shutdown)
+
+    @property
+    def _state(self):
+        return current_app.extensions['password_hasher']
+
+    def _run(self, fn, *args, wait=True):
+        state = self._state
+        if not state.offload:
+            return fn(*args)
+        deadline = time.monotonic() + state.timeout
+        admitted = state.slots.acquire(timeout=state.timeout) if wait else state.slots.acquire(blocking=False)
+        if not admitted:
+            raise HashingOverloaded()
+        try:
+            future = state.executor.submit(fn, *args)
+        except Exception:
+            state.slots.release()
+            raise
+        future.add_done_callback(lambda _: state.slots.release())
+        try:
+            return future.result(timeout=max(deadline - time.monotonic(), 0))
+        except FutureTimeout:
+            future.cancel()  # nobody is waiting for it any more
+            raise HashingOverloaded()
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self._state.method)
+
+    def try_hash(self, password):
+        """Hash ``password`` only if the pool has a free slot right now; None otherwise"""
+        try:
+            return self._run(generate_password_hash, password, self._state.method, wait=False)
+        except HashingOverloaded:
+            return None
+
+    def verify(self, pwhash, password):
+        return self._run(check_password_hash, pwhash, password)
+
+    def needs_rehash(self, pwhash):
+        """True when ``pwhash`` was made with different parameters than PASSWORD_HASH_METHOD"""
+        return pwhash.split('$', 1)[0] != self._state.method
+
+
+password_hasher = PasswordHasher()
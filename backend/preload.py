@@ -0,0 +1,20 @@
+"""Build shared read-only data in a pre-fork master and freeze it for copy-on-write.
+
+Used by gunicorn.conf.py (``preload_app = True``). Everything built here is
+inherited by the workers; ``gc.freeze()`` moves it to the permanent
+generation so worker garbage collections never write to those pages.
+"""
+import gc
+
+from pricing import compile_rate_card
+
+
+def preload_shared_data(app):
+    """Parse and compile catalog data once, in the master process"""
+    compile_rate_card(app.config['PRICING_DATA_PATH'])
+
+
+def freeze_shared_heap():
+    """Call right before forking: collect once, then exempt survivors from future GC passes"""
+    gc.collect()
+    gc.freeze()
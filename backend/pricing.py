@@ -0,0 +1,216 @@
+import json
+from array import array
+from functools import lru_cache
+
+from flask import current_app
+
+
+def load_pricing_data(path):
+    """Parse the rate card JSON; not cached, callers keep only what they compile from it"""
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+class RateCard:
+    """Flat, read-only form of the rate card for sharing between forked workers.
+
+    The nested JSON becomes one str-keyed dict of slot numbers plus an
+    ``array('d')`` of amounts. That is one GC-tracked container instead of
+    ~2000 small dicts, and reading an amount never touches a shared
+    object's refcount, so pages built in the master stay shared.
+
+    Entries with a ``covers`` list are packages: bundles of the standalone
+    services named in the list, kept per slot as ``(name, frozenset)``.
+    """
+
+    __slots__ = ('_index', '_amounts', '_packages', 'package_names')
+    SEP = '\x1f'
+
+    def __init__(self, pricing_data):
+        index, amounts, packages = {}, array('d'), {}
+        for category, regions in pricing_data.items():
+            for region, bands in regions.items():
+                for band, services in bands.items():
+                    for service, entry in services.items():
+                        index[self.SEP.join((category, region, band, service))] = len(amounts)
+                        amounts.append(float(entry.get('amount', 0)))
+                        if entry.get('covers'):
+                            packages.setdefault(self.SEP.join((category, region, band)), []).append(
+                                (service, frozenset(entry['covers'])))
+        self._index = index
+        self._amounts = amounts
+        self._packages = {slot: tuple(contents) for slot, contents in packages.items()}
+        self.package_names = frozenset(name for contents in packages.values() for name, _ in contents)
+
+    def __len__(self):
+        return len(self._amounts)
+
+    def amount(self, category, region, band, service, default=None):
+        slot = self._index.get(self.SEP.join((str(category), str(region), band, str(service))))
+        if slot is None:
+            return default
+        value = self._amounts[slot]
+        return int(value) if value.is_integer() else value
+
+    def packages(self, category, region, band):
+        """``(name, covered services)`` of the packages on offer in one slot"""
+        return self._packages.get(self.SEP.join((str(category), str(region), band)), ())
+
+
+@lru_cache(maxsize=None)
+def compile_rate_card(path):
+    """Compile once per path; the parsed JSON is dropped as soon as the card is built"""
+    return RateCard(load_pricing_data(path))
+
+
+def get_rate_card():
+    return compile_rate_card(current_app.config['PRICING_DATA_PATH'])
+
+
+def requires_approval_due_to_packages(headers):
+    """Check if any Package option is selected with sub-services"""
+    if not headers:
+        return False
+    for header_data in headers:
+        header_name = header_data.get('header', '') or header_data.get('name', '')
+        if header_name and 'package' in header_name.lower():
+            services = header_data.get('services', [])
+            if services and len(services) > 0:
+                return True
+    return False
+
+
+def requires_approval_due_to_customized_header(headers):
+    """Check if Customized Header option is selected with sub-services"""
+    if not headers:
+        return False
+    for header_data in headers:
+        header_name = header_data.get('header', '') or header_data.get('name', '')
+        if header_name and 'customized header' in header_name.lower():
+            services = header_data.get('services', [])
+            if services and len(services) > 0:
+                return True
+    return False
+
+
+GST_RATE = 0.18
+
+# Price of a service missing from the rate card, and the uplift per selected sub-service
+DEFAULT_SERVICE_AMOUNT = 50000
+SUB_SERVICE_UPLIFT = 0.1
+
+
+def service_amount(base, sub_service_count):
+    return base * (1.0 + sub_service_count * SUB_SERVICE_UPLIFT)
+
+
+# Plot-area bands as named in the rate card
+PLOT_AREA_BANDS = ('0-500', '500-2000', '2000-4000', '4000-6500', '6500 and above')
+
+
+def plot_area_band(plot_area):
+    if plot_area <= 500:
+        return "0-500"
+    elif plot_area <= 2000:
+        return "500-2000"
+    elif plot_area <= 4000:
+        return "2000-4000"
+    elif plot_area <= 6500:
+        return "4000-6500"
+    return "6500 and above"
+
+
+def price_headers(category, region, plot_area, headers, rate_card=None):
+    """Price selected headers against the rate card.
+
+    Returns ``(breakdown, subtotal, total_services)`` in the shape served by
+    /api/quotations/calculate-pricing. ``rate_card`` defaults to the compiled
+    rate card of the current app.
+    """
+    if rate_card is None:
+        rate_card = get_rate_card()
+    band = plot_area_band(plot_area)
+    breakdown, total, total_services = [], 0.0, 0
+
+    for header_data in headers:
+        header_services, header_total = [], 0.0
+        for service in header_data.get('services', []):
+            s_name = service.get('label', service.get('name'))
+            base = rate_card.amount(category, region, band, s_name, DEFAULT_SERVICE_AMOUNT)
+
+            subs = [
+                {"name": s.get('text', s.get('name', str(s))), "included": True}
+                for s in service.get('subServices', [])
+            ]
+
+            total_amt = service_amount(base, len(subs))
+
+            header_services.append({
+                "id": service.get("id"),
+                "name": s_name,
+                "baseAmount": base,
+                "totalAmount": round(total_amt, 2),
+                "subServices": subs
+            })
+
+            header_total += total_amt
+            total_services += 1
+
+        breakdown.append({
+            "header": header_data["header"],
+            "services": header_services,
+            "headerTotal": round(header_total, 2)
+        })
+
+        total += header_total
+
+    return breakdown, total, total_services
+
+
+def finalize_pricing(breakdown, overrides=None, discount_percent=None, discount_amount=None):
+    """Apply per-service overrides, then the quotation-level discount and GST,
+    the same way the pricing step of the builder does.
+
+    ``breakdown`` comes from ``price_headers`` and gains ``finalAmount`` per
+    service; ``overrides`` maps service id -> final amount. A positive
+    ``discount_percent`` wins over ``discount_amount``. Returns
+    ``(subtotal, discount, discount_percent, total)``. A discount larger
+    than the subtotal raises ValueError.
+    """
+    overrides = overrides or {}
+    subtotal = 0.0
+    for header in breakdown:
+        header_total = 0.0
+        for service in header['services']:
+            override = overrides.get(str(service['id']))
+            if override is not None:
+                service['finalAmount'] = float(override)
+            else:
+                service['finalAmount'] = service['totalAmount']
+            header_total += service['finalAmount']
+        header['headerTotal'] = round(header_total, 2)
+        subtotal += header_total
+
+    if float(discount_percent or 0) > 0:
+        discount = subtotal * float(discount_percent) / 100
+    else:
+        discount = float(discount_amount or 0)
+    if discount > subtotal:
+        raise ValueError(f'discount of {discount:.2f} exceeds the subtotal of {subtotal:.2f}')
+    discount_percent = (discount / subtotal * 100) if subtotal else 0.0
+    after_discount = subtotal - discount
+    total = after_discount + round(after_discount * GST_RATE)
+    return subtotal, discount, discount_percent, total
+
+
+def needs_approval(headers, effective_discount, threshold, custom_terms):
+    """Combined approval rule shared by the quotation write paths"""
+    return bool(
+        requires_approval_due_to_packages(headers or []) or
+        requires_approval_due_to_customized_header(headers or []) or
+        effective_discount > threshold or
+        (custom_terms and len(custom_terms) > 0)
+    )
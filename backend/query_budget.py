@@ -0,0 +1,273 @@
+"""pytest plugin: per-endpoint SQL query budgets and full-scan detection.
+
+Every entry of query_budgets.json becomes a test that builds a fresh app
+on a temporary database, seeds it (see ``seed``), sends one request and
+records each statement the request executes on any engine. The test fails
+when the request
+
+- does not answer with the expected status,
+- runs more than ``max_queries`` statements (an N+1 shows up as a count
+  that grows with the seeded rows), or
+- runs a statement whose ``EXPLAIN QUERY PLAN`` scans the quotation table,
+  unless the entry sets ``allow_quotation_scan``.
+
+Budgets are checked in so a change in query count shows up in review;
+``pytest --update-query-budgets`` rewrites them from the measured counts.
+Tests of their own can use the ``query_recorder`` fixture.
+
+Enabled for the backend by pytest.ini (``-p query_budget``).
+"""
+import json
+import os
+import re
+import shutil
+import tempfile
+from collections import Counter
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+
+BUDGETS_FILE = 'query_budgets.json'
+
+# "SCAN quotation", "SCAN TABLE quotation" (older SQLite) or an alias such as
+# "SCAN quotation_1"; other tables that start with "quotation_" do not match
+QUOTATION_SCAN = re.compile(r'\bSCAN (?:TABLE )?quotation(?:_\d+)?(?!\w)')
+EXPLAINABLE = ('SELECT', 'WITH', 'UPDATE', 'DELETE')
+
+USERS = {
+    # username: (role, threshold)
+    'admin': ('admin', 100),
+    'manager': ('manager', 20),
+    'alice': ('user', 5),
+    'bob': ('user', 5),
+}
+
+
+class QueryRecorder:
+    """Collects ``(engine, statement, parameters)`` for every statement run
+    on ``engines`` while recording"""
+
+    def __init__(self, engines):
+        self.engines = list(engines)
+        self.statements = []
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if executemany and parameters:
+            parameters = parameters[0]
+        self.statements.append((conn.engine, statement, parameters))
+
+    @contextmanager
+    def record(self):
+        for engine in self.engines:
+            event.listen(engine, 'before_cursor_execute', self._before_execute)
+        try:
+            yield self
+        finally:
+            for engine in self.engines:
+                event.remove(engine, 'before_cursor_execute', self._before_execute)
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    def plans(self):
+        """``(statement, [plan detail, ...])`` for each statement that has a plan"""
+        result = []
+        for engine, statement, parameters in self.statements:
+            if not statement.lstrip().upper().startswith(EXPLAINABLE):
+                continue
+            with engine.connect() as conn:
+                rows = conn.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters or ()).all()
+            result.append((statement, [row[-1] for row in rows]))
+        return result
+
+    def quotation_scans(self):
+        return [(statement, detail) for statement, details in self.plans()
+                for detail in details if QUOTATION_SCAN.search(detail)]
+
+    def summary(self):
+        """Statements with how often each ran, most repeated first"""
+        counts = Counter(' '.join(statement.split()) for _, statement, _ in self.statements)
+        return '\n'.join(f'{n:4d} x {statement}' for statement, n in counts.most_common())
+
+
+def seed(app):
+    """Users, quotations (a third pending approval) and agent registrations
+    with terms, events and revisions; returns the path placeholders"""
+    from extensions import db
+    from models import User, Quotation
+
+    with app.app_context():
+        for username, (role, threshold) in USERS.items():
+            user = User(username=username, role=role, threshold=threshold)
+            user.password_hash = 'unused'  # requests authenticate with generated tokens
+            db.session.add(user)
+        db.session.flush()
+        owners = {user.username: user.id for user in User.query}
+
+        for i in range(12):
+            agent = i >= 9
+            q = Quotation(
+                id=f'{"AGENT" if agent else "REQ"}-{i:04d}',
+                developer_type='agent' if agent else 'cat1',
+                project_region='Mumbai Suburban',
+                plot_area=0 if agent else 1000 + 100 * i,
+                developer_name=f'Developer {i}',
+                project_name=f'Project {i}',
+                created_by='alice' if i % 2 == 0 else 'bob',
+                owner_user_id=owners['alice' if i % 2 == 0 else 'bob'],
+                headers=[] if agent else [{'header': 'Project Registration', 'services': [
+                    {'id': f's{i}-{k}', 'label': f'Service {k}', 'subServices': []} for k in range(3)
+                ]}],
+                pricing_breakdown=[],
+                total_amount=100000 + i,
+                discount_amount=0,
+                discount_percent=0,
+                status='pending_approval' if i % 3 == 0 and not agent else 'draft',
+                requires_approval=i % 3 == 0 and not agent,
+                terms_accepted=False,
+            )
+            q.set_terms(applicable=['General T&C', f'Term {i % 3}'],
+                        custom=['Custom clause'] if i % 3 == 0 and not agent else [])
+            db.session.add(q)
+        db.session.commit()
+
+    return {'quotation': 'REQ-0002', 'pending': 'REQ-0000', 'agent': 'AGENT-0010'}
+
+
+def _format(value, placeholders):
+    if isinstance(value, str):
+        return value.format(**placeholders)
+    if isinstance(value, list):
+        return [_format(item, placeholders) for item in value]
+    if isinstance(value, dict):
+        return {key: _format(item, placeholders) for key, item in value.items()}
+    return value
+
+
+def pytest_addoption(parser):
+    parser.addoption('--update-query-budgets', action='store_true',
+                     help=f'rewrite max_queries in {BUDGETS_FILE} from the measured counts')
+
+
+def pytest_collect_file(parent, file_path):
+    if file_path.name == BUDGETS_FILE:
+        return BudgetFile.from_parent(parent, path=file_path)
+
+
+class QueryBudgetError(Exception):
+    pass
+
+
+class BudgetFile(pytest.File):
+    def collect(self):
+        with open(self.path) as f:
+            entries = json.load(f)['endpoints']
+        for index, entry in enumerate(entries):
+            yield BudgetItem.from_parent(self, name=entry['name'], index=index, entry=entry)
+
+
+class BudgetItem(pytest.Item):
+    def __init__(self, *, index, entry, **kwargs):
+        super().__init__(**kwargs)
+        self.index, self.entry = index, entry
+
+    def runtest(self):
+        from app import create_app
+        from commands import init_db
+        from auth import generate_token
+        from extensions import db
+        from models import User
+        import terms
+
+        scratch = tempfile.mkdtemp()
+        try:
+            app = create_app({
+                'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.join(scratch, 'app.db'),
+                'SQLALCHEMY_BINDS': {'archive': 'sqlite:///' + os.path.join(scratch, 'archive.db')},
+                'RATELIMIT_ENABLED': False,
+                'CONCURRENCY_LIMITS': {},
+                'QUOTATION_CACHE_BACKEND': 'memory',  # nothing written outside scratch
+                'LOG_LEVEL': 'WARNING',
+            })
+            with app.app_context():
+                init_db()
+            placeholders = seed(app)
+
+            # Start cold: the term texts are cached per process (the quotation cache is per app)
+            terms.clear_term_cache()
+
+            entry = self.entry
+            headers = {}
+            if entry.get('user'):
+                with app.app_context():
+                    user = db.session.execute(db.select(User).filter_by(username=entry['user'])).scalar_one()
+                    headers['Authorization'] = f'Bearer {generate_token(user)}'
+
+            client = app.test_client()
+            with app.app_context():
+                recorder = QueryRecorder(db.engines.values())
+            with recorder.record():
+                response = client.open(
+                    _format(entry['path'], placeholders), method=entry.get('method', 'GET'),
+                    json=_format(entry.get('json'), placeholders), headers=headers
+                )
+
+            self.measured = recorder.count
+            expected_status = entry.get('status', 200)
+            if response.status_code != expected_status:
+                raise QueryBudgetError(
+                    f'expected status {expected_status}, got {response.status_code}: {response.get_data(as_text=True)[:500]}'
+                )
+            if not entry.get('allow_quotation_scan'):
+                scans = recorder.quotation_scans()
+                if scans:
+                    raise QueryBudgetError('full scan of the quotation table:\n' + '\n'.join(
+                        f'  {detail}\n    {" ".join(statement.split())}' for statement, detail in scans
+                    ))
+            if self.config.getoption('update_query_budgets'):
+                return
+            if recorder.count > entry['max_queries']:
+                raise QueryBudgetError(
+                    f"{recorder.count} queries, budget is {entry['max_queries']}:\n{recorder.summary()}"
+                )
+        finally:
+            shutil.rmtree(scratch, ignore_errors=True)
+
+    def repr_failure(self, excinfo):
+        if isinstance(excinfo.value, QueryBudgetError):
+            entry = self.entry
+            return f"{entry.get('method', 'GET')} {entry['path']} as {entry.get('user') or 'anonymous'}: {excinfo.value}"
+        return super().repr_failure(excinfo)
+
+    def reportinfo(self):
+        return self.path, None, f"query budget: {self.name}"
+
+
+def pytest_sessionfinish(session):
+    if not session.config.getoption('update_query_budgets'):
+        return
+    measured = {}
+    for item in session.items:
+        if isinstance(item, BudgetItem) and hasattr(item, 'measured'):
+            measured.setdefault(item.path, {})[item.index] = item.measured
+    for path, counts in measured.items():
+        with open(path) as f:
+            budgets = json.load(f)
+        for index, count in counts.items():
+            budgets['endpoints'][index]['max_queries'] = count
+        with open(path, 'w') as f:
+            json.dump(budgets, f, indent=2)
+            f.write('\n')
+
+
+@pytest.fixture
+def query_recorder():
+    """``query_recorder(app)`` gives a QueryRecorder over the app's engines;
+    use ``with recorder.record(): ...`` around the code under test"""
+    def make(app):
+        from extensions import db
+        with app.app_context():
+            return QueryRecorder(db.engines.values())
+    return make
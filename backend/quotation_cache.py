@@ -0,0 +1,290 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app
+from sqlalchemy import event
+
+from extensions import db
+
+
+class LRUBackend:
+    """Serialized quotations in an OrderedDict; per process, so only safe with one worker"""
+
+    def __init__(self, size, ttl):
+        self.size = size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def generation(self):
+        return self._generation
+
+    def get(self, key):
+        with self._lock:
+            stored = self._entries.get(key)
+            if stored is None:
+                return None
+            entry, expires = stored
+            if expires <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, entry, generation):
+        with self._lock:
+            if generation != self._generation:
+                return False
+            self._entries[key] = (entry, time.time() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+            return True
+
+    def invalidate(self, keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+            self._generation += 1
+
+    def clear(self):
+        self.invalidate(list(self._entries))
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteBackend:
+    """Serialized quotations in a small SQLite file shared by every process on the host"""
+
+    def __init__(self, path, size, ttl):
+        self.path = path
+        self.size = size
+        self.ttl = ttl
+        self._local = threading.local()
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=OFF')  # a lost cache is refilled from the database
+            conn.execute('CREATE TABLE IF NOT EXISTS entry (id TEXT PRIMARY KEY, '
+                         'version INTEGER NOT NULL, body TEXT NOT NULL, meta TEXT NOT NULL, '
+                         'stored INTEGER NOT NULL, expires REAL NOT NULL)')
+            conn.execute('CREATE TABLE IF NOT EXISTS generation (n INTEGER NOT NULL)')
+            conn.execute('INSERT INTO generation (n) SELECT 0 WHERE NOT EXISTS (SELECT 1 FROM generation)')
+            self._local.conn = conn
+        return conn
+
+    def generation(self):
+        return self._conn().execute('SELECT n FROM generation').fetchone()[0]
+
+    def get(self, key):
+        row = self._conn().execute('SELECT version, body, meta FROM entry WHERE id = ? AND expires > ?',
+                                   (key, time.time())).fetchone()
+        if row is None:
+            return None
+        return CachedQuotation(row[0], row[1], json.loads(row[2]))
+
+    def put(self, key, entry, generation):
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            # Only store if no write was committed since the caller read the row
+            stored = conn.execute(
+                'INSERT OR REPLACE INTO entry (id, version, body, meta, stored, expires) '
+                'SELECT ?, ?, ?, ?, (SELECT COALESCE(MAX(stored), 0) + 1 FROM entry), ? '
+                'WHERE (SELECT n FROM generation) = ?',
+                (key, entry.version, entry.body, json.dumps(entry.meta), time.time() + self.ttl, generation)
+            ).rowcount
+            conn.execute('DELETE FROM entry WHERE stored <= (SELECT MAX(stored) FROM entry) - ?',
+                         (self.size,))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return stored > 0
+
+    def invalidate(self, keys):
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.executemany('DELETE FROM entry WHERE id = ?', [(key,) for key in keys])
+            conn.execute('UPDATE generation SET n = n + 1')
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def clear(self):
+        self.invalidate([row[0] for row in self._conn().execute('SELECT id FROM entry')])
+
+    def __len__(self):
+        return self._conn().execute('SELECT COUNT(*) FROM entry').fetchone()[0]
+
+
+class CachedQuotation:
+    """A quotation body serialized once, with the row version it was read at"""
+
+    __slots__ = ('version', 'body', 'meta')
+
+    def __init__(self, version, body, meta):
+        self.version = version
+        self.body = body
+        self.meta = meta
+
+
+class _AppCache:
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self.stats_lock = threading.Lock()
+
+
+class QuotationCache:
+    """Read-through cache of serialized quotation bodies.
+
+    Entries carry the row version they were built from, so ETags come
+    straight from the cache. Every commit that touches a Quotation
+    invalidates its entry (see the session hooks below); entries also expire
+    after ``QUOTATION_CACHE_TTL`` seconds. A global generation
+    counter closes the read/write race: a miss records the generation before
+    reading the row and the entry is dropped if a write committed meanwhile.
+
+    The backend and the hit counters belong to the app
+    (``app.extensions['quotation_cache']``).
+    """
+
+    def init_app(self, app):
+        app.config.setdefault('QUOTATION_CACHE_BACKEND', 'sqlite')
+        app.config.setdefault('QUOTATION_CACHE_SIZE', 1024)
+        app.config.setdefault('QUOTATION_CACHE_TTL', 300)
+        app.config.setdefault('QUOTATION_CACHE_SQLITE_PATH', os.path.join(app.instance_path, 'quotation-cache.db'))
+
+        backend = app.config['QUOTATION_CACHE_BACKEND']
+        size, ttl = app.config['QUOTATION_CACHE_SIZE'], app.config['QUOTATION_CACHE_TTL']
+        if backend == 'sqlite':
+            os.makedirs(os.path.dirname(app.config['QUOTATION_CACHE_SQLITE_PATH']), exist_ok=True)
+            backend = SQLiteBackend(app.config['QUOTATION_CACHE_SQLITE_PATH'], size, ttl)
+        elif backend == 'memory':
+            backend = LRUBackend(size, ttl)
+        else:
+            backend = None
+        app.extensions['quotation_cache'] = _AppCache(backend)
+
+    @property
+    def backend(self):
+        return current_app.extensions['quotation_cache'].backend
+
+    def get(self, quotation_id, load):
+        """Return the CachedQuotation for ``quotation_id``, calling ``load()`` on a miss.
+
+        ``load`` returns the Quotation (or None when it does not exist).
+        """
+        state = current_app.extensions['quotation_cache']
+        if state.backend is None:
+            q = load()
+            return self._serialize(q) if q is not None else None
+
+        entry = state.backend.get(quotation_id)
+        if entry is not None:
+            self._count(state, hit=True)
+            return entry
+
+        self._count(state, hit=False)
+        generation = state.backend.generation()
+        q = load()
+        if q is None:
+            return None
+        entry = self._serialize(q)
+        state.backend.put(quotation_id, entry, generation)
+        return entry
+
+    def invalidate(self, quotation_ids):
+        backend = self.backend
+        if backend is not None and quotation_ids:
+            backend.invalidate(list(quotation_ids))
+
+    def clear(self):
+        """Drop every entry, e.g. after the database was restored from a snapshot"""
+        backend = self.backend
+        if backend is not None:
+            backend.clear()
+
+    def stats(self):
+        state = current_app.extensions['quotation_cache']
+        lookups = state.hits + state.misses
+        return {
+            'backend': current_app.config['QUOTATION_CACHE_BACKEND'],
+            'entries': len(state.backend) if state.backend is not None else 0,
+            'hits': state.hits,
+            'misses': state.misses,
+            'hitRate': round(state.hits / lookups, 4) if lookups else None,
+        }
+
+    @staticmethod
+    def _count(state, hit):
+        with state.stats_lock:
+            if hit:
+                state.hits += 1
+            else:
+                state.misses += 1
+
+    @staticmethod
+    def _serialize(q):
+        return CachedQuotation(
+            q.version,
+            current_app.json.dumps(q.to_dict()),
+            {'developerType': q.developer_type, 'createdBy': q.created_by, 'ownerUserId': q.owner_user_id}
+        )
+
+
+quotation_cache = QuotationCache()
+
+
+# Invalidation follows the unit of work rather than individual routes, so
+# every write path (including CLI commands) is covered. Ids are collected at
+# flush time and only dropped from the cache once the transaction commits.
+# A bulk UPDATE/DELETE of the quotation table names no objects, so it drops
+# the whole cache on commit instead.
+@event.listens_for(db.session, 'after_flush')
+def _collect_changed_quotations(session, flush_context):
+    from models import Quotation
+
+    changed = session.info.setdefault('changed_quotation_ids', set())
+    for obj in list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Quotation):
+            changed.add(obj.id)
+
+
+@event.listens_for(db.session, 'do_orm_execute')
+def _collect_bulk_quotation_writes(orm_execute_state):
+    from models import Quotation
+
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    table = getattr(orm_execute_state.statement, 'table', None)
+    if table is not None and table.name == Quotation.__table__.name:
+        orm_execute_state.session.info['quotation_bulk_write'] = True
+
+
+@event.listens_for(db.session, 'after_commit')
+def _invalidate_committed_quotations(session):
+    changed = session.info.pop('changed_quotation_ids', None)
+    if session.info.pop('quotation_bulk_write', False):
+        quotation_cache.clear()
+    elif changed:
+        quotation_cache.invalidate(changed)
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _forget_rolled_back_quotations(session):
+    session.info.pop('changed_quotation_ids', None)
+    session.info.pop('quotation_bulk_write', None)
@@ -0,0 +1,894 @@
+from flask import Blueprint, request, jsonify, current_app, stream_with_context, g
+from sqlalchemy.orm.attributes import flag_modified
+from datetime import datetime
+import logging
+
+from extensions import db
+from models import User, Quotation, QuotationEvent, QuotationRevision, ArchivedQuotation
+from auth import generate_token, generate_stream_ticket, token_required, role_required, stream_ticket_required
+from pricing import (
+    price_headers, finalize_pricing, needs_approval, plot_area_band,
+    requires_approval_due_to_packages, requires_approval_due_to_customized_header
+)
+from http_cache import conditional_json, conditional_body, weak_etag
+from quotation_cache import quotation_cache
+from terms import quotations_to_dicts
+from bundles import selected_services, optimize_bundle
+import reprice
+from approval_queue import approver_counts, can_approve, queue_criteria, APPROVER_ROLES
+import revisions
+from duplicates import find_similar, similar_to_dicts
+from approval_stream import get_broker, publish_approval_change, format_event
+from ids import add_with_unique_id
+from partitions import (commit_quotations, find_events, find_quotations, get_partitions,
+                        quotation_list_stats, quotation_session, rollback_quotations)
+from password_hashing import HashingOverloaded
+from validation import validate_body
+import schemas
+
+quotation_bp = Blueprint('quotation_bp', __name__)
+logger = logging.getLogger(__name__)
+
+def quotation_list_etag(*criteria):
+    """Weak ETag for the quotations matching ``criteria`` from one aggregate query over the rows"""
+    return weak_etag(*quotation_list_stats(*criteria))
+
+def _possible_duplicates(q):
+    """Earlier quotations of the same developer and project, for the create response"""
+    return similar_to_dicts(find_similar(q.project_region, q.developer_name, q.project_name,
+                                         q.rera_number, q.contact_mobile, exclude_id=q.id,
+                                         session=quotation_session()))
+
+# -------------------- AUTH ROUTES --------------------
+
+# Updated signup route with role-based restrictions
+@quotation_bp.route("/api/signup", methods=["POST"])
+@validate_body(schemas.SIGNUP)
+@role_required("admin", "manager")  # Only admin and manager can create users
+def signup(current_user):  # current_user is passed by the decorator
+    try:
+        data = g.json_body
+        if User.query.filter_by(username=data["username"]).first():
+            return jsonify({"error": "Username already exists"}), 400
+
+        new_role = data.get("role", "user")
+        new_threshold = float(data.get("threshold", 0))
+
+        # Role-based restrictions for managers
+        if current_user.role == "manager":
+            # Managers can only create 'user' role, not 'admin' or 'manager'
+            if new_role in ["admin", "manager"]:
+                return jsonify({"error": "Managers cannot create admin or manager users"}), 403
+            
+            # Managers can only assign threshold up to their own limit
+            if new_threshold > current_user.threshold:
+                return jsonify({"error": f"Threshold cannot exceed your limit of {current_user.threshold}%"}), 403
+        
+        # Admin can create any role with any threshold (no restrictions)
+
+        user = User(
+            fname=data.get("fname"),
+            lname=data.get("lname"),
+            username=data["username"],
+            role=new_role,
+            threshold=new_threshold  # Now properly assigned
+        )
+        user.set_password(data["password"])
+        db.session.add(user)
+        db.session.commit()
+
+        return jsonify({
+            "message": "User created successfully",
+            "user": {
+                "username": user.username,
+                "role": user.role,
+                "threshold": user.threshold
+            }
+        }), 201
+
+    except Exception as e:
+        db.session.rollback()
+        logger.error("Signup error: %s", e)
+        return jsonify({"error": "User creation failed"}), 500
+
+@quotation_bp.route("/api/login", methods=["POST"])
+@validate_body(schemas.LOGIN)
+def login():
+    try:
+        data = g.json_body
+        user = User.query.filter_by(username=data.get("username")).first()
+        if not user or not user.check_password(data.get("password") or ""):
+            return jsonify({"error": "Invalid credentials"}), 401
+        if db.session.is_modified(user):
+            db.session.commit()  # password was rehashed with the current parameters
+
+        token = generate_token(user)
+        if isinstance(token, bytes):
+            token = token.decode("utf-8")
+
+        return jsonify({
+            "token": token,
+            "role": user.role,
+            "fname": user.fname,
+            "lname": user.lname,
+            "username": user.username,
+            "threshold": user.threshold
+        })
+    except HashingOverloaded:
+        db.session.rollback()
+        response = jsonify({"error": "Too many logins in progress, please retry"})
+        response.headers["Retry-After"] = "2"
+        return response, 503
+    except Exception as e:
+        db.session.rollback()
+        logger.error("Login error: %s", e)
+        return jsonify({"error": "Login failed"}), 500
+
+@quotation_bp.route("/api/me", methods=["GET"])
+@token_required
+def get_profile(current_user):
+    return jsonify({
+        "id": current_user.id,
+        "fname": current_user.fname,
+        "lname": current_user.lname,
+        "username": current_user.username,
+        "role": current_user.role,
+        "threshold": current_user.threshold
+    })
+
+@quotation_bp.route("/api/me/quotations", methods=["GET"])
+@token_required
+def get_my_quotations(current_user):
+    """Quotations created by the signed-in user, newest first"""
+    try:
+        mine = Quotation.owner_user_id == current_user.id
+        return conditional_json(
+            quotation_list_etag(mine),
+            lambda: {'success': True, 'data': quotations_to_dicts(find_quotations(mine))}
+        )
+    except Exception as e:
+        logger.error("Get my quotations error: %s", e)
+        return jsonify({'error': 'Failed to fetch quotations'}), 500
+
+# -------------------- QUOTATIONS --------------------
+
+@quotation_bp.route('/api/quotations', methods=['GET'])
+def get_quotations():
+    try:
+        return conditional_json(
+            quotation_list_etag(),
+            lambda: {'success': True, 'data': quotations_to_dicts(find_quotations())}
+        )
+    except Exception as e:
+        logger.error("Get quotations error: %s", e)
+        return jsonify({'error': 'Failed to fetch quotations'}), 500
+
+@quotation_bp.route('/api/quotations', methods=['POST'])
+@validate_body(schemas.CREATE_QUOTATION)
+@token_required
+def create_quotation(current_user):
+    try:
+        data = g.json_body
+        quotation = Quotation(
+            developer_type=data['developerType'],
+            project_region=data['projectRegion'],
+            plot_area=float(data['plotArea']),
+            developer_name=data['developerName'],
+            project_name=data.get('projectName'),
+            contact_mobile=data.get('contactMobile'),
+            contact_email=data.get('contactEmail'),
+            validity=data.get('validity', '7 days'),
+            payment_schedule=data.get('paymentSchedule', '50%'),
+            rera_number=data.get('reraNumber'),
+            service_summary=data.get('serviceSummary'),
+            created_by=data.get('createdBy', data['developerName']),
+            owner_user_id=current_user.id,
+            terms_accepted=bool(data.get('termsAccepted', False))
+        )
+        quotation.set_terms(applicable=data.get('applicableTerms', []), custom=[])
+
+        add_with_unique_id(quotation_session(), quotation, 'QUO', current_app.config['ID_GENERATOR'])
+        commit_quotations()
+
+        return jsonify({
+            'success': True,
+            'data': quotation.to_dict(),
+            'possibleDuplicates': _possible_duplicates(quotation),
+        }), 201
+    except Exception as e:
+        rollback_quotations()
+        logger.error("Create quotation error: %s", e)
+        return jsonify({'error': 'Failed to create quotation'}), 500
+
+@quotation_bp.route('/api/quotations/full', methods=['POST'])
+@validate_body(schemas.CREATE_FULL_QUOTATION)
+@token_required
+def create_full_quotation(current_user):
+    """Create, price and submit a developer quotation in one request and one commit.
+
+    Replaces the POST + PUT headers + PUT pricing + PUT terms sequence of the
+    builder. ``pricing`` may carry ``discountPercent`` or ``discountAmount``
+    and ``serviceOverrides`` (service id -> final amount); everything else is
+    priced server-side from the rate card.
+    """
+    try:
+        data = g.json_body
+        headers = data.get('headers') or []
+        pricing = data.get('pricing') or {}
+        overrides = pricing.get('serviceOverrides') or {}
+        plot_area = float(data['plotArea'])
+
+        breakdown, _, _ = price_headers(data['developerType'], data['projectRegion'], plot_area, headers)
+        _, discount, discount_percent, total = finalize_pricing(
+            breakdown, overrides, pricing.get('discountPercent'), pricing.get('discountAmount')
+        )
+
+        custom_terms = [t.strip() for t in data.get('customTerms', []) if t and t.strip()]
+        applicable_terms = data.get('applicableTerms', [])
+
+        quotation = Quotation(
+            developer_type=data['developerType'],
+            project_region=data['projectRegion'],
+            plot_area=plot_area,
+            developer_name=data['developerName'],
+            project_name=data.get('projectName'),
+            contact_mobile=data.get('contactMobile'),
+            contact_email=data.get('contactEmail'),
+            validity=data.get('validity', '7 days'),
+            payment_schedule=data.get('paymentSchedule', '50%'),
+            rera_number=data.get('reraNumber'),
+            service_summary=data.get('serviceSummary'),
+            created_by=data.get('createdBy', data['developerName']),
+            owner_user_id=current_user.id,
+            headers=headers,
+            pricing_breakdown=breakdown,
+            total_amount=round(total, 2),
+            discount_amount=round(discount, 2),
+            discount_percent=round(discount_percent, 4),
+            terms_accepted=bool(data.get('termsAccepted', False))
+        )
+        quotation.set_terms(
+            applicable=applicable_terms if isinstance(applicable_terms, list) else [],
+            custom=custom_terms
+        )
+
+        # Approval is evaluated once, on the final state
+        if needs_approval(headers, discount_percent, current_user.threshold, custom_terms):
+            quotation.requires_approval = True
+            quotation.status = 'pending_approval'
+        else:
+            quotation.requires_approval = False
+            quotation.status = 'completed'
+            quotation.approved_by = current_user.username
+            quotation.approved_at = datetime.utcnow()
+
+        add_with_unique_id(quotation_session(), quotation, 'QUO', current_app.config['ID_GENERATOR'])
+        commit_quotations()
+
+        result = quotation.to_dict()
+        publish_approval_change(False, result)
+        return jsonify({'success': True, 'data': result, 'possibleDuplicates': _possible_duplicates(quotation)}), 201
+
+    except (TypeError, ValueError) as e:
+        rollback_quotations()
+        return jsonify({'error': f'Invalid quotation data: {str(e)}'}), 400
+    except Exception as e:
+        rollback_quotations()
+        logger.error("Create full quotation error: %s", e)
+        return jsonify({'error': 'Failed to create quotation'}), 500
+
+@quotation_bp.route('/api/quotations/<quotation_id>', methods=['PUT'])
+@validate_body(schemas.UPDATE_QUOTATION)
+@token_required
+def update_quotation(current_user, quotation_id):
+    try:
+        q = quotation_session().get(Quotation, quotation_id)
+        if not q:
+            logger.error("Quotation %s not found", quotation_id)
+            return jsonify({'error': 'Not found'}), 404
+
+        was_pending = bool(q.requires_approval)
+        data = g.json_body
+        # Formatted (and redacted) on the log thread, and only for sampled records
+        logger.debug("Updating quotation %s", quotation_id, extra={'payload': data})
+
+        # Handle JSON field updates with proper type checking and modification flagging
+        if 'headers' in data:
+            headers_data = data['headers']
+            if isinstance(headers_data, list):
+                q.headers = headers_data
+                flag_modified(q, 'headers')
+            else:
+                logger.warning("Headers data is not a list: %s", type(headers_data))
+                q.headers = []
+                flag_modified(q, 'headers')
+
+        if 'serviceSummary' in data:
+            q.service_summary = data['serviceSummary']
+
+        if 'status' in data:
+            q.status = data['status']
+
+        if 'termsAccepted' in data:
+            q.terms_accepted = data['termsAccepted']
+
+        if 'applicableTerms' in data:
+            terms_data = data['applicableTerms']
+            q.set_terms(applicable=terms_data if isinstance(terms_data, list) else [])
+
+        # Check approval requirements
+        has_package_approval = requires_approval_due_to_packages(q.headers or [])
+        has_customized_header_approval = requires_approval_due_to_customized_header(q.headers or [])
+
+        # Calculate effective discount
+        effective_discount = (
+            q.discount_percent if q.discount_percent > 0
+            else (q.discount_amount / (q.total_amount + q.discount_amount) * 100
+                  if q.total_amount and q.discount_amount else 0)
+        )
+
+        # Combined approval logic
+        if (has_package_approval or
+            has_customized_header_approval or
+            effective_discount > current_user.threshold or
+            q.custom_terms):
+            q.requires_approval = True
+            q.status = 'pending_approval'
+        else:
+            q.requires_approval = False
+            q.status = 'draft'
+
+        commit_quotations()
+        logger.debug("Quotation %s saved as %s", quotation_id, q.status)
+
+        result = q.to_dict()
+        publish_approval_change(was_pending, result)
+        return jsonify({'success': True, 'data': result})
+
+    except Exception as e:
+        logger.exception("Error updating quotation %s: %s", quotation_id, e)
+        rollback_quotations()
+        return jsonify({'error': f'Failed to update quotation: {str(e)}'}), 500
+
+@quotation_bp.route('/api/quotations/<quotation_id>', methods=['GET'])
+def get_quotation(quotation_id):
+    try:
+        cached = quotation_cache.get(quotation_id, lambda: quotation_session().get(Quotation, quotation_id))
+        if cached is None:
+            archived = db.session.get(ArchivedQuotation, quotation_id)
+            if not archived:
+                return jsonify({'error': 'Not found'}), 404
+            return conditional_json(
+                weak_etag(quotation_id, archived.version, 'archived'),
+                lambda: {'success': True, 'data': archived.to_dict()}
+            )
+
+        return conditional_body(
+            weak_etag(quotation_id, cached.version),
+            lambda: '{"data":%s,"success":true}' % cached.body
+        )
+    except Exception as e:
+        logger.error("Get quotation error: %s", e)
+        return jsonify({'error': 'Failed to fetch quotation'}), 500
+
+@quotation_bp.route('/api/quotations/duplicates/check', methods=['POST'])
+@validate_body(schemas.CHECK_DUPLICATES)
+@token_required
+def check_duplicates(current_user):
+    """Existing quotations for the developer and project being entered, before it is saved"""
+    try:
+        data = g.json_body
+        matches = find_similar(data['projectRegion'], data['developerName'], data.get('projectName'),
+                               data.get('reraNumber'), data.get('contactMobile'), session=quotation_session())
+        return jsonify({'success': True, 'data': similar_to_dicts(matches)})
+    except Exception as e:
+        logger.error("Duplicate check error: %s", e)
+        return jsonify({'error': 'Failed to check for duplicates'}), 500
+
+@quotation_bp.route('/api/quotations/<quotation_id>/duplicates', methods=['GET'])
+@token_required
+def get_quotation_duplicates(current_user, quotation_id):
+    try:
+        q = quotation_session().get(Quotation, quotation_id)
+        if not q:
+            return jsonify({'error': 'Quotation not found'}), 404
+        return jsonify({'success': True, 'data': _possible_duplicates(q)})
+    except Exception as e:
+        logger.error("Get duplicates error: %s", e)
+        return jsonify({'error': 'Failed to fetch duplicates'}), 500
+
+@quotation_bp.route('/api/quotations/calculate-pricing', methods=['POST'])
+@validate_body(schemas.CALCULATE_PRICING)
+def calculate_pricing():
+    try:
+        data = g.json_body
+        breakdown, total, total_services = price_headers(
+            data['developerType'], data['projectRegion'], float(data['plotArea']), data.get('headers', [])
+        )
+
+        return jsonify({
+            "success": True,
+            "breakdown": breakdown,
+            "summary": {"subtotal": round(total, 2), "totalServices": total_services}
+        })
+
+    except Exception as e:
+        logger.error("Error calculating pricing: %s", e)
+        return jsonify({"error": str(e)}), 500
+
+@quotation_bp.route('/api/quotations/optimize-bundle', methods=['POST'])
+@validate_body(schemas.OPTIMIZE_BUNDLE)
+def optimize_bundle_pricing():
+    """Cheapest mix of packages and standalone services for the selected headers"""
+    try:
+        data = g.json_body
+        if data.get('band'):
+            band = data['band']
+        elif data.get('plotArea') is not None:
+            band = plot_area_band(float(data['plotArea']))
+        else:
+            return jsonify({'error': 'plotArea or band is required'}), 400
+
+        result = optimize_bundle(data['developerType'], data['projectRegion'], band,
+                                 selected_services(data['headers']))
+        return jsonify({'success': True, 'data': result})
+
+    except Exception as e:
+        logger.error("Error optimizing bundle: %s", e)
+        return jsonify({'error': str(e)}), 500
+
+@quotation_bp.route('/api/quotations/<quotation_id>/pricing', methods=['PUT'])
+@validate_body(schemas.UPDATE_PRICING)
+@token_required
+def update_pricing(current_user, quotation_id):
+    try:
+        q = quotation_session().get(Quotation, quotation_id)
+        if not q:
+            return jsonify({'error': 'Not found'}), 404
+
+        was_pending = bool(q.requires_approval)
+        data = g.json_body
+
+        if 'pricingBreakdown' in data:
+            q.pricing_breakdown = data['pricingBreakdown'] if isinstance(data['pricingBreakdown'], list) else []
+            flag_modified(q, 'pricing_breakdown')
+
+        if 'totalAmount' in data:
+            q.total_amount = float(data['totalAmount'])
+
+        if 'discountAmount' in data:
+            q.discount_amount = float(data['discountAmount'])
+
+        if 'discountPercent' in data:
+            q.discount_percent = float(data['discountPercent'])
+
+        # Calculate effective discount
+        if q.discount_percent > 0:
+            effective_discount = q.discount_percent
+        elif q.total_amount and q.discount_amount:
+            effective_discount = (q.discount_amount / (q.total_amount + q.discount_amount)) * 100
+        else:
+            effective_discount = 0
+
+        # Check approval requirements including packages and customized headers
+        has_package_approval = requires_approval_due_to_packages(q.headers or [])
+        has_customized_header_approval = requires_approval_due_to_customized_header(q.headers or [])
+
+        # Combined approval logic
+        if (has_package_approval or
+            has_customized_header_approval or
+            effective_discount > current_user.threshold or
+            q.custom_terms):
+            q.requires_approval = True
+            q.status = "pending_approval"
+        else:
+            q.requires_approval = False
+            q.status = "completed"
+            q.approved_by = current_user.username
+            q.approved_at = datetime.utcnow()
+
+        commit_quotations()
+        result = q.to_dict()
+        publish_approval_change(was_pending, result)
+        return jsonify({'success': True, 'data': result})
+
+    except Exception as e:
+        rollback_quotations()
+        logger.error("Error updating pricing: %s", e)
+        return jsonify({'error': f'Failed to update pricing: {str(e)}'}), 500
+
+@quotation_bp.route('/api/quotations/<quotation_id>/terms', methods=['PUT'])
+@validate_body(schemas.UPDATE_TERMS)
+@token_required
+def update_terms(current_user, quotation_id):
+    try:
+        q = quotation_session().get(Quotation, quotation_id)
+        if not q:
+            return jsonify({'error': 'Quotation not found'}), 404
+
+        was_pending = bool(q.requires_approval)
+        data = g.json_body
+        terms_accepted = data.get('termsAccepted', False)
+        applicable_terms = data.get('applicableTerms', [])
+        custom_terms = data.get('customTerms', [])
+
+        # Filter out empty custom terms
+        valid_custom_terms = [term.strip() for term in custom_terms if term.strip()]
+
+        # Update terms data; both lists are interned in one batched lookup
+        q.terms_accepted = terms_accepted
+        q.set_terms(
+            applicable=applicable_terms if isinstance(applicable_terms, list) else [],
+            custom=valid_custom_terms
+        )
+
+        # Calculate effective discount
+        effective_discount = (
+            q.discount_percent if q.discount_percent > 0
+            else (q.discount_amount / (q.total_amount + q.discount_amount) * 100
+                  if q.total_amount and q.discount_amount else 0)
+        )
+
+        # Check approval requirements
+        has_package_approval = requires_approval_due_to_packages(q.headers or [])
+        has_customized_header_approval = requires_approval_due_to_customized_header(q.headers or [])
+
+        # Combined approval logic
+        if (has_package_approval or
+            has_customized_header_approval or
+            valid_custom_terms or
+            effective_discount > current_user.threshold):
+            if q.status not in ['approved', 'completed']:
+                q.requires_approval = True
+                q.status = 'pending_approval'
+        else:
+            q.requires_approval = False
+            q.status = 'completed'
+            q.approved_by = current_user.username
+            q.approved_at = datetime.utcnow()
+
+        commit_quotations()
+        result = q.to_dict()
+        publish_approval_change(was_pending, result)
+        return jsonify({'success': True, 'data': result})
+
+    except Exception as e:
+        rollback_quotations()
+        logger.error("Error updating terms: %s", e)
+        return jsonify({'error': f'Failed to update terms: {str(e)}'}), 500
+
+@quotation_bp.route("/api/quotations/<quotation_id>/approve", methods=["PUT"])
+@validate_body(schemas.APPROVE)
+@token_required
+def approve(current_user, quotation_id):
+    try:
+        if current_user.role not in ["admin", "manager"]:
+            return jsonify({"error": "Only admin/manager can approve"}), 403
+
+        q = quotation_session().get(Quotation, quotation_id)
+        if not q:
+            return jsonify({"error": "Not found"}), 404
+
+        # Manager cannot approve beyond their threshold
+        if not can_approve(current_user, q):
+            return jsonify({"error": f"Approval requires admin (limit {current_user.threshold}%)"}), 403
+
+        was_pending = bool(q.requires_approval)
+        data = g.json_body
+
+        if data.get("action", "approve") == "approve":
+            q.requires_approval = False
+            q.status = "completed"
+            q.approved_by = current_user.username
+            q.approved_at = datetime.utcnow()
+        else:
+            q.status = "rejected"
+            q.requires_approval = False
+
+        commit_quotations()
+        result = q.to_dict()
+        publish_approval_change(was_pending, result)
+        return jsonify({"success": True, "data": result})
+
+    except Exception as e:
+        rollback_quotations()
+        logger.error("Error approving quotation: %s", e)
+        return jsonify({"error": f"Failed to approve quotation: {str(e)}"}), 500
+
+@quotation_bp.route("/api/quotations/pending", methods=["GET"])
+@token_required
+def pending(current_user):
+    try:
+        if current_user.role not in ["admin", "manager"]:
+            return jsonify({"error": "Only admin/manager can view pending"}), 403
+
+        # Only what this approver can act on: a range on the approval queue index
+        criteria = queue_criteria(current_user)
+        return conditional_json(
+            quotation_list_etag(*criteria),
+            lambda: {"success": True, "data": quotations_to_dicts(find_quotations(*criteria))}
+        )
+
+    except Exception as e:
+        logger.error("Error fetching pending quotations: %s", e)
+        return jsonify({"error": "Failed to fetch pending quotations"}), 500
+
+@quotation_bp.route("/api/quotations/pending/counts", methods=["GET"])
+@role_required("admin", "manager")
+def pending_counts(current_user):
+    """Pending quotations each approver can act on, for the dashboard (cached)"""
+    try:
+        counts = approver_counts.get()
+        approvers = User.query.filter(User.role.in_(APPROVER_ROLES)).order_by(User.username).all()
+        return jsonify({"success": True, "data": {
+            "mine": counts.get(current_user.id, 0),
+            "approvers": [
+                {"username": u.username, "role": u.role, "threshold": u.threshold, "pending": counts.get(u.id, 0)}
+                for u in approvers
+            ],
+        }})
+    except Exception as e:
+        logger.error("Error counting pending quotations: %s", e)
+        return jsonify({"error": "Failed to count pending quotations"}), 500
+
+@quotation_bp.route("/api/quotations/pending/stream-ticket", methods=["POST"])
+@validate_body(schemas.STREAM_TICKET)
+@role_required("admin", "manager")
+def pending_stream_ticket(current_user):
+    """A short-lived ticket for opening the approval stream (EventSource cannot send headers)"""
+    return jsonify({"success": True, "data": {
+        "ticket": generate_stream_ticket(current_user),
+        "expiresIn": current_app.config.get("SSE_STREAM_TICKET_SECONDS", 60),
+    }})
+
+@quotation_bp.route("/api/quotations/pending/stream", methods=["GET"])
+@stream_ticket_required
+def pending_stream(current_user):
+    """Server-sent events for the approval queue.
+
+    Opened with ``?ticket=`` from POST /api/quotations/pending/stream-ticket.
+    A new connection (or one whose resume token can no longer be replayed)
+    receives a ``snapshot`` of the pending quotations the user can approve,
+    then ``add``/``remove``/``update`` events as quotations enter, leave or
+    change in that queue, whichever worker committed them.
+    Reconnects resume from the ``Last-Event-ID`` header or ``?since=``.
+    """
+    if current_user.role not in ["admin", "manager"]:
+        return jsonify({"error": "Only admin/manager can view pending"}), 403
+
+    broker = get_broker()
+    if not broker.open_stream():
+        response = jsonify({"error": "Too many open approval streams, retry shortly"})
+        response.headers["Retry-After"] = "10"
+        return response, 503
+
+    resume_token = request.headers.get("Last-Event-ID") or request.args.get("since")
+    heartbeat = current_app.config.get("SSE_HEARTBEAT_SECONDS", 15)
+    threshold = current_user.threshold
+
+    def snapshot():
+        # Take the token first: events racing the query are replayed, and
+        # clients apply add/update idempotently by quotation id
+        seq = broker.last_seq
+        items = quotations_to_dicts(find_quotations(*queue_criteria(current_user)))
+        db.session.remove()  # do not hold a connection for the lifetime of the stream
+        return seq, format_event("snapshot", items, broker.token(seq))
+
+    @stream_with_context
+    def generate():
+        seq = broker.parse_token(resume_token)
+        yield "retry: 3000\n\n"
+        if seq is None:
+            seq, message = snapshot()
+            yield message
+        else:
+            db.session.remove()
+        while True:
+            events = broker.wait(seq, timeout=heartbeat)
+            if events is None:
+                seq, message = snapshot()
+                yield message
+                continue
+            if not events:
+                yield ": keep-alive\n\n"
+                continue
+            for event_seq, kind, quotation_id, data in events:
+                seq = event_seq
+                if data is not None and data.get("requiredDiscount") is not None and \
+                        current_user.role != "admin" and data["requiredDiscount"] > (threshold or 0):
+                    # Beyond this manager's authority: it is (or now is) not in their queue
+                    kind, data = "remove", None
+                payload = data if data is not None else {"id": quotation_id}
+                yield format_event(kind, payload, broker.token(event_seq))
+
+    response = current_app.response_class(generate(), mimetype="text/event-stream")
+    # Runs when the server closes the response, even if the client left before the first byte
+    response.call_on_close(broker.close_stream)
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
+# -------------------- EVENTS --------------------
+
+def _parse_datetime_arg(name):
+    value = request.args.get(name)
+    return datetime.fromisoformat(value) if value else None
+
+@quotation_bp.route('/api/quotations/<quotation_id>/events', methods=['GET'])
+@token_required
+def get_quotation_events(current_user, quotation_id):
+    try:
+        criteria = [QuotationEvent.quotation_id == quotation_id]
+        since, until = _parse_datetime_arg('since'), _parse_datetime_arg('until')
+        if since:
+            criteria.append(QuotationEvent.created_at >= since)
+        if until:
+            criteria.append(QuotationEvent.created_at < until)
+        events = find_events(*criteria)
+        return jsonify({'success': True, 'data': [e.to_dict() for e in events]})
+    except ValueError:
+        return jsonify({'error': 'since/until must be ISO-8601 timestamps'}), 400
+    except Exception as e:
+        logger.error("Error fetching quotation events: %s", e)
+        return jsonify({'error': 'Failed to fetch quotation events'}), 500
+
+@quotation_bp.route('/api/quotation-events', methods=['GET'])
+@role_required("admin", "manager")
+def list_quotation_events(current_user):
+    """Events in a time window (served by ix_quotation_event_created)"""
+    try:
+        since, until = _parse_datetime_arg('since'), _parse_datetime_arg('until')
+        limit = min(int(request.args.get('limit', 500)), 5000)
+        criteria = []
+        if since:
+            criteria.append(QuotationEvent.created_at >= since)
+        if until:
+            criteria.append(QuotationEvent.created_at < until)
+        events = find_events(*criteria, limit=limit)
+        return jsonify({'success': True, 'data': [e.to_dict() for e in events]})
+    except ValueError:
+        return jsonify({'error': 'since/until must be ISO-8601 timestamps, limit an integer'}), 400
+    except Exception as e:
+        logger.error("Error listing quotation events: %s", e)
+        return jsonify({'error': 'Failed to list quotation events'}), 500
+
+# -------------------- REVISIONS --------------------
+
+@quotation_bp.route('/api/quotations/<quotation_id>/revisions', methods=['GET'])
+@token_required
+def list_revisions(current_user, quotation_id):
+    """Revision numbers with their stored size; payloads are not decoded"""
+    try:
+        rows = quotation_session().query(QuotationRevision).filter_by(quotation_id=quotation_id) \
+            .order_by(QuotationRevision.revision).all()
+        if not rows:
+            return jsonify({'error': 'No revisions for this quotation'}), 404
+        return jsonify({'success': True, 'data': [r.to_dict() for r in rows]})
+    except Exception as e:
+        logger.error("Error listing revisions: %s", e)
+        return jsonify({'error': 'Failed to list revisions'}), 500
+
+@quotation_bp.route('/api/quotations/<quotation_id>/revisions/<int:revision>', methods=['GET'])
+@token_required
+def get_revision(current_user, quotation_id, revision):
+    try:
+        found = revisions.rebuild(quotation_id, revision, quotation_session())
+        if found is None:
+            return jsonify({'error': 'Revision not found'}), 404
+        return jsonify({'success': True, 'data': {'revision': revision, 'document': found[1]}})
+    except Exception as e:
+        logger.error("Error rebuilding revision %s of %s: %s", revision, quotation_id, e)
+        return jsonify({'error': 'Failed to load revision'}), 500
+
+@quotation_bp.route('/api/quotations/<quotation_id>/revisions/diff', methods=['GET'])
+@token_required
+def diff_revisions(current_user, quotation_id):
+    """Delta (revisions.py format) turning revision ``from`` into ``to`` (default: latest)"""
+    try:
+        from_rev = int(request.args['from'])
+        to_rev = int(request.args['to']) if request.args.get('to') else None
+    except (KeyError, ValueError):
+        return jsonify({'error': 'from (and optional to) must be revision numbers'}), 400
+    try:
+        session = quotation_session()
+        old, new = revisions.rebuild(quotation_id, from_rev, session), revisions.rebuild(quotation_id, to_rev, session)
+        if old is None or new is None:
+            return jsonify({'error': 'Revision not found'}), 404
+        return jsonify({'success': True, 'data': {
+            'from': from_rev, 'to': new[0], 'changes': revisions.diff(old[1], new[1])
+        }})
+    except Exception as e:
+        logger.error("Error diffing revisions of %s: %s", quotation_id, e)
+        return jsonify({'error': 'Failed to diff revisions'}), 500
+
+@quotation_bp.route('/api/quotations/<quotation_id>/revisions/<int:revision>/restore', methods=['POST'])
+@validate_body(schemas.RESTORE_REVISION)
+@token_required
+def restore_revision(current_user, quotation_id, revision):
+    """Save an old revision's content as a new revision, re-checking approval"""
+    try:
+        q = quotation_session().get(Quotation, quotation_id)
+        if not q:
+            return jsonify({'error': 'Quotation not found'}), 404
+        if current_user.role not in ['admin', 'manager'] and q.owner_user_id != current_user.id:
+            return jsonify({'error': 'Access denied'}), 403
+        found = revisions.rebuild(quotation_id, revision, quotation_session())
+        if found is None:
+            return jsonify({'error': 'Revision not found'}), 404
+
+        was_pending = bool(q.requires_approval)
+        doc = found[1]
+        q.headers = doc['headers']
+        q.pricing_breakdown = doc['pricingBreakdown']
+        flag_modified(q, 'headers')
+        flag_modified(q, 'pricing_breakdown')
+        q.total_amount = doc['totalAmount']
+        q.discount_amount = doc['discountAmount']
+        q.discount_percent = doc['discountPercent']
+        q.service_summary = doc['serviceSummary']
+        q.terms_accepted = doc['termsAccepted']
+        q.set_terms(applicable=doc['applicableTerms'], custom=doc['customTerms'])
+
+        # Same approval rules as a regular edit
+        effective_discount = (
+            q.discount_percent if q.discount_percent > 0
+            else (q.discount_amount / (q.total_amount + q.discount_amount) * 100
+                  if q.total_amount and q.discount_amount else 0)
+        )
+        if (requires_approval_due_to_packages(q.headers or []) or
+            requires_approval_due_to_customized_header(q.headers or []) or
+            effective_discount > current_user.threshold or
+            q.custom_terms):
+            q.requires_approval = True
+            q.status = 'pending_approval'
+        else:
+            q.requires_approval = False
+            q.status = 'draft'
+
+        commit_quotations()
+        logger.info("Quotation %s restored to revision %s by %s", quotation_id, revision, current_user.username)
+
+        result = q.to_dict()
+        publish_approval_change(was_pending, result)
+        return jsonify({'success': True, 'data': result})
+    except Exception as e:
+        rollback_quotations()
+        logger.exception("Error restoring revision %s of %s: %s", revision, quotation_id, e)
+        return jsonify({'error': f'Failed to restore revision: {str(e)}'}), 500
+
+@quotation_bp.route('/api/quotations/reprice', methods=['POST'])
+@validate_body(schemas.REPRICE)
+@role_required("admin")
+def reprice_open_quotations(current_user):
+    """Preview a reprice of open quotations against the current rate card.
+
+    Always a dry run over at most REPRICE_PREVIEW_MAX_ROWS quotations, so it
+    finishes well inside a request timeout; ``flask reprice`` applies it.
+    """
+    try:
+        if get_partitions() is not None:
+            return jsonify({'error': 'Repricing does not support partitioned storage yet'}), 400
+        data = g.json_body
+        if data.get('dryRun') is False:
+            return jsonify({'error': 'Repricing is applied with the flask reprice command; '
+                                     'this endpoint only previews it'}), 400
+        top = data.get('top')
+        limit = current_app.config['REPRICE_PREVIEW_MAX_ROWS']
+        report = reprice.reprice_quotations(
+            data.get('statuses') or reprice.OPEN_STATUSES, dry_run=True, limit=limit,
+            report=reprice.RepriceReport(keep=100 if top is None else int(top))
+        )
+        summary = report.to_dict()
+        logger.info("Reprice preview by %s: %s", current_user.username,
+                    {k: v for k, v in summary.items() if k != 'largestChanges'})
+        return jsonify({'success': True, 'dryRun': True, 'truncated': report.scanned >= limit, 'data': summary})
+    except Exception as e:
+        rollback_quotations()
+        logger.exception("Error previewing reprice: %s", e)
+        return jsonify({'error': f'Failed to preview reprice: {str(e)}'}), 500
+
+@quotation_bp.route('/api/metrics/quotation-cache', methods=['GET'])
+@role_required("admin", "manager")
+def quotation_cache_metrics(current_user):
+    """Hit rate of the single-quotation cache in this worker"""
+    return jsonify({'success': True, 'data': quotation_cache.stats()})
@@ -0,0 +1,204 @@
+import math
+import os
+import sqlite3
+import threading
+import time
+
+import jwt
+from flask import request, jsonify, g, current_app
+
+_PERIODS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+
+
+def parse_limit(spec):
+    """'30/minute' -> (capacity, tokens per second)"""
+    count, _, period = spec.partition('/')
+    count = int(count)
+    return count, count / _PERIODS[period.strip()]
+
+
+class MemoryBackend:
+    """Token buckets in a dict; per process, so each worker enforces its own share.
+
+    A bucket that has refilled to capacity is the same as no bucket, so such
+    buckets are dropped every ``prune_seconds`` to keep one-off clients from
+    growing the dict forever.
+    """
+
+    def __init__(self, prune_seconds=60):
+        self.prune_seconds = prune_seconds
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self._next_prune = 0
+
+    def consume(self, key, capacity, refill_rate, now):
+        with self._lock:
+            if now >= self._next_prune:
+                self._prune(now)
+            tokens, updated, _ = self._buckets.get(key, (capacity, now, now))
+            tokens = min(capacity, tokens + (now - updated) * refill_rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now, now + (capacity - tokens) / refill_rate)
+            return allowed, 0 if allowed else (1 - tokens) / refill_rate
+
+    def _prune(self, now):
+        self._buckets = {key: bucket for key, bucket in self._buckets.items() if bucket[2] > now}
+        self._next_prune = now + self.prune_seconds
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class SQLiteBackend:
+    """Token buckets in a small SQLite file shared by every worker on the host.
+
+    Full buckets are deleted every ``prune_seconds`` per process, like
+    MemoryBackend.
+    """
+
+    def __init__(self, path, prune_seconds=60):
+        self.path = path
+        self.prune_seconds = prune_seconds
+        self._local = threading.local()
+        self._next_prune = 0
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=OFF')  # limiter state is disposable
+            conn.execute('CREATE TABLE IF NOT EXISTS token_bucket (key TEXT PRIMARY KEY, '
+                         'tokens REAL NOT NULL, updated REAL NOT NULL, full_at REAL NOT NULL)')
+            conn.execute('CREATE INDEX IF NOT EXISTS ix_token_bucket_full_at ON token_bucket (full_at)')
+            self._local.conn = conn
+        return conn
+
+    def consume(self, key, capacity, refill_rate, now):
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            if now >= self._next_prune:
+                conn.execute('DELETE FROM token_bucket WHERE full_at <= ?', (now,))
+                self._next_prune = now + self.prune_seconds
+            row = conn.execute('SELECT tokens, updated FROM token_bucket WHERE key = ?', (key,)).fetchone()
+            tokens, updated = row if row else (capacity, now)
+            tokens = min(capacity, tokens + (now - updated) * refill_rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            conn.execute('INSERT INTO token_bucket (key, tokens, updated, full_at) VALUES (?, ?, ?, ?) '
+                         'ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated, '
+                         'full_at = excluded.full_at',
+                         (key, tokens, now, now + (capacity - tokens) / refill_rate))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return allowed, 0 if allowed else (1 - tokens) / refill_rate
+
+
+class _AppLimits:
+    def __init__(self, backend, semaphores):
+        self.backend = backend
+        self.semaphores = semaphores
+        self.limits = {}
+
+
+class RateLimiter:
+    """Token-bucket rate limits and concurrency caps applied in before_request.
+
+    Limits are looked up by endpoint name first (RATELIMIT_ENDPOINTS), then
+    by blueprint (RATELIMIT_DEFAULTS, where 'app' means routes registered on
+    the application itself). Clients are keyed by the JWT user id, falling
+    back to the remote address for anonymous requests.
+    """
+
+    def init_app(self, app):
+        app.config.setdefault('RATELIMIT_ENABLED', True)
+        app.config.setdefault('RATELIMIT_BACKEND', 'memory')
+        app.config.setdefault('RATELIMIT_SQLITE_PATH', os.path.join(app.instance_path, 'ratelimit.db'))
+        app.config.setdefault('RATELIMIT_PRUNE_SECONDS', 60)
+        app.config.setdefault('RATELIMIT_DEFAULTS', {'app': '300/minute', 'agent_bp': '120/minute'})
+        app.config.setdefault('RATELIMIT_ENDPOINTS', {})
+        app.config.setdefault('CONCURRENCY_LIMITS', {})
+
+        if app.config['RATELIMIT_BACKEND'] == 'sqlite':
+            os.makedirs(os.path.dirname(app.config['RATELIMIT_SQLITE_PATH']), exist_ok=True)
+            backend = SQLiteBackend(app.config['RATELIMIT_SQLITE_PATH'], app.config['RATELIMIT_PRUNE_SECONDS'])
+        else:
+            backend = MemoryBackend(app.config['RATELIMIT_PRUNE_SECONDS'])
+        # Per app, so a second create_app (tests, CLI) leaves this one's state alone
+        app.extensions['rate_limit'] = _AppLimits(backend, {
+            endpoint: threading.BoundedSemaphore(limit)
+            for endpoint, limit in app.config['CONCURRENCY_LIMITS'].items()
+        })
+        app.before_request(self._before_request)
+        app.teardown_request(self._teardown_request)
+
+    @property
+    def backend(self):
+        return current_app.extensions['rate_limit'].backend
+
+    @staticmethod
+    def _limit_for(state, endpoint, blueprint):
+        key = (endpoint, blueprint)
+        if key not in state.limits:
+            spec = (current_app.config['RATELIMIT_ENDPOINTS'].get(endpoint)
+                    or current_app.config['RATELIMIT_DEFAULTS'].get(blueprint or 'app'))
+            state.limits[key] = (spec, parse_limit(spec)) if spec else None
+        return state.limits[key]
+
+    @staticmethod
+    def _client_key():
+        # Only the header: a query-string token would let a client pick its own key
+        auth_header = request.headers.get('Authorization', '')
+        token = auth_header.split(' ')[1] if auth_header.startswith('Bearer ') else None
+        if token:
+            try:
+                payload = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=['HS256'])
+                return f"user:{payload['user_id']}"
+            except Exception:
+                pass
+        return f"ip:{request.remote_addr}"
+
+    def _before_request(self):
+        if request.method == 'OPTIONS' or request.endpoint is None:
+            return None
+        endpoint = request.endpoint.rsplit('.', 1)[-1]
+        state = current_app.extensions['rate_limit']
+
+        if current_app.config['RATELIMIT_ENABLED']:
+            limit = self._limit_for(state, endpoint, request.blueprint)
+            if limit:
+                spec, (capacity, refill_rate) = limit
+                scope = endpoint if endpoint in current_app.config['RATELIMIT_ENDPOINTS'] else (request.blueprint or 'app')
+                allowed, retry_after = state.backend.consume(
+                    f"{scope}:{self._client_key()}", capacity, refill_rate, time.time()
+                )
+                if not allowed:
+                    response = jsonify({'error': 'Rate limit exceeded', 'limit': spec})
+                    response.status_code = 429
+                    response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+                    return response
+
+        semaphore = state.semaphores.get(endpoint)
+        if semaphore is not None:
+            if not semaphore.acquire(blocking=False):
+                response = jsonify({'error': 'Server busy, please retry'})
+                response.status_code = 503
+                response.headers['Retry-After'] = '1'
+                return response
+            g.concurrency_slot = semaphore
+        return None
+
+    @staticmethod
+    def _teardown_request(exc):
+        semaphore = g.pop('concurrency_slot', None)
+        if semaphore is not None:
+            semaphore.release()
+
+
+rate_limiter = RateLimiter()
@@ -0,0 +1,218 @@
+"""Recompute the pricing of open quotations after the rate card changes.
+
+Open quotations are read in id order, ``chunk_size`` at a time, as plain
+rows. Each chunk is priced with the same ``price_headers`` and
+``finalize_pricing`` steps as a new quotation. With several workers this
+runs in a process pool, and a few chunks are kept in flight ahead of the
+writer. Results are written back in one short transaction per chunk.
+
+What a reprice keeps:
+- manual per-service overrides (a ``finalAmount`` that differs from the
+  rate-card ``totalAmount``) and the other per-service fields the builder
+  stores;
+- the discount percentage, so approval thresholds mean the same thing
+  before and after.
+
+Writes go through the ORM, so the version check, revision history and
+cache invalidation behave as for any other edit. A row edited while its
+chunk was being priced fails the version check and is left alone as a
+conflict.
+"""
+import csv
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from flask import current_app
+from sqlalchemy import select
+from sqlalchemy.orm.attributes import flag_modified
+from sqlalchemy.orm.exc import StaleDataError
+
+from extensions import db
+from models import Quotation
+from pricing import compile_rate_card, finalize_pricing, price_headers
+
+OPEN_STATUSES = ('draft', 'pending_approval')
+
+_COLUMNS = (
+    Quotation.id, Quotation.status, Quotation.developer_type, Quotation.project_region, Quotation.plot_area,
+    Quotation.headers, Quotation.pricing_breakdown, Quotation.total_amount, Quotation.discount_amount,
+    Quotation.discount_percent, Quotation.version,
+)
+
+
+def _services(breakdown):
+    """service id -> service entry of a stored breakdown"""
+    services = {}
+    for header in breakdown or []:
+        if isinstance(header, dict):
+            for service in header.get('services', []):
+                if isinstance(service, dict):
+                    services[str(service.get('id'))] = service
+    return services
+
+
+def price_chunk(pricing_path, rows):
+    """Reprice ``rows`` (tuples of ``_COLUMNS``); runs in pool workers.
+
+    Returns ``(scanned, changed)``, where ``changed`` holds ``(id, status,
+    version, old_total, new_total, breakdown, discount, discount_percent)``
+    for every row whose total or service amounts moved.
+    """
+    rate_card = compile_rate_card(pricing_path)
+    changed = []
+    for (quotation_id, status, category, region, plot_area, headers, old_breakdown,
+         old_total, old_discount, old_percent, version) in rows:
+        old_services = _services(old_breakdown)
+        breakdown, _, _ = price_headers(category, region, plot_area or 0, headers, rate_card)
+        overrides = {}
+        for header in breakdown:
+            for i, service in enumerate(header['services']):
+                old = old_services.get(str(service['id']))
+                if old is None:
+                    continue
+                final = old.get('finalAmount')
+                if final is not None and final != old.get('totalAmount'):
+                    overrides[str(service['id'])] = final
+                # Keep what the builder stored alongside the amounts
+                header['services'][i] = {**old, **service}
+        try:
+            _, discount, percent, total = finalize_pricing(breakdown, overrides, old_percent, old_discount)
+        except ValueError:
+            continue  # a fixed discount now larger than the subtotal: left for a person to re-quote
+        total = round(total, 2)
+        new_services = _services(breakdown)
+        if total != old_total or any(
+            service.get('totalAmount') != new_services.get(key, {}).get('totalAmount')
+            for key, service in old_services.items()
+        ):
+            changed.append((quotation_id, status, version, old_total, total, breakdown,
+                            round(discount, 2), round(percent, 4)))
+    return len(rows), changed
+
+
+def _chunks(statuses, chunk_size, limit=None):
+    query = (select(*_COLUMNS)
+             .where(Quotation.status.in_(statuses), Quotation.developer_type != 'agent')
+             .order_by(Quotation.id))
+    last_id = ''
+    remaining = limit
+    while remaining is None or remaining > 0:
+        size = chunk_size if remaining is None else min(chunk_size, remaining)
+        rows = [tuple(row) for row in db.session.execute(query.where(Quotation.id > last_id).limit(size))]
+        if not rows:
+            return
+        last_id = rows[-1][0]
+        if remaining is not None:
+            remaining -= len(rows)
+        # Skip quotations without headers or never priced: there is nothing to update
+        yield [row for row in rows if row[5] and row[6]]
+
+
+def _priced(statuses, chunk_size, workers, limit=None):
+    path = current_app.config['PRICING_DATA_PATH']
+    if workers <= 1:
+        for chunk in _chunks(statuses, chunk_size, limit):
+            yield price_chunk(path, chunk)
+        return
+    # spawn: the app process has live threads (log listener, hash pool) that fork would not carry over
+    with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+        in_flight = deque()
+        for chunk in _chunks(statuses, chunk_size, limit):
+            in_flight.append(pool.submit(price_chunk, path, chunk))
+            if len(in_flight) >= 2 * workers:
+                yield in_flight.popleft().result()
+        while in_flight:
+            yield in_flight.popleft().result()
+
+
+class RepriceReport:
+    """Running totals of a reprice; optionally writes one CSV row per change"""
+
+    FIELDS = ('id', 'status', 'old_total', 'new_total', 'change', 'change_percent')
+
+    def __init__(self, csv_file=None, keep=0):
+        self.scanned = self.changed = self.written = self.conflicts = 0
+        self.old_sum = self.new_sum = 0.0
+        self.largest = []  # the ``keep`` largest absolute changes
+        self.keep = keep
+        self._writer = csv.writer(csv_file) if csv_file else None
+        if self._writer:
+            self._writer.writerow(self.FIELDS)
+
+    def add(self, quotation_id, status, old_total, new_total):
+        old_total = old_total or 0.0
+        change = round(new_total - old_total, 2)
+        percent = round(change / old_total * 100, 2) if old_total else None
+        self.changed += 1
+        self.old_sum += old_total
+        self.new_sum += new_total
+        if self._writer:
+            self._writer.writerow((quotation_id, status, old_total, new_total, change, percent))
+        if self.keep:
+            self.largest.append({'id': quotation_id, 'status': status, 'oldTotal': old_total,
+                                 'newTotal': new_total, 'change': change, 'changePercent': percent})
+            if len(self.largest) > 2 * self.keep:
+                self._trim()
+
+    def _trim(self):
+        self.largest.sort(key=lambda c: abs(c['change']), reverse=True)
+        del self.largest[self.keep:]
+
+    def to_dict(self):
+        self._trim()
+        return {
+            'scanned': self.scanned,
+            'changed': self.changed,
+            'written': self.written,
+            'conflicts': self.conflicts,
+            'oldTotal': round(self.old_sum, 2),
+            'newTotal': round(self.new_sum, 2),
+            'change': round(self.new_sum - self.old_sum, 2),
+            'largestChanges': self.largest,
+        }
+
+
+def reprice_quotations(statuses=OPEN_STATUSES, chunk_size=200, workers=1, dry_run=False, report=None, limit=None):
+    """Reprice every quotation in ``statuses`` against the current rate card.
+
+    With ``dry_run`` nothing is written and ``report`` only lists what
+    would change. ``limit`` stops after that many quotations, in id order.
+    Returns the report.
+    """
+    report = report or RepriceReport()
+    for scanned, changed in _priced(tuple(statuses), chunk_size, workers, limit):
+        report.scanned += scanned
+        if not changed:
+            continue
+        if dry_run:
+            for quotation_id, status, _, old_total, new_total, _, _, _ in changed:
+                report.add(quotation_id, status, old_total, new_total)
+            continue
+
+        rows = {q.id: q for q in Quotation.query.filter(Quotation.id.in_([c[0] for c in changed]))}
+        applied = []
+        for quotation_id, status, version, old_total, new_total, breakdown, discount, percent in changed:
+            q = rows.get(quotation_id)
+            if q is None or q.version != version or q.status != status:
+                # Edited (or closed) since its chunk was read; a re-run picks it up
+                report.conflicts += 1
+                continue
+            q.pricing_breakdown = breakdown
+            flag_modified(q, 'pricing_breakdown')
+            q.total_amount = new_total
+            q.discount_amount = discount
+            q.discount_percent = percent
+            applied.append((quotation_id, status, old_total, new_total))
+        try:
+            db.session.commit()
+        except StaleDataError:
+            # A row changed between the load above and the commit: leave the chunk
+            db.session.rollback()
+            report.conflicts += len(applied)
+            applied = []
+        db.session.expunge_all()
+        for quotation_id, status, old_total, new_total in applied:
+            report.add(quotation_id, status, old_total, new_total)
+        report.written += len(applied)
+    return report
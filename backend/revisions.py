@@ -0,0 +1,229 @@
+"""Delta-encoded revision history of a quotation's editable content.
+
+Every flush that changes a quotation's content stores a QuotationRevision
+numbered with the row version it produces. Most revisions hold a delta
+against the previous one; every REVISION_CHECKPOINT_EVERY-th holds the
+whole document, so rebuilding any revision reads one checkpoint and fewer
+than that many deltas.
+
+Delta format (JSON):
+    {"=": value}                          replace the value
+    {"d": {key: delta}, "x": [keys]}      patch an object: change/add keys, remove keys
+    {"l": {index: delta}, "n": length}    patch a list: change items, then cut/extend to length
+"""
+import json
+import zlib
+
+from flask import g, has_app_context, current_app
+from sqlalchemy import event, func, inspect
+from sqlalchemy.orm import aliased
+
+from extensions import db
+from models import Quotation, QuotationRevision
+from terms import prefetch_terms
+
+CHECKPOINT_EVERY = 10
+
+# Columns whose changes make a new revision
+TRACKED_COLUMNS = (
+    'headers', 'pricing_breakdown', 'total_amount', 'discount_amount', 'discount_percent',
+    'service_summary', 'terms_accepted', 'applicable_term_ids', 'custom_term_ids',
+    'legacy_applicable_terms', 'legacy_custom_terms',
+)
+
+
+def document(q):
+    """The restorable content of a quotation (no status, approval or identity fields)"""
+    return {
+        'headers': list(q.headers or []),
+        'pricingBreakdown': list(q.pricing_breakdown or []),
+        'totalAmount': q.total_amount,
+        'discountAmount': q.discount_amount,
+        'discountPercent': q.discount_percent,
+        'serviceSummary': q.service_summary,
+        'termsAccepted': bool(q.terms_accepted),
+        'applicableTerms': list(q.applicable_terms),
+        'customTerms': list(q.custom_terms),
+    }
+
+
+def diff(old, new):
+    """Delta turning ``old`` into ``new``, or None when they are equal"""
+    if old == new:
+        return None
+    if isinstance(old, dict) and isinstance(new, dict):
+        changes = {}
+        for key, value in new.items():
+            if key not in old:
+                changes[key] = {'=': value}
+            else:
+                sub = diff(old[key], value)
+                if sub is not None:
+                    changes[key] = sub
+        delta = {'d': changes}
+        removed = [key for key in old if key not in new]
+        if removed:
+            delta['x'] = removed
+        return delta
+    if isinstance(old, list) and isinstance(new, list):
+        changes = {}
+        for i, value in enumerate(new):
+            if i >= len(old):
+                changes[str(i)] = {'=': value}
+            else:
+                sub = diff(old[i], value)
+                if sub is not None:
+                    changes[str(i)] = sub
+        return {'l': changes, 'n': len(new)}
+    return {'=': new}
+
+
+def apply(value, delta):
+    """Apply a delta from :func:`diff`; ``value`` is not modified"""
+    if delta is None:
+        return value
+    if '=' in delta:
+        return delta['=']
+    if 'd' in delta:
+        result = dict(value)
+        for key in delta.get('x', ()):
+            result.pop(key, None)
+        for key, sub in delta['d'].items():
+            result[key] = apply(result.get(key), sub)
+        return result
+    result = list(value[:delta['n']])
+    result.extend([None] * (delta['n'] - len(result)))
+    for index, sub in delta['l'].items():
+        i = int(index)
+        result[i] = apply(result[i], sub)
+    return result
+
+
+def _encode(data):
+    return zlib.compress(json.dumps(data, separators=(',', ':')).encode('utf-8'))
+
+
+def _decode(payload):
+    return json.loads(zlib.decompress(payload))
+
+
+def _chain(session, quotation_id, upto=None):
+    """Revisions from the last checkpoint at or before ``upto`` through ``upto``"""
+    checkpoint = session.query(func.max(QuotationRevision.revision)).filter(
+        QuotationRevision.quotation_id == quotation_id,
+        QuotationRevision.is_checkpoint.is_(True),
+        *([QuotationRevision.revision <= upto] if upto is not None else [])
+    ).scalar_subquery()
+    query = session.query(QuotationRevision).filter(
+        QuotationRevision.quotation_id == quotation_id,
+        QuotationRevision.revision >= checkpoint,
+    )
+    if upto is not None:
+        query = query.filter(QuotationRevision.revision <= upto)
+    return query.order_by(QuotationRevision.revision).all()
+
+
+def _latest_chains(session, quotation_ids):
+    """{quotation id: revisions from its latest checkpoint on}, in one query"""
+    checkpoint = aliased(QuotationRevision)
+    latest = session.query(func.max(checkpoint.revision)).filter(
+        checkpoint.quotation_id == QuotationRevision.quotation_id,
+        checkpoint.is_checkpoint.is_(True),
+    ).scalar_subquery()
+    rows = session.query(QuotationRevision).filter(
+        QuotationRevision.quotation_id.in_(quotation_ids),
+        QuotationRevision.revision >= latest,
+    ).order_by(QuotationRevision.quotation_id, QuotationRevision.revision).all()
+    chains = {}
+    for rev in rows:
+        chains.setdefault(rev.quotation_id, []).append(rev)
+    return chains
+
+
+def _rebuild(chain):
+    doc = None
+    for rev in chain:
+        doc = _decode(rev.payload) if rev.is_checkpoint else apply(doc, _decode(rev.payload))
+    return doc
+
+
+def rebuild(quotation_id, revision=None, session=None):
+    """(revision number, document) at ``revision`` (default: latest), or None"""
+    chain = _chain(session or db.session, quotation_id, revision)
+    if not chain or (revision is not None and chain[-1].revision != revision):
+        return None
+    return chain[-1].revision, _rebuild(chain)
+
+
+def seed_base_revisions(batch_size=500):
+    """Checkpoint the current content of quotations that have no revisions yet.
+
+    Rows written before revisions were recorded would otherwise get their
+    first checkpoint at their first edit, losing the content they had
+    before it. The base revision is numbered with the row's version.
+    Returns the number of quotations seeded.
+    """
+    missing = (Quotation.query
+               .filter(~db.session.query(QuotationRevision.id)
+                       .filter(QuotationRevision.quotation_id == Quotation.id).exists())
+               .order_by(Quotation.id))
+    seeded = 0
+    last_id = ''
+    while True:
+        batch = missing.filter(Quotation.id > last_id).limit(batch_size).all()
+        if not batch:
+            return seeded
+        last_id = batch[-1].id
+        prefetch_terms(batch)
+        db.session.add_all(QuotationRevision(
+            quotation_id=q.id, revision=q.version or 1, is_checkpoint=True, payload=_encode(document(q))
+        ) for q in batch)
+        db.session.commit()
+        db.session.expunge_all()
+        seeded += len(batch)
+
+
+def _checkpoint_every():
+    if has_app_context():
+        return current_app.config.get('REVISION_CHECKPOINT_EVERY', CHECKPOINT_EVERY)
+    return CHECKPOINT_EVERY
+
+
+def _actor():
+    if has_app_context() and g.get('current_user') is not None:
+        return g.current_user.username
+    return None
+
+
+@event.listens_for(db.session, 'before_flush')
+def record_revisions(session, flush_context, instances):
+    """Queue a QuotationRevision for each quotation whose content changes in this flush"""
+    revisions = []
+    with session.no_autoflush:
+        for obj in session.new:
+            if isinstance(obj, Quotation):
+                revisions.append(QuotationRevision(
+                    quotation_id=obj.id, revision=1, is_checkpoint=True,
+                    payload=_encode(document(obj)), actor=_actor()
+                ))
+        changed = [
+            obj for obj in session.dirty
+            if isinstance(obj, Quotation) and obj not in session.deleted
+            and any(inspect(obj).attrs[name].history.has_changes() for name in TRACKED_COLUMNS)
+        ]
+        # One query for every quotation in the flush (bulk edits touch hundreds)
+        chains = _latest_chains(session, [obj.id for obj in changed]) if changed else {}
+        for obj in changed:
+            new_doc = document(obj)
+            revision = (obj.version or 0) + 1  # the version this flush writes
+            chain = chains.get(obj.id)
+            delta = diff(_rebuild(chain), new_doc) if chain else None
+            if chain and delta is None:
+                continue
+            checkpoint = not chain or len(chain) >= _checkpoint_every()
+            revisions.append(QuotationRevision(
+                quotation_id=obj.id, revision=revision, is_checkpoint=checkpoint,
+                payload=_encode(new_doc if checkpoint else delta), actor=_actor()
+            ))
+    if revisions:
+        session.add_all(revisions)
@@ -0,0 +1,150 @@
+"""Request body schemas for every POST/PUT endpoint (see validation.py).
+
+Unknown keys are accepted everywhere so older clients keep working; only
+the fields a handler reads are described.
+"""
+from pricing import PLOT_AREA_BANDS
+from validation import String, Number, Boolean, OneOf, Array, Object
+
+ROLES = ('user', 'manager', 'admin')
+STATUSES = ('draft', 'pending_approval', 'approved', 'completed', 'rejected')
+
+_text = String(max_length=200)
+_terms = Array(String(max_length=5000), max_items=200, nullable=False)
+_accepted = Boolean(nullable=False)
+
+SERVICE = Object({
+    'id': OneOf(String(max_length=100), Number(allow_string=False)),
+    'label': String(max_length=300),
+    'name': String(max_length=300),
+    'subServices': Array(max_items=500),
+})
+HEADER = Object({
+    'header': String(required=True, non_empty=True, max_length=300),
+    'services': Array(SERVICE, max_items=500),
+})
+HEADERS = Array(HEADER, max_items=100)
+
+SIGNUP = Object({
+    'username': String(required=True, non_empty=True, max_length=80),
+    'password': String(required=True, non_empty=True, max_length=200),
+    'role': String(choices=ROLES),
+    'threshold': Number(minimum=0, maximum=100),
+    'fname': String(max_length=80),
+    'lname': String(max_length=80),
+})
+
+LOGIN = Object({
+    'username': String(required=True, max_length=80),
+    'password': String(required=True, max_length=200),
+})
+
+_QUOTATION_FIELDS = {
+    'developerType': String(required=True, non_empty=True, max_length=20),
+    'projectRegion': String(required=True, non_empty=True, max_length=100),
+    'plotArea': Number(required=True, minimum=0),
+    'developerName': String(required=True, non_empty=True, max_length=200),
+    'projectName': _text,
+    'contactMobile': String(max_length=15),
+    'contactEmail': String(max_length=100),
+    'validity': String(max_length=20),
+    'paymentSchedule': String(max_length=10),
+    'reraNumber': String(max_length=50),
+    'serviceSummary': String(max_length=20000),
+    'createdBy': _text,
+    'termsAccepted': _accepted,
+    'applicableTerms': _terms,
+}
+
+CREATE_QUOTATION = Object({**_QUOTATION_FIELDS, 'headers': HEADERS})
+
+CREATE_FULL_QUOTATION = Object({
+    **_QUOTATION_FIELDS,
+    'headers': HEADERS,
+    'customTerms': _terms,
+    'pricing': Object({
+        'discountPercent': Number(minimum=0, maximum=100),
+        'discountAmount': Number(minimum=0),
+        'serviceOverrides': Object(values=Number(minimum=0)),
+    }),
+})
+
+UPDATE_QUOTATION = Object({
+    'headers': HEADERS,
+    'serviceSummary': String(max_length=20000),
+    'status': String(choices=STATUSES),
+    'termsAccepted': _accepted,
+    'applicableTerms': _terms,
+})
+
+CALCULATE_PRICING = Object({
+    'developerType': String(required=True, non_empty=True, max_length=20),
+    'projectRegion': String(required=True, non_empty=True, max_length=100),
+    'plotArea': Number(required=True, minimum=0),
+    'headers': HEADERS,
+})
+
+OPTIMIZE_BUNDLE = Object({
+    'developerType': String(required=True, non_empty=True, max_length=20),
+    'projectRegion': String(required=True, non_empty=True, max_length=100),
+    'plotArea': Number(minimum=0),
+    'band': String(choices=PLOT_AREA_BANDS),
+    'headers': Array(HEADER, required=True, max_items=100),
+})
+
+REPRICE = Object({
+    'dryRun': Boolean(),
+    'statuses': Array(String(choices=STATUSES), max_items=len(STATUSES)),
+    'top': Number(minimum=0, maximum=1000, allow_string=False),
+})
+
+UPDATE_PRICING = Object({
+    'pricingBreakdown': Array(max_items=100),
+    'totalAmount': Number(minimum=0, nullable=False),
+    'discountAmount': Number(minimum=0, nullable=False),
+    'discountPercent': Number(minimum=0, maximum=100, nullable=False),
+})
+
+UPDATE_TERMS = Object({
+    'termsAccepted': _accepted,
+    'applicableTerms': _terms,
+    'customTerms': _terms,
+})
+
+RESTORE_REVISION = Object({})
+
+STREAM_TICKET = Object({})
+
+CHECK_DUPLICATES = Object({
+    'projectRegion': String(required=True, non_empty=True, max_length=100),
+    'developerName': String(required=True, non_empty=True, max_length=200),
+    'projectName': _text,
+    'reraNumber': String(max_length=50),
+    'contactMobile': String(max_length=15),
+})
+
+APPROVE = Object({
+    'action': String(choices=('approve', 'reject')),
+})
+
+CREATE_AGENT_REGISTRATION = Object({
+    'agentName': String(required=True, non_empty=True, max_length=200),
+    'mobile': OneOf(String(pattern=r'\s*\d{10}\s*'), Number(allow_string=False), required=True),
+    'agentType': String(required=True, non_empty=True, max_length=100),
+    'email': String(max_length=100),
+    'projectRegion': String(max_length=100),
+})
+
+UPDATE_AGENT_SERVICES = Object({
+    'services': Array(Object({
+        'name': String(required=True, non_empty=True, max_length=300),
+        'price': Number(required=True, minimum=0, allow_string=False),
+        'id': OneOf(String(max_length=100), Number(allow_string=False)),
+    }), required=True, non_empty=True, max_items=100),
+})
+
+COMPLETE_AGENT_REGISTRATION = Object({
+    'termsAccepted': _accepted,
+})
+
+UPDATE_AGENT_PRICING = UPDATE_PRICING
@@ -0,0 +1,123 @@
+import hashlib
+import threading
+
+from sqlalchemy import insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+
+from extensions import db
+from models import Term
+
+# Term rows never change and their ids are never reused (AUTOINCREMENT), so
+# id -> text can be cached for the life of the process. Only replacing the
+# database breaks that: restore-db calls clear_term_cache().
+_texts = {}
+_texts_lock = threading.Lock()
+
+# Dialects with INSERT ... ON CONFLICT DO NOTHING
+_UPSERT_INSERTS = {'sqlite': sqlite.insert, 'postgresql': postgresql.insert}
+
+
+class MissingTermsError(LookupError):
+    """A quotation refers to term ids that have no row in the terms library"""
+
+    def __init__(self, ids):
+        super().__init__(f"term ids not in the terms library: {sorted(ids)}")
+        self.ids = ids
+
+
+def clear_term_cache():
+    with _texts_lock:
+        _texts.clear()
+
+
+def content_hash(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def dedupe(texts):
+    """Drop empty and repeated entries, keeping the first occurrence's position"""
+    seen = set()
+    result = []
+    for text in texts:
+        if isinstance(text, str) and text and text not in seen:
+            seen.add(text)
+            result.append(text)
+    return result
+
+
+def intern_terms(*lists):
+    """Return the Term ids for each list of texts, creating missing terms.
+
+    Every list is resolved with one SELECT over all of their hashes; terms
+    seen for the first time are inserted in one statement and read back in
+    a second SELECT.
+    """
+    by_hash = {content_hash(text): text for texts in lists for text in texts}
+    if not by_hash:
+        return [[] for _ in lists]
+
+    # Only the terms table is touched, so pending quotation edits need not be
+    # flushed first (that would save them, and record a revision, twice)
+    with db.session.no_autoflush:
+        ids = dict(db.session.execute(
+            select(Term.content_hash, Term.id).where(Term.content_hash.in_(list(by_hash)))
+        ).all())
+        missing = [h for h in by_hash if h not in ids]
+        if missing:
+            _insert_new_terms([{'content_hash': h, 'text': by_hash[h]} for h in missing])
+            ids.update(db.session.execute(
+                select(Term.content_hash, Term.id).where(Term.content_hash.in_(missing))
+            ).all())
+    return [[ids[content_hash(text)] for text in texts] for texts in lists]
+
+
+def _insert_new_terms(rows):
+    """Insert ``rows``, skipping any whose hash another request inserted meanwhile"""
+    dialect = db.session.get_bind(mapper=Term.__mapper__).dialect.name
+    if dialect in _UPSERT_INSERTS:
+        db.session.execute(
+            _UPSERT_INSERTS[dialect](Term).values(rows).on_conflict_do_nothing(index_elements=['content_hash'])
+        )
+        return
+    # Elsewhere one row at a time, each in a savepoint so a duplicate only skips itself
+    for row in rows:
+        try:
+            with db.session.begin_nested():
+                db.session.execute(insert(Term).values(row))
+        except IntegrityError:
+            pass
+
+
+def term_texts(ids):
+    """Texts for ``ids`` in order; uncached ids are loaded in one query.
+
+    Raises MissingTermsError rather than rendering a quotation with terms
+    silently left out.
+    """
+    missing = [i for i in ids if i not in _texts]
+    if missing:
+        rows = db.session.execute(select(Term.id, Term.text).where(Term.id.in_(set(missing)))).all()
+        with _texts_lock:
+            _texts.update(rows)
+        unknown = {i for i in missing if i not in _texts}
+        if unknown:
+            raise MissingTermsError(unknown)
+    return [_texts[i] for i in ids]
+
+
+def prefetch_terms(quotations):
+    """Load the terms of many quotations at once before serializing them"""
+    ids = set()
+    for q in quotations:
+        ids.update(q.applicable_term_ids or ())
+        ids.update(q.custom_term_ids or ())
+    if ids:
+        term_texts(list(ids))
+
+
+def quotations_to_dicts(quotations):
+    """``to_dict()`` for many quotations with one terms query for all of them"""
+    quotations = list(quotations)
+    prefetch_terms(quotations)
+    return [q.to_dict() for q in quotations]
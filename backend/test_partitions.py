@@ -0,0 +1,90 @@
+"""Quotation writes through the region partitions (PARTITION_DIR set)."""
+from sqlalchemy import event
+
+from extensions import db
+from models import Quotation, QuotationEvent, QuotationRevision, Term, User
+
+QUOTATION = {'developerType': 'cat1', 'projectRegion': 'ROM', 'plotArea': '100',
+             'developerName': 'Dev', 'applicableTerms': ['Term one', 'Term two']}
+
+
+def _app(tmp_path):
+    from app import create_app
+    from commands import init_db
+
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + str(tmp_path / 'app.db'),
+        'SQLALCHEMY_BINDS': {'archive': 'sqlite:///' + str(tmp_path / 'archive.db')},
+        'PARTITION_DIR': str(tmp_path / 'partitions'),
+        'QUOTATION_CACHE_BACKEND': 'none',
+        'RATELIMIT_ENABLED': False,
+        'PASSWORD_HASH_METHOD': 'pbkdf2:sha256:1000',
+        'LOG_LEVEL': 'CRITICAL',
+    })
+    with app.app_context():
+        init_db()
+        db.session.add(User(username='u', role='user', password_hash=''))
+        db.session.commit()
+    return app
+
+
+def _headers(app):
+    from auth import generate_token
+
+    with app.app_context():
+        user = db.session.execute(db.select(User).filter_by(username='u')).scalar_one()
+        return {'Authorization': f'Bearer {generate_token(user)}'}
+
+
+def _failing(app, hook, method, path, body, headers):
+    partitions = app.extensions['partitions']
+
+    def fail(*args):
+        raise OSError('disk I/O error')
+
+    event.listen(partitions.Session, hook, fail)
+    try:
+        return app.test_client().open(path, method=method, json=body, headers=headers)
+    finally:
+        event.remove(partitions.Session, hook, fail)
+
+
+def test_failed_partition_flush_commits_nothing(tmp_path):
+    app = _app(tmp_path)
+    client, headers = app.test_client(), _headers(app)
+    quotation_id = client.post('/api/quotations', json=QUOTATION, headers=headers).get_json()['data']['id']
+
+    # An edit is flushed at commit time: the partition fails before the terms commit
+    response = _failing(app, 'before_flush', 'PUT', f'/api/quotations/{quotation_id}',
+                        {'applicableTerms': ['Term three']}, headers)
+    assert response.status_code == 500
+    with app.app_context():
+        assert db.session.query(Term).filter_by(text='Term three').count() == 0
+    body = client.get(f'/api/quotations/{quotation_id}').get_json()['data']
+    assert (body['version'], body['applicableTerms']) == (1, QUOTATION['applicableTerms'])
+
+
+def test_failed_partition_commit_leaves_nothing_half_written(tmp_path):
+    app = _app(tmp_path)
+    client, headers = app.test_client(), _headers(app)
+    partitions = app.extensions['partitions']
+
+    # The main database (terms) has committed by the time the partition commits
+    assert _failing(app, 'before_commit', 'POST', '/api/quotations', QUOTATION, headers).status_code == 500
+
+    with app.app_context():
+        assert sum(partitions.count().values()) == 0
+        assert partitions.list_events() == []
+        for shard_id, rows in partitions.scatter(db.select(QuotationRevision.id)):
+            assert rows == [], shard_id
+        assert db.session.query(Quotation).count() == 0
+        assert db.session.query(QuotationEvent).count() == 0
+
+    # The terms left behind are reused by the retry
+    response = client.post('/api/quotations', json=QUOTATION, headers=headers)
+    assert response.status_code == 201
+    quotation_id = response.get_json()['data']['id']
+    body = client.get(f'/api/quotations/{quotation_id}').get_json()['data']
+    assert body['applicableTerms'] == QUOTATION['applicableTerms']
+    assert [e['eventType'] for e in client.get(f'/api/quotations/{quotation_id}/events', headers=headers)
+            .get_json()['data']] == ['created']
@@ -0,0 +1,28 @@
+"""Each app hashes passwords on its own pool."""
+from app import create_app
+from password_hashing import password_hasher
+
+
+def _app(tmp_path, name, method):
+    return create_app({
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + str(tmp_path / f'{name}.db'),
+        'SQLALCHEMY_BINDS': {'archive': 'sqlite:///' + str(tmp_path / f'{name}-archive.db')},
+        'QUOTATION_CACHE_BACKEND': 'none',
+        'PASSWORD_HASH_METHOD': method,
+        'LOG_LEVEL': 'WARNING',
+    })
+
+
+def test_second_app_leaves_first_apps_pool_running(tmp_path):
+    first = _app(tmp_path, 'first', 'pbkdf2:sha256:1000')
+    with first.app_context():
+        pwhash = password_hasher.hash('secret')
+
+    second = _app(tmp_path, 'second', 'pbkdf2:sha256:2000')
+
+    with first.app_context():
+        assert password_hasher.verify(pwhash, 'secret')
+        assert password_hasher.hash('secret').startswith('pbkdf2:sha256:1000$')
+        assert not password_hasher.needs_rehash(pwhash)
+    with second.app_context():
+        assert password_hasher.needs_rehash(pwhash)
@@ -0,0 +1,186 @@
+import math
+import re
+from functools import wraps
+
+from flask import request, jsonify, g
+
+MAX_ERRORS = 20
+
+
+class String:
+    def __init__(self, required=False, nullable=True, non_empty=False, max_length=None, choices=None, pattern=None):
+        self.required, self.nullable = required, nullable
+        self.non_empty, self.max_length = non_empty, max_length
+        self.choices = frozenset(choices) if choices else None
+        self.pattern = re.compile(pattern) if pattern else None
+
+    def compile(self):
+        non_empty, max_length, choices, pattern = self.non_empty, self.max_length, self.choices, self.pattern
+
+        def check(value, path, errors):
+            if not isinstance(value, str):
+                errors.append({'field': path, 'message': 'must be a string'})
+            elif non_empty and not value.strip():
+                errors.append({'field': path, 'message': 'must not be empty'})
+            elif max_length is not None and len(value) > max_length:
+                errors.append({'field': path, 'message': f'must be at most {max_length} characters'})
+            elif choices is not None and value not in choices:
+                errors.append({'field': path, 'message': f"must be one of {', '.join(sorted(choices))}"})
+            elif pattern is not None and not pattern.fullmatch(value):
+                errors.append({'field': path, 'message': 'has an invalid format'})
+        return check
+
+
+class Number:
+    """int/float, or a numeric string when ``allow_string`` (form inputs send those)"""
+
+    def __init__(self, required=False, nullable=True, minimum=None, maximum=None, allow_string=True):
+        self.required, self.nullable = required, nullable
+        self.minimum, self.maximum, self.allow_string = minimum, maximum, allow_string
+
+    def compile(self):
+        minimum, maximum, allow_string = self.minimum, self.maximum, self.allow_string
+
+        def check(value, path, errors):
+            if isinstance(value, bool) or not isinstance(value, (int, float, str)) or \
+                    (isinstance(value, str) and not allow_string):
+                errors.append({'field': path, 'message': 'must be a number'})
+                return
+            try:
+                number = float(value)
+            except ValueError:
+                errors.append({'field': path, 'message': 'must be a number'})
+                return
+            if not math.isfinite(number):
+                errors.append({'field': path, 'message': 'must be a finite number'})
+            elif minimum is not None and number < minimum:
+                errors.append({'field': path, 'message': f'must be at least {minimum}'})
+            elif maximum is not None and number > maximum:
+                errors.append({'field': path, 'message': f'must be at most {maximum}'})
+        return check
+
+
+class Boolean:
+    def __init__(self, required=False, nullable=True):
+        self.required, self.nullable = required, nullable
+
+    def compile(self):
+        def check(value, path, errors):
+            if not isinstance(value, bool):
+                errors.append({'field': path, 'message': 'must be true or false'})
+        return check
+
+
+class OneOf:
+    """Any of several specs, e.g. ids that may be numbers or strings"""
+
+    def __init__(self, *specs, required=False, nullable=True):
+        self.specs, self.required, self.nullable = specs, required, nullable
+
+    def compile(self):
+        checks = [compile_field(spec) for spec in self.specs]
+
+        def check(value, path, errors):
+            for candidate in checks:
+                attempt = []
+                candidate(value, path, attempt)
+                if not attempt:
+                    return
+            errors.append({'field': path, 'message': 'has an invalid type'})
+        return check
+
+
+class Array:
+    def __init__(self, items=None, required=False, nullable=True, max_items=None, non_empty=False):
+        self.items, self.required, self.nullable = items, required, nullable
+        self.max_items, self.non_empty = max_items, non_empty
+
+    def compile(self):
+        item_check = compile_field(self.items) if self.items is not None else None
+        max_items, non_empty = self.max_items, self.non_empty
+
+        def check(value, path, errors):
+            if not isinstance(value, list):
+                errors.append({'field': path, 'message': 'must be a list'})
+                return
+            if non_empty and not value:
+                errors.append({'field': path, 'message': 'must not be empty'})
+            if max_items is not None and len(value) > max_items:
+                errors.append({'field': path, 'message': f'must have at most {max_items} items'})
+                return
+            if item_check is not None:
+                for i, item in enumerate(value):
+                    item_check(item, f'{path}[{i}]', errors)
+                    if len(errors) >= MAX_ERRORS:
+                        return
+        return check
+
+
+class Object:
+    """A JSON object with known ``fields`` (unknown keys are allowed), or a
+    mapping whose every value matches ``values``"""
+
+    def __init__(self, fields=None, values=None, required=False, nullable=True):
+        self.fields, self.values = fields or {}, values
+        self.required, self.nullable = required, nullable
+
+    def compile(self):
+        fields = [(name, spec.required, spec.nullable, compile_field(spec)) for name, spec in self.fields.items()]
+        value_check = compile_field(self.values) if self.values is not None else None
+
+        def check(value, path, errors):
+            if not isinstance(value, dict):
+                errors.append({'field': path or 'body', 'message': 'must be an object'})
+                return
+            prefix = f'{path}.' if path else ''
+            for name, required, nullable, field_check in fields:
+                if name not in value:
+                    if required:
+                        errors.append({'field': prefix + name, 'message': 'is required'})
+                    continue
+                item = value[name]
+                if item is None:
+                    if not nullable or required:
+                        errors.append({'field': prefix + name, 'message': 'must not be null'})
+                    continue
+                field_check(item, prefix + name, errors)
+                if len(errors) >= MAX_ERRORS:
+                    return
+            if value_check is not None:
+                for key, item in value.items():
+                    value_check(item, f'{prefix}{key}', errors)
+                    if len(errors) >= MAX_ERRORS:
+                        return
+        return check
+
+
+def compile_field(spec):
+    """Turn a spec into a ``check(value, path, errors)`` closure; done once, at import"""
+    return spec.compile()
+
+
+def validate_body(schema):
+    """Reject a request with 400 unless its JSON body matches ``schema``.
+
+    Apply it above auth decorators so malformed requests are turned away
+    before anything touches the database. The parsed body is left in
+    ``g.json_body``; an absent body counts as ``{}``.
+    """
+    check = compile_field(schema)
+
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            data = request.get_json(silent=True)
+            if data is None:
+                if request.get_data(cache=True):
+                    return jsonify({'error': 'Request body must be valid JSON'}), 400
+                data = {}
+            errors = []
+            check(data, '', errors)
+            if errors:
+                return jsonify({'error': 'Invalid request body', 'details': errors}), 400
+            g.json_body = data
+            return f(*args, **kwargs)
+        return wrapper
+    return decorator
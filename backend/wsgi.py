@@ -0,0 +1,5 @@
+from app import create_app
+from preload import preload_shared_data
+
+app = create_app()
+preload_shared_data(app)
@@ -13,6 +13,7 @@ import {
   TextField,
   CircularProgress,
 } from "@mui/material";
+import { DRAFT_ID, loadDraft, saveDraft } from "../services/quotations";
 
 const QuotationPricing = () => {
   const navigate = useNavigate();
@@ -51,10 +52,16 @@ const QuotationPricing = () => {
     const fetchQuotationAndPricing = async () => {
       try {
         setLoading(true);
-        const quotationResponse = await fetch(`/api/quotations/${id}`);
-        if (!quotationResponse.ok) throw new Error("Failed to fetch quotation");
-
-        const quotation = await quotationResponse.json();
+        let quotation;
+        if (id === DRAFT_ID) {
+          const draft = loadDraft();
+          if (!draft) throw new Error("No quotation in progress");
+          quotation = { data: draft };
+        } else {
+          const quotationResponse = await fetch(`/api/quotations/${id}`);
+          if (!quotationResponse.ok) throw new Error("Failed to fetch quotation");
+          quotation = await quotationResponse.json();
+        }
         setQuotationData(quotation.data);
 
         const pricingResponse = await fetch(
@@ -136,9 +143,25 @@ const QuotationPricing = () => {
   }, [discountType, discountAmount, discountPercent, baseTotals.subtotal]);
 
   const handleSavePricing = async () => {
+    if (finalTotals.discount > finalTotals.subtotal) {
+      alert("The discount cannot be larger than the subtotal");
+      return;
+    }
     try {
       setLoading(true);
 
+      if (id === DRAFT_ID) {
+        // Priced again server-side when the draft is submitted
+        saveDraft({
+          pricing:
+            discountType === "percent"
+              ? { discountPercent }
+              : { discountAmount: discountType === "amount" ? discountAmount : 0 },
+        });
+        navigate(`/quotations/${id}/terms`);
+        return;
+      }
+
       const payload = {
         totalAmount: finalTotals.total,
         discountAmount: finalTotals.discount,
@@ -30,6 +30,7 @@ import {
   ArrowForward as ArrowForwardIcon,
   Warning as WarningIcon
 } from '@mui/icons-material';
+import { clearDraft, createFullQuotation, DRAFT_ID, loadDraft } from '../services/quotations';
 
 const QuotationTerms = () => {
   const navigate = useNavigate();
@@ -122,10 +123,16 @@ const QuotationTerms = () => {
     const fetchQuotationData = async () => {
       try {
         setLoading(true);
-        const response = await fetch(`/api/quotations/${id}`);
-        if (!response.ok) throw new Error('Failed to fetch quotation');
-
-        const quotation = await response.json();
+        let quotation;
+        if (id === DRAFT_ID) {
+          const draft = loadDraft();
+          if (!draft) throw new Error('No quotation in progress');
+          quotation = { data: draft };
+        } else {
+          const response = await fetch(`/api/quotations/${id}`);
+          if (!response.ok) throw new Error('Failed to fetch quotation');
+          quotation = await response.json();
+        }
         setQuotationData(quotation.data);
 
         // Determine applicable terms based on selected services
@@ -210,19 +217,32 @@ const QuotationTerms = () => {
       // Filter out empty custom terms
       const validCustomTerms = customTerms.filter(term => term.trim() !== '');
 
-      // Save terms acceptance status
-      await fetch(`/api/quotations/${id}/terms`, {
-        method: 'PUT',
-        headers: { 
-          'Content-Type': 'application/json',
-          'Authorization': `Bearer ${token}`
-        },
-        body: JSON.stringify({
+      let quotationId = id;
+      if (id === DRAFT_ID) {
+        // One request creates, prices and submits the whole quotation
+        const created = await createFullQuotation({
+          ...loadDraft(),
           termsAccepted: true,
           applicableTerms: Object.keys(applicableTerms),
-          customTerms: validCustomTerms
-        }),
-      });
+          customTerms: validCustomTerms,
+        });
+        clearDraft();
+        quotationId = created.id;
+      } else {
+        // Save terms acceptance status
+        await fetch(`/api/quotations/${id}/terms`, {
+          method: 'PUT',
+          headers: { 
+            'Content-Type': 'application/json',
+            'Authorization': `Bearer ${token}`
+          },
+          body: JSON.stringify({
+            termsAccepted: true,
+            applicableTerms: Object.keys(applicableTerms),
+            customTerms: validCustomTerms
+          }),
+        });
+      }
 
       // Navigate to summary or dashboard based on approval status
       if (validCustomTerms.length > 0) {
@@ -231,7 +251,7 @@ const QuotationTerms = () => {
         navigate('/dashboard');
       } else {
         // No custom terms - proceed normally
-        navigate(`/quotations/${id}/summary`);
+        navigate(`/quotations/${quotationId}/summary`);
       }
 
     } catch (err) {
@@ -13,7 +13,7 @@ import {
   Container,
   ListSubheader,
 } from "@mui/material";
-import { createQuotation } from "../services/quotations";
+import { createQuotation, DRAFT_ID, saveDraft } from "../services/quotations";
 
 // Constants
 const DEVELOPER_TYPE_OPTIONS = [
@@ -102,21 +102,23 @@ export default function CreateQuotation() {
   const handleSubmit = async (e) => {
     e.preventDefault();
     if (!canSubmit) return;
+    const details = {
+      ...form,
+      plotArea: Number(form.plotArea),
+      projectName: form.projectName || null,
+      reraNumber: form.reraNumber || null,
+      serviceSummary: form.serviceSummary || null,
+      createdBy: form.developerName,
+    };
     try {
-      const created = await createQuotation({
-        ...form,
-        plotArea: Number(form.plotArea),
-        projectName: form.projectName || null,
-        reraNumber: form.reraNumber || null,
-        serviceSummary: form.serviceSummary || null,
-        createdBy: form.developerName,
-      });
-
-      if (form.developerType !== "agent" && created?.id) {
-        navigate(`/quotations/${encodeURIComponent(created.id)}/services`);
-      } else {
-        navigate("/");
+      if (form.developerType !== "agent") {
+        // Nothing is saved until the terms step submits the whole quotation
+        saveDraft({ ...details, headers: [], pricing: {} });
+        navigate(`/quotations/${DRAFT_ID}/services`);
+        return;
       }
+      await createQuotation(details);
+      navigate("/");
     } catch (err) {
       console.error(err);
       alert("Failed to save quotation");
@@ -190,6 +190,66 @@ Generated on: ${new Date().toLocaleDateString()}
     fetchPending();
   }, [token, navigate]);
 
+  // Live approval queue: the server pushes a snapshot, then incremental changes.
+  // The stream is opened with a short-lived ticket rather than the session
+  // token, which would otherwise end up in server and proxy logs.
+  useEffect(() => {
+    if (!token || (role !== "admin" && role !== "manager")) return;
+
+    let source = null;
+    let retryTimer = null;
+    let lastEventId = null;
+    let closed = false;
+
+    const connect = async () => {
+      try {
+        const res = await fetch("http://localhost:3001/api/quotations/pending/stream-ticket", {
+          method: "POST",
+          headers: { Authorization: `Bearer ${token}` },
+        });
+        const data = await res.json();
+        if (!res.ok || closed) return;
+
+        const params = new URLSearchParams({ ticket: data.data.ticket });
+        if (lastEventId) params.set("since", lastEventId);
+        source = new EventSource(`http://localhost:3001/api/quotations/pending/stream?${params}`);
+
+        const track = (handler) => (e) => {
+          if (e.lastEventId) lastEventId = e.lastEventId;
+          handler(JSON.parse(e.data));
+        };
+        source.addEventListener("snapshot", track((items) => setPending(items)));
+        source.addEventListener("add", track((item) => {
+          setPending((prev) => [...prev.filter((q) => q.id !== item.id), item]);
+        }));
+        source.addEventListener("update", track((item) => {
+          setPending((prev) => prev.map((q) => (q.id === item.id ? item : q)));
+        }));
+        source.addEventListener("remove", track(({ id }) => {
+          setPending((prev) => prev.filter((q) => q.id !== id));
+        }));
+        source.onerror = () => {
+          // The browser retries with the same URL, whose ticket expires;
+          // once it gives up, reconnect with a fresh ticket
+          if (source.readyState === EventSource.CLOSED && !closed) {
+            retryTimer = setTimeout(connect, 5000);
+          }
+        };
+      } catch (error) {
+        console.error("Failed to open the approval stream:", error);
+        if (!closed) retryTimer = setTimeout(connect, 5000);
+      }
+    };
+
+    connect();
+
+    return () => {
+      closed = true;
+      clearTimeout(retryTimer);
+      if (source) source.close();
+    };
+  }, [token, role]);
+
   const list = activeTab === "pending" ? pending : quotations;
 
   const getApprovalReasons = (quotation) => {
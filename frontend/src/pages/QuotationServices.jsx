@@ -14,7 +14,7 @@ import {
 } from "@mui/material";
 import { QuotationProvider } from "../context/QuotationContext";
 import QuotationBuilder from "../components/QuotationBuilder";
-import { updateQuotation } from "../services/quotations";
+import { DRAFT_ID, saveDraft, updateQuotation } from "../services/quotations";
 
 export default function QuotationServices() {
   const navigate = useNavigate();
@@ -43,8 +43,12 @@ export default function QuotationServices() {
 
         console.log("Saving headers:", headers); // Debug log
         
-        // ✅ Use the fixed updateQuotation function with authentication
-        await updateQuotation(id, { headers });
+        if (id === DRAFT_ID) {
+          saveDraft({ headers });
+        } else {
+          // ✅ Use the fixed updateQuotation function with authentication
+          await updateQuotation(id, { headers });
+        }
         
         // Navigate to pricing step
         navigate(`/quotations/${id}/pricing`);
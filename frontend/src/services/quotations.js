@@ -26,6 +26,33 @@ export async function createQuotation(payload) {
   return response.data?.data;
 }
 
+// Create, price and submit a complete quotation in a single request
+export async function createFullQuotation(payload) {
+  const response = await api.post('/quotations/full', payload);
+  return response.data?.data;
+}
+
+// A new quotation is kept in the browser while the builder steps through
+// details, services, pricing and terms, and is saved once at the end with
+// createFullQuotation. Its route id is DRAFT_ID.
+export const DRAFT_ID = 'draft';
+const DRAFT_KEY = 'quotationDraft';
+
+export function loadDraft() {
+  const stored = sessionStorage.getItem(DRAFT_KEY);
+  return stored ? JSON.parse(stored) : null;
+}
+
+export function saveDraft(changes) {
+  const draft = { ...(loadDraft() || {}), ...changes };
+  sessionStorage.setItem(DRAFT_KEY, JSON.stringify(draft));
+  return draft;
+}
+
+export function clearDraft() {
+  sessionStorage.removeItem(DRAFT_KEY);
+}
+
 // ✅ FIXED: Added authentication token
 export async function updateQuotation(id, data) {
   const token = localStorage.getItem('token');